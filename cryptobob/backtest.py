@@ -0,0 +1,320 @@
+'''
+CryptoBob backtest module.
+'''
+
+__all__ = (
+    'Backtest',
+    'Candles',
+    'backtest_trade_plans',
+    'fetch_ohlc',
+    'load_csv',
+)
+
+from collections import namedtuple
+from logging import getLogger
+from math import inf
+from pathlib import Path
+
+from .exceptions import ConfigError, CryptoBobError
+from .helpers import numpy
+
+LOGGER = getLogger(__name__)
+
+Candles = namedtuple('Candles', ('time', 'open', 'high', 'low', 'close', 'volume'))
+Candles.__doc__ = '''
+OHLC candles as NumPy arrays, sorted by their UNIX timestamps.
+'''
+
+
+def load_csv(path):
+    '''
+    Load OHLC candles from a CSV file.
+
+    The columns must be ``time, open, high, low, close, volume`` (e.g. as in
+    Kraken's downloadable OHLCVT files), additional columns are ignored. An
+    optional header line is skipped.
+
+    :param pathlib.Path path: The CSV file path
+
+    :return: The candles
+    :rtype: Candles
+
+    :raises ConfigError: When the CSV file isn't readable
+    '''
+    np = numpy()
+
+    try:
+        with path.open('r', encoding='utf-8') as file:
+            header = not file.readline()[:1].isdigit()
+            file.seek(0)
+            data = np.loadtxt(file, delimiter=',', usecols=range(6), skiprows=int(header), ndmin=2)
+    except (OSError, ValueError) as ex:
+        raise ConfigError(f'OHLC file {str(path)!r} not readable, got «{ex}»') from ex
+
+    data = data[np.argsort(data[:, 0], kind='stable')]
+
+    return Candles(*(data[:, i] for i in range(6)))
+
+
+def fetch_ohlc(client, pair, interval=1440, since=None):
+    '''
+    Fetch OHLC candles from Kraken's OHLC endpoint.
+
+    Please note Kraken only returns the last 720 candles of an interval, so
+    longer histories (e.g. years of minute candles) have to be loaded from a
+    CSV file.
+
+    :param kraken.KrakenClient client: The client
+    :param str pair: The trading pair
+    :param int interval: The candle interval in minutes
+    :param since: The UNIX timestamp of the first candle
+    :type since: None or int
+
+    :return: The candles
+    :rtype: Candles
+    '''
+    np = numpy()
+
+    data   = {'pair': pair, 'interval': interval, **({'since': since} if since else {})}
+    result = client.request('OHLC', **data)
+    rows   = next(value for key, value in result.items() if key != 'last')
+
+    # Columns: time, open, high, low, close, vwap, volume, count
+    array = np.array([row[:5] + row[6:7] for row in rows], dtype=float).reshape(-1, 6)
+
+    return Candles(*(array[:, i] for i in range(6)))
+
+
+class Backtest:  # pylint: disable=too-many-instance-attributes
+    '''
+    The backtest, which simulates the recurring buys & withdrawals of trade
+    plans over OHLC candles.
+
+    The buys are scheduled at a fixed grid of the trade plan interval,
+    starting with the first candle. Each buy is filled at the open price of
+    the candle it falls into. When there's no such candle (i.e. a gap in the
+    data, like an exchange outage), the opening fails, and it's retried
+    according to the retry interval & timeout. Please note that, unlike the
+    runner, the grid doesn't drift when buys are retried.
+
+    All buys of an interval are computed at once on the price arrays, and
+    since the bought volume scales linearly with the amount, all amounts are
+    computed at once too. Only the withdrawals are simulated sequentially,
+    yet only one step per withdrawal.
+
+    :param Candles candles: The candles
+    :param float fee: The trading fee rate (e.g. ``0.004`` for 0.4%)
+    :param float retry_interval: The retry interval in seconds
+    :param float retry_timeout: The retry timeout in seconds
+    :param threshold: The withdrawal threshold in base currency (optional)
+    :type threshold: None or float
+    :param withdrawal_amount: The withdrawal amount in base currency (optional)
+    :type withdrawal_amount: None or float
+    '''
+
+    def __init__(self, candles, fee=0.004, retry_interval=3600,  # pylint: disable=too-many-arguments
+                 retry_timeout=86400, threshold=None, withdrawal_amount=None):
+        self.np                = numpy()
+        self.candles           = candles
+        self.fee               = fee
+        self.retry_interval    = retry_interval
+        self.retry_timeout     = retry_timeout
+        self.threshold         = threshold
+        self.withdrawal_amount = withdrawal_amount
+
+        if not len(candles.time):  # pylint: disable=use-implicit-booleaness-not-len
+            raise CryptoBobError('Backtest requires at least one candle')
+
+        diffs      = self.np.diff(candles.time)
+        self.width = float(self.np.median(diffs)) if len(diffs) else 60.0
+
+    def fill(self, times):
+        '''
+        Find the candles into which the times fall.
+
+        :param numpy.ndarray times: The UNIX timestamps
+
+        :return: The candle indexes & the filled mask
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        '''
+        candle_times = self.candles.time
+        index        = self.np.searchsorted(candle_times, times, side='right') - 1
+        index        = self.np.clip(index, 0, len(candle_times) - 1)
+        filled       = (candle_times[index] <= times) & (times < candle_times[index] + self.width)
+
+        return index, filled
+
+    def schedule(self, interval):
+        '''
+        Schedule the buys of an interval, incl. their retries.
+
+        :param float interval: The trade plan interval in seconds
+
+        :return: The candle indexes of the filled buys & the number of failed buys
+        :rtype: tuple(numpy.ndarray, int)
+        '''
+        np           = self.np
+        candle_times = self.candles.time
+        times        = np.arange(candle_times[0], candle_times[-1] + self.width, interval)
+
+        index, filled = self.fill(times)
+        failed        = ~filled
+        retries       = int(self.retry_timeout // self.retry_interval) if self.retry_interval else 0
+
+        for retry in range(1, retries + 1):
+            if not failed.any():
+                break
+
+            retry_index, retry_filled = self.fill(times[failed] + retry * self.retry_interval)
+
+            positions         = np.flatnonzero(failed)[retry_filled]
+            index[positions]  = retry_index[retry_filled]
+            failed[positions] = False
+
+        return index[~failed], int(failed.sum())
+
+    def withdraw(self, cumulative, amount):
+        '''
+        Simulate the withdrawals of a single amount.
+
+        :param numpy.ndarray cumulative: The cumulative volume per amount unit
+        :param float amount: The amount
+
+        :return: The number of withdrawals & the withdrawn volume
+        :rtype: tuple(int, float)
+        '''
+        if not self.threshold or not len(cumulative):  # pylint: disable=use-implicit-booleaness-not-len
+            return 0, 0.0
+
+        limit     = self.withdrawal_amount or inf
+        count     = 0
+        withdrawn = 0.0
+        start     = 0
+
+        while True:
+            offset = int(self.np.searchsorted(cumulative[start:], (withdrawn + self.threshold) / amount))
+            if start + offset >= len(cumulative):
+                return count, withdrawn
+
+            start     += offset
+            count     += 1
+            withdrawn += min(limit, float(cumulative[start]) * amount - withdrawn)
+            start     += 1
+
+    def run(self, amounts, intervals):  # pylint: disable=too-many-locals
+        '''
+        Run the backtest for all combinations of amounts & intervals.
+
+        :param list amounts: The amounts in quote currency
+        :param list intervals: The intervals in seconds
+
+        :return: The results per combination
+        :rtype: list
+        '''
+        np      = self.np
+        amounts = np.asarray(amounts, dtype=float)
+        last    = float(self.candles.close[-1])
+        results = []
+
+        for interval in intervals:
+            index, failed = self.schedule(interval)
+            prices        = self.candles.open[index]
+            cumulative    = np.cumsum(1 / prices)
+            units         = float(cumulative[-1]) if len(cumulative) else 0.0
+
+            buys     = len(prices)
+            invested = amounts * buys
+            fees     = invested * self.fee
+            volumes  = amounts * units
+
+            for i, amount in enumerate(amounts.tolist()):
+                withdrawals, withdrawn = self.withdraw(cumulative, amount)
+                volume                 = float(volumes[i])
+                cost                   = float(invested[i] + fees[i])
+                value                  = volume * last
+
+                results.append({
+                    'amount': amount,
+                    'interval': interval,
+                    'buys': buys,
+                    'failed': failed,
+                    'invested': float(invested[i]),
+                    'fees': float(fees[i]),
+                    'volume': volume,
+                    'average_price': cost / volume if volume else 0.0,
+                    'holdings': volume - withdrawn,
+                    'withdrawals': withdrawals,
+                    'withdrawn': withdrawn,
+                    'value': value,
+                    'return': (value - cost) / cost if cost else 0.0,
+                })
+
+        return results
+
+
+def get_withdrawal(runner, pair):
+    '''
+    Get the withdrawal of the base asset of a trading pair (if any).
+
+    :param runner.Runner runner: The runner
+    :param str pair: The trading pair
+
+    :return: The withdrawal
+    :rtype: None or withdrawal.Withdrawal
+    '''
+    if not runner.withdrawals:
+        return None
+
+    try:
+        base = next(iter(runner.client.request('AssetPairs', pair=pair).values()))['base']
+    except (CryptoBobError, KeyError, StopIteration) as ex:
+        LOGGER.warning('Base asset of %s unknown, ignoring withdrawals, got «%s»', pair, ex)
+        return None
+
+    return next((item for item in runner.withdrawals if item.asset == base), None)
+
+
+def backtest_trade_plans(runner, ohlc=None, ohlc_interval=1440,  # pylint: disable=too-many-arguments
+                         amounts=None, intervals=None, fee=0.004):
+    '''
+    Backtest the trade plans of a runner.
+
+    By default, each trade plan is backtested with its own amount & interval,
+    and its withdrawal (i.e. the withdrawal of the pair's base asset).
+
+    :param runner.Runner runner: The runner
+    :param ohlc: The CSV file path, where ``{pair}`` is replaced by the pair
+                 (optional, fetched from the OHLC endpoint otherwise)
+    :type ohlc: None or str
+    :param int ohlc_interval: The candle interval in minutes of the OHLC endpoint
+    :param amounts: The amounts to sweep (optional)
+    :type amounts: None or list
+    :param intervals: The intervals in seconds to sweep (optional)
+    :type intervals: None or list
+    :param float fee: The trading fee rate
+
+    :return: The trade plan, candles & results
+    :rtype: generator
+    '''
+    config = runner.config
+
+    for trade_plan in runner.trade_plans:
+        if ohlc:
+            candles = load_csv(Path(ohlc.replace('{pair}', trade_plan.pair)).expanduser())
+        else:
+            candles = fetch_ohlc(runner.client, trade_plan.pair, interval=ohlc_interval)
+
+        withdrawal = get_withdrawal(runner, trade_plan.pair)
+        backtest   = Backtest(
+            candles=candles,
+            fee=fee,
+            retry_interval=config.retry_interval * 60,
+            retry_timeout=config.retry_timeout * 60,
+            threshold=withdrawal.threshold if withdrawal else None,
+            withdrawal_amount=withdrawal.amount if withdrawal else None,
+        )
+
+        yield trade_plan, candles, backtest.run(
+            amounts=amounts or [trade_plan.amount],
+            intervals=intervals or [trade_plan.interval.total_seconds()],
+        )
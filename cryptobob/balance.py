@@ -0,0 +1,187 @@
+'''
+CryptoBob balance module.
+'''
+
+__all__ = (
+    'BalanceTracker',
+)
+
+from logging import getLogger
+from threading import Lock
+
+LOGGER = getLogger(__name__)
+
+
+class BalanceTracker:  # pylint: disable=too-many-instance-attributes
+    '''
+    The balance tracker, which projects the account balance locally, instead
+    of fetching the full balance in each runner cycle.
+
+    The balance only changes when orders are filled, or assets are withdrawn
+    (or deposited). Therefore the tracker is only marked as stale when the
+    order book saw newly closed orders, or an order was opened. A stale
+    balance is updated incrementally from the ledger entries since the last
+    seen one, where each entry contains the resulting balance of its asset.
+    Withdrawals are projected right away. When nothing changed, no API
+    requests are made at all.
+
+    The full balance is only fetched on the first update, when a projected
+    balance crosses the threshold of a withdrawal (so that the withdrawal is
+    based on the real balance), and at the reconcile interval (e.g. to
+    consider deposits).
+
+    :param kraken.KrakenClient client: The client
+    :param clock.Clock clock: The clock
+    :param float reconcile_interval: The interval of full refreshes in seconds
+    :param thresholds: The withdrawal thresholds by asset (optional)
+    :type thresholds: None or dict
+    '''
+
+    def __init__(self, client, clock, reconcile_interval=86400, thresholds=None):
+        self.client             = client
+        self.clock              = clock
+        self.reconcile_interval = reconcile_interval
+        self.thresholds         = thresholds or {}
+        self.balances           = {}
+        self.cursor             = None
+        self.reconciled         = 0.0
+        self.stale              = True
+        self.lock               = Lock()
+
+    def get(self, asset):
+        '''
+        Get the projected balance of an asset.
+
+        :param str asset: The asset
+
+        :return: The balance
+        :rtype: float
+        '''
+        return self.balances.get(asset, 0.0)
+
+    def mark_stale(self):
+        '''
+        Mark the balance as stale, e.g. because orders were filled.
+        '''
+        self.stale = True
+
+    def update(self):
+        '''
+        Update the balance, either fully or incrementally, or not at all when
+        nothing changed.
+        '''
+        if self.cursor is None or self.clock.time() >= self.reconciled + self.reconcile_interval:
+            self.reconcile()
+            return
+
+        if not self.stale:
+            LOGGER.debug('Balance unchanged, skipping refresh')
+            return
+
+        crossed = self.fetch_ledgers()
+        if crossed:
+            LOGGER.debug('Projected balance of %s crossed withdrawal threshold, refreshing',
+                         ', '.join(sorted(crossed)))
+            self.reconcile()
+
+    def reconcile(self):
+        '''
+        Fetch the full balance, and move the cursor to the latest ledger entry.
+        '''
+        LOGGER.debug('Reconciling account balance')
+
+        # The cursor is the time of the latest ledger entry before the balance
+        # (i.e. Kraken's time, not the local one). Entries posted in between
+        # are fetched again, but they contain the resulting balance anyway.
+        latest = self.client.request('Ledgers')['ledger']
+        self.client.update_balance()
+
+        with self.lock:
+            self.balances   = {asset: float(amount) for asset, amount in self.client.balance.items()}
+            self.cursor     = max([self.cursor or 0.0, *(float(entry['time']) for entry in latest.values())])
+            self.reconciled = self.clock.time()
+            self.stale      = False
+
+    def fetch_ledgers(self):
+        '''
+        Fetch the ledger entries since the last seen one page by page, and
+        project the balances from them.
+
+        :return: The assets which crossed their withdrawal threshold
+        :rtype: set
+        '''
+        entries = {}
+
+        while True:
+            result = self.client.request('Ledgers', start=self.cursor, ofs=len(entries))
+            page   = result['ledger']
+            entries.update(page)
+
+            if not page or len(entries) >= result.get('count', 0):
+                break
+
+        LOGGER.debug('Fetched %d ledger entries since %r', len(entries), self.cursor)
+
+        crossed = set()
+
+        with self.lock:
+            for entry in sorted(entries.values(), key=lambda item: float(item['time'])):
+                asset     = entry['asset']
+                previous  = self.balances.get(asset, 0.0)
+                balance   = float(entry['balance'])
+                threshold = self.thresholds.get(asset)
+
+                self.balances[asset] = balance
+                self.cursor          = max(self.cursor or 0.0, float(entry['time']))
+
+                if threshold is not None and previous < threshold <= balance:
+                    crossed.add(asset)
+
+            self.stale = False
+
+        return crossed
+
+    def withdrawn(self, asset, amount):
+        '''
+        Project a withdrawal.
+
+        :param str asset: The asset
+        :param float amount: The amount
+        '''
+        with self.lock:
+            self.balances[asset] = max(0.0, self.balances.get(asset, 0.0) - amount)
+
+    def apply(self, balances, snapshot=False):
+        '''
+        Apply pushed balances (e.g. from the stream feed).
+
+        :param dict balances: The balances by asset
+        :param bool snapshot: The balances are a complete snapshot
+        '''
+        with self.lock:
+            if snapshot:
+                self.balances = {}
+            self.balances.update({asset: float(amount) for asset, amount in balances.items()})
+
+    def load(self, state):
+        '''
+        Load the balance from the state store.
+
+        :param state.StateStore state: The state store
+        '''
+        with self.lock:
+            self.balances   = {asset: float(amount) for asset, amount in state.get_balance().items()}
+            self.cursor     = state.get('ledger_cursor')
+            self.reconciled = state.get('balance_reconciled', 0.0)
+            self.stale      = True
+
+    def save(self, state):
+        '''
+        Save the balance to the state store.
+
+        :param state.StateStore state: The state store
+        '''
+        with self.lock:
+            state.set_balance({asset: str(amount) for asset, amount in self.balances.items()})
+            state.set('ledger_cursor', self.cursor)
+            state.set('balance_reconciled', self.reconciled)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+'''
+The benchmark module of CryptoBob.
+
+Run it via ``python -m cryptobob.benchmark`` (or ``make benchmark``).
+'''
+
+__all__ = (
+    'BENCHMARKS',
+    'CYCLES',
+    'benchmark',
+    'main',
+)
+
+import os
+import subprocess
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from base64 import b64encode
+from json import dump, dumps, load
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter, thread_time, time
+from timeit import Timer
+
+from .config import Config
+from .kraken import KrakenClient
+from .mockserver import MockKraken
+from .runner import Runner
+
+#: The registered benchmarks.
+BENCHMARKS = {}
+
+#: The cycle benchmark scenarios, which run against the mock Kraken server.
+CYCLES = {
+    'cycle_small': {'trade_plans': 1, 'withdrawals': 1, 'history': 10},
+    'cycle_medium': {'trade_plans': 10, 'withdrawals': 2, 'history': 500},
+    'cycle_large': {'trade_plans': 50, 'withdrawals': 5, 'history': 5000},
+}
+
+PRIVATE_KEY = b64encode(bytes(range(64))).decode('ascii')
+OTP_URI     = 'otpauth://totp/CryptoBob?secret=JBSWY3DPEHPK3PXP'
+
+
+def benchmark(name):
+    '''
+    Decorator to register a benchmark.
+
+    The decorated function must prepare the benchmark and return a callable,
+    which is then timed.
+
+    :param str name: The benchmark name
+
+    :return: The decorator
+    :rtype: callable
+    '''
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+@benchmark('sign')
+def bench_sign():
+    '''
+    Sign an already encoded private request.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    signer = KrakenClient(api_key='key', private_key=PRIVATE_KEY).signer
+    return lambda: signer.headers('/0/private/Balance', '1', 'nonce=1')
+
+
+@benchmark('prepare_public')
+def bench_prepare_public():
+    '''
+    Prepare a public request.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    client = KrakenClient()
+    return lambda: client._prepare_request('Ticker', pair='XBTCHF')  # pylint: disable=protected-access
+
+
+@benchmark('prepare_private')
+def bench_prepare_private():
+    '''
+    Prepare (i.e. nonce, encode & sign) a private request.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    client = KrakenClient(api_key='key', private_key=PRIVATE_KEY)
+    return lambda: client._prepare_request('ClosedOrders', userref=1)  # pylint: disable=protected-access
+
+
+@benchmark('prepare_private_otp')
+def bench_prepare_private_otp():
+    '''
+    Prepare a private request, incl. the OTP.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    client = KrakenClient(api_key='key', private_key=PRIVATE_KEY, otp_uri=OTP_URI)
+    return lambda: client._prepare_request('ClosedOrders', userref=1)  # pylint: disable=protected-access
+
+
+def write_config(directory, data):
+    '''
+    Write a config file to a directory.
+
+    :param pathlib.Path directory: The config directory
+    :param dict data: The config data
+
+    :return: The config path
+    :rtype: pathlib.Path
+    '''
+    path = Path(directory) / f'benchmark-{time():.6f}.yml'
+
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600), 'w', encoding='utf-8') as file:
+        file.write(dumps(data))
+
+    return path
+
+
+def create_startup_config(directory):
+    '''
+    Create a config file with a typical number of trade plans & withdrawals
+    for the startup benchmarks.
+
+    :param pathlib.Path directory: The config directory
+
+    :return: The config path
+    :rtype: pathlib.Path
+    '''
+    return write_config(directory, {
+        'api_key': 'key',
+        'private_key': PRIVATE_KEY,
+        'otp_uri': OTP_URI,
+        'trade_plans': [
+            {'pair': f'PAIR{i}EUR', 'amount': 10, 'interval': {'days': 1}} for i in range(50)
+        ],
+        'withdrawals': [
+            {'asset': f'ASSET{i}', 'threshold': 0.5, 'amount': 0.01, 'key': 'mock', 'address': 'mock'}
+            for i in range(5)
+        ],
+    })
+
+
+@benchmark('config_parse')
+def bench_config_parse():
+    '''
+    Load a config without the config cache, i.e. parse its YAML.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    class UncachedConfig(Config):  # pylint: disable=missing-class-docstring
+        cache_dir = None
+
+    directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+    path      = create_startup_config(directory.name)
+
+    return lambda directory=directory: UncachedConfig(path)
+
+
+@benchmark('config_load')
+def bench_config_load():
+    '''
+    Load a config from the config cache.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    class CachedConfig(Config):  # pylint: disable=missing-class-docstring
+        cache_dir = Path(directory.name) / 'cache'
+
+    path = create_startup_config(directory.name)
+
+    return lambda directory=directory: CachedConfig(path)
+
+
+@benchmark('startup_otp')
+def bench_startup_otp():
+    '''
+    Start the CLI in a new process to print the OTP, like the invocations
+    from cron & scripts, while the config is cached.
+
+    :return: The benchmark callable
+    :rtype: callable
+    '''
+    directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+    path      = create_startup_config(directory.name)
+    env       = {**os.environ, 'HOME': directory.name}
+    args      = [sys.executable, '-m', 'cryptobob.cli', '-c', str(path), 'otp']
+
+    return lambda directory=directory: subprocess.run(args, env=env, stdout=subprocess.DEVNULL, check=True)
+
+
+def create_runner(directory, server, trade_plans, withdrawals):
+    '''
+    Create a runner for the mock server, with a config file in a directory.
+
+    The rate limiter of the runner is practically disabled, so that the
+    cycles aren't paced.
+
+    :param pathlib.Path directory: The config directory
+    :param mockserver.MockKraken server: The mock server
+    :param int trade_plans: The number of trade plans
+    :param int withdrawals: The number of withdrawals
+
+    :return: The runner
+    :rtype: runner.Runner
+    '''
+    path = write_config(directory, {
+        'api_key': server.api_key,
+        'private_key': server.private_key,
+        'api_url': server.url,
+        'interval': 60,
+        'retry_interval': 60,
+        'retry_timeout': 1440,
+        'rate_limit': {'max_counter': 1e9, 'decay': 1e9},
+        'trade_plans': [
+            {'pair': f'PAIR{i}EUR', 'amount': 10, 'interval': {'days': 1}} for i in range(trade_plans)
+        ],
+        'withdrawals': [
+            {'asset': f'ASSET{i}', 'threshold': 0.5, 'amount': 0.01, 'key': 'mock', 'address': 'mock'}
+            for i in range(withdrawals)
+        ],
+    })
+
+    return Runner(config=Config(path))
+
+
+def run_cycle(server, runner):
+    '''
+    Run a single cycle of a runner, for which all trade plans & withdrawals
+    are due.
+
+    :param mockserver.MockKraken server: The mock server
+    :param runner.Runner runner: The runner
+
+    :return: The latency, CPU time & number of requests
+    :rtype: tuple(float, float, int)
+    '''
+    for item in runner.trade_plans + runner.withdrawals:
+        runner.scheduler.schedule(item, time())
+
+    requests = sum(server.requests.values())
+    start    = perf_counter(), thread_time()
+
+    runner.run_due()
+
+    return (
+        perf_counter() - start[0],
+        thread_time() - start[1],
+        sum(server.requests.values()) - requests,
+    )
+
+
+def run_cycles(name, cycles=5, latency=0.0):
+    '''
+    Run a cycle benchmark scenario against the mock Kraken server.
+
+    The first (cold) cycle fetches the whole order history, while the
+    subsequent (warm) cycles only fetch what changed. The memory is measured
+    in a separate cold cycle, since tracing the allocations slows it down.
+    It includes the allocations of the in-process mock server.
+
+    :param str name: The scenario name
+    :param int cycles: The number of warm cycles
+    :param float latency: The injected latency per request in seconds
+
+    :return: The cold & warm (median) latency, CPU time & requests, and the
+             peak memory in KiB
+    :rtype: dict
+    '''
+    scenario = CYCLES[name]
+    results  = {}
+
+    with TemporaryDirectory() as directory:
+        for measure_memory in (False, True):
+            server = MockKraken(latency=latency, rate_limit=False)
+            server.start()
+
+            try:
+                runner = create_runner(directory, server, scenario['trade_plans'], scenario['withdrawals'])
+                server.balance.update({f'ASSET{i}': '1000.0' for i in range(scenario['withdrawals'])})
+                server.add_history([plan.userref for plan in runner.trade_plans], scenario['history'])
+                runner.start()
+
+                if measure_memory:
+                    tracemalloc.start()
+                    run_cycle(server, runner)
+                    results['memory'] = tracemalloc.get_traced_memory()[1] / 1024
+                    tracemalloc.stop()
+                    continue
+
+                cold = run_cycle(server, runner)
+                warm = [run_cycle(server, runner) for _ in range(cycles)]
+
+            finally:
+                server.stop()
+
+            results.update({
+                'latency_cold': cold[0],
+                'cpu_cold': cold[1],
+                'requests_cold': cold[2],
+                'latency': median(item[0] for item in warm),
+                'cpu': median(item[1] for item in warm),
+                'requests': median(item[2] for item in warm),
+            })
+
+    return results
+
+
+def run(names, repeat=5):
+    '''
+    Run benchmarks.
+
+    :param list names: The benchmark names
+    :param int repeat: The number of repetitions
+
+    :return: The best throughput (operations per second) by benchmark name
+    :rtype: dict
+    '''
+    results = {}
+
+    for name in names:
+        timer     = Timer(BENCHMARKS[name]())
+        number, _ = timer.autorange()
+        best      = min(timer.repeat(repeat=repeat, number=number)) / number
+
+        results[name] = 1 / best
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Compare benchmark results with a baseline.
+
+    Benchmarks regress when their throughput dropped, cycle benchmarks when
+    their latency increased or when they need more requests.
+
+    :param dict results: The results
+    :param dict baseline: The baseline results
+    :param float tolerance: The tolerated relative slowdown
+
+    :return: The names of the regressed benchmarks
+    :rtype: list
+    '''
+    # Baselines of older releases only contain the throughput of the benchmarks.
+    if 'benchmarks' not in baseline:
+        baseline = {'benchmarks': baseline}
+
+    regressed = [
+        name for name, value in results.get('benchmarks', {}).items()
+        if name in baseline['benchmarks'] and value < baseline['benchmarks'][name] * (1 - tolerance)
+    ]
+
+    for name, value in results.get('cycles', {}).items():
+        base = baseline.get('cycles', {}).get(name)
+        if not base:
+            continue
+        if value['latency'] > base['latency'] * (1 + tolerance) \
+                or value['requests'] > base['requests'] \
+                or value['requests_cold'] > base['requests_cold']:
+            regressed.append(name)
+
+    return regressed
+
+
+def main():
+    '''
+    Main function for the benchmark execution.
+    '''
+    parser = ArgumentParser(description='CryptoBob benchmarks')
+
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f'benchmarks to run (default: all of {", ".join([*BENCHMARKS, *CYCLES])})')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of repetitions')
+    parser.add_argument('-c', '--cycles', type=int, default=5,
+                        help='number of warm cycles of the cycle benchmarks')
+    parser.add_argument('-l', '--latency', type=float, default=0.0,
+                        help='injected latency of the mock server in seconds')
+    parser.add_argument('-o', '--output',
+                        help='write results as JSON to this file')
+    parser.add_argument('-b', '--baseline',
+                        help='compare results with this JSON baseline')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2,
+                        help='tolerated slowdown compared to baseline')
+
+    args = parser.parse_args()
+
+    names   = args.names or [*BENCHMARKS, *CYCLES]
+    unknown = set(names) - BENCHMARKS.keys() - CYCLES.keys()
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    results = {
+        'benchmarks': run([name for name in names if name in BENCHMARKS], repeat=args.repeat),
+        'cycles': {
+            name: run_cycles(name, cycles=args.cycles, latency=args.latency)
+            for name in names if name in CYCLES
+        },
+    }
+
+    for name, value in results['benchmarks'].items():
+        sys.stdout.write(f'{name:30s} {value:15,.1f} ops/s\n')
+
+    for name, value in results['cycles'].items():
+        sys.stdout.write(
+            f'{name:30s} {value["latency"] * 1000:9.2f} ms {value["cpu"] * 1000:9.2f} ms CPU '
+            f'{value["requests"]:5.0f} requests (cold: {value["latency_cold"] * 1000:.2f} ms '
+            f'{value["cpu_cold"] * 1000:.2f} ms CPU {value["requests_cold"]} requests) '
+            f'{value["memory"]:,.0f} KiB peak\n'
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            dump(results, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressed = compare(results, load(file), args.tolerance)
+
+        if regressed:
+            sys.stderr.write(f'ERROR: Regression in {", ".join(regressed)}\n')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
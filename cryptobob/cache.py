@@ -0,0 +1,194 @@
+'''
+CryptoBob response cache module.
+'''
+
+__all__ = (
+    'MISS',
+    'ResponseCache',
+)
+
+from collections import OrderedDict
+from json import JSONDecodeError, dump, load
+from logging import getLogger
+from os import replace
+from pathlib import Path
+from threading import Lock
+from time import time
+from urllib.parse import urlencode
+
+LOGGER = getLogger(__name__)
+
+MISS = object()
+
+
+class ResponseCache:
+    '''
+    A TTL response cache for public API methods.
+
+    The responses are cached by API method & data. Each API method has its
+    own TTL, methods without TTL aren't cached at all. When the cache is full,
+    the least recently used response is evicted.
+
+    Optionally, the cache can be persisted to a JSON file. Only responses of
+    API methods with a TTL of at least :attr:`persist_min_ttl` are persisted,
+    i.e. the slowly changing metadata like assets and asset pairs.
+
+    :param path: The path to the cache file (optional)
+    :type path: None or pathlib.Path
+    :param int maxsize: The max number of cached responses
+    :param ttls: Custom TTLs in seconds per API method (optional)
+    :type ttls: None or dict
+    '''
+
+    #: The TTLs in seconds per API method.
+    ttls = {
+        'AssetPairs': 86400,
+        'Assets': 86400,
+        'Depth': 5,
+        'OHLC': 30,
+        'Spread': 5,
+        'Ticker': 5,
+        'Trades': 5,
+    }
+
+    #: The min TTL in seconds of API methods, which are persisted.
+    persist_min_ttl = 3600
+
+    def __init__(self, path=None, maxsize=256, ttls=None):
+        self.path    = path.expanduser() if path else None
+        self.maxsize = maxsize
+        self.ttls    = {**self.ttls, **(ttls or {})}
+        self.entries = OrderedDict()
+        self.lock    = Lock()
+
+        if self.path:
+            self.load()
+
+    @classmethod
+    def from_config(cls, config):
+        '''
+        Create a response cache from the ``cache_file`` & ``cache_ttl``
+        configuration settings.
+
+        :param config.Config config: The config
+
+        :return: The response cache
+        :rtype: ResponseCache
+        '''
+        path = config.get('cache_file')
+
+        return cls(path=Path(path) if path else None, ttls=config.get('cache_ttl'))
+
+    @staticmethod
+    def key(api_method, data):
+        '''
+        Get the cache key of a request.
+
+        :param str api_method: The API method
+        :param dict data: The API data
+
+        :return: The cache key
+        :rtype: str
+        '''
+        return f'{api_method}?{urlencode(sorted(data.items()))}' if data else api_method
+
+    def get(self, api_method, data):
+        '''
+        Get a cached response.
+
+        :param str api_method: The API method
+        :param dict data: The API data
+
+        :return: The cached response result, or :data:`MISS`
+        :rtype: mixed
+        '''
+        if not self.ttls.get(api_method):
+            return MISS
+
+        key = self.key(api_method, data)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return MISS
+
+            if entry[0] < time():
+                del self.entries[key]
+                return MISS
+
+            self.entries.move_to_end(key)
+
+        LOGGER.debug('Using cached %s response', api_method)
+
+        return entry[1]
+
+    def set(self, api_method, data, result):
+        '''
+        Cache a response.
+
+        :param str api_method: The API method
+        :param dict data: The API data
+        :param result: The response result
+        :type result: mixed
+        '''
+        ttl = self.ttls.get(api_method)
+        if not ttl:
+            return
+
+        key = self.key(api_method, data)
+
+        with self.lock:
+            self.entries[key] = (time() + ttl, result)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+        if self.path and ttl >= self.persist_min_ttl:
+            self.save()
+
+    def load(self):
+        '''
+        Load the cache file, while ignoring expired responses.
+        '''
+        try:
+            with self.path.open('r', encoding='utf-8') as file:
+                entries = load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, JSONDecodeError) as ex:
+            LOGGER.warning('Ignoring unreadable cache file %r, got «%s»', str(self.path), ex)
+            return
+
+        now = time()
+
+        with self.lock:
+            for key, (expires, result) in entries.items():
+                if expires >= now:
+                    self.entries[key] = (expires, result)
+
+        LOGGER.debug('Loaded %d cached responses from %r', len(self.entries), str(self.path))
+
+    def save(self):
+        '''
+        Save the persistable responses to the cache file.
+        '''
+        now = time()
+
+        with self.lock:
+            entries = {
+                key: entry for key, entry in self.entries.items()
+                if entry[0] >= now
+                and self.ttls.get(key.split('?', 1)[0], 0) >= self.persist_min_ttl
+            }
+
+        tmp = self.path.with_name(f'.{self.path.name}.tmp')
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp.open('w', encoding='utf-8') as file:
+                dump(entries, file)
+            replace(tmp, self.path)
+        except OSError as ex:
+            LOGGER.warning('Saving cache file %r failed, got «%s»', str(self.path), ex)
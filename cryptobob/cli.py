@@ -10,15 +10,13 @@ __all__ = (
 
 import sys
 from argparse import ArgumentParser, HelpFormatter
-from logging import basicConfig, getLogger
+from datetime import datetime, timezone
+from logging import getLogger
 from pathlib import Path
 
-from pyotp import parse_uri as otp_parse_uri
-
 from .config import Config
-from .exceptions import CryptoBobError
-from .kraken import KrakenClient
-from .runner import Runner
+from .exceptions import ConfigError, CryptoBobError
+from .helpers import init_logging
 
 LOGGER = getLogger(__name__)
 
@@ -36,15 +34,7 @@ class CLI:
         :param int level: The logging level
         :param bool simple: Enable simple logging
         '''
-        if simple:
-            log_format = '%(message)s'
-        else:
-            log_format = '%(asctime)s - %(levelname)s - %(name)s: %(message)s'
-
-        basicConfig(
-            level=(4 - level) * 10,
-            format=log_format,
-        )
+        init_logging(level=level, simple=simple)
 
     def __init__(self):
         '''
@@ -64,30 +54,223 @@ class CLI:
             simple=args.get('simple')
         )
 
+        # The heavy modules are only imported by the actions which need them, to keep the startup fast.
+        # pylint: disable=import-outside-toplevel
+
         try:
 
-            config = Config(args.pop('config'))
-            runner = Runner(config=config)
+            config_paths = self.get_config_paths(args.pop('config'))
 
-            if action == 'run':
-                runner.run()
+            if action == 'otp':
+                self.otp(Config(config_paths[0]))
+                return
+
+            if action == 'assets':
+                self.assets(Config(config_paths[0]))
+                return
+
+            configs = [Config(path) for path in config_paths]
+
+            if action == 'simulate':
+                self.simulate(configs[0], args)
+                return
+
+            if action == 'run' and args.get('processes', 1) > 1:
+                from .supervisor import Supervisor
+
+                Supervisor(
+                    config_paths=config_paths,
+                    processes=args['processes'],
+                    run_dir=args['run_dir'].expanduser(),
+                    workers=args.get('workers'),
+                    verbose=args.get('verbose') or 0,
+                    simple=args.get('simple'),
+                ).run()
+                return
+
+            if action == 'run' and len(configs) > 1:
+                from .multirunner import MultiRunner
+
+                MultiRunner(configs=configs, workers=args.get('workers')).run()
+                return
 
-            elif action == 'buy':
-                runner.buy()
+            from .runner import Runner
 
-            elif action == 'assets':
-                sys.stdout.write('ID         | Altname\n-----------+-----------\n')
-                sys.stdout.write('\n'.join(
-                    f'{item[0]:10s} | {item[1]}' for item in KrakenClient.assets()
-                ) + '\n')
+            if action == 'buy':
+                for config in configs:
+                    Runner(config=config).buy()
+                return
 
-            elif action == 'otp':
-                sys.stdout.write(otp_parse_uri(config.otp_uri).now() + '\n')
+            runner = Runner(config=configs[0])
+
+            if action == 'run':
+                runner.run()
+
+            elif action == 'backtest':
+                self.backtest(runner, args)
 
         except CryptoBobError as ex:
             sys.stderr.write(f'ERROR: {ex}\n')
             sys.exit(1)
 
+    @staticmethod
+    def otp(config):
+        '''
+        Print the current OTP of a config.
+
+        :param config.Config config: The config
+        '''
+        from pyotp import parse_uri  # pylint: disable=import-outside-toplevel
+
+        sys.stdout.write(parse_uri(config.otp_uri).now() + '\n')
+
+    @staticmethod
+    def assets(config):
+        '''
+        Print the assets, for which only a client (without keys) is required.
+
+        :param config.Config config: The config
+        '''
+        from .cache import ResponseCache  # pylint: disable=import-outside-toplevel
+        from .kraken import KrakenClient  # pylint: disable=import-outside-toplevel
+
+        client = KrakenClient(cache=ResponseCache.from_config(config), api_url=config.get('api_url'))
+
+        sys.stdout.write('ID         | Altname\n-----------+-----------\n')
+        sys.stdout.write('\n'.join(f'{item[0]:10s} | {item[1]}' for item in client.assets()) + '\n')
+
+    @staticmethod
+    def backtest(runner, args):
+        '''
+        Backtest the trade plans of a runner and print the results.
+
+        :param runner.Runner runner: The runner
+        :param dict args: The CLI arguments
+
+        :raises ConfigError: When the amounts are invalid
+        '''
+        # pylint: disable=import-outside-toplevel
+        from .backtest import backtest_trade_plans
+        from .helpers import format_interval, parse_interval
+
+        amounts   = None
+        intervals = None
+
+        if args.get('amounts'):
+            try:
+                amounts = [float(item) for item in args['amounts'].split(',')]
+            except ValueError as ex:
+                raise ConfigError(f'Invalid amounts {args["amounts"]!r}') from ex
+
+        if args.get('intervals'):
+            intervals = [parse_interval(item) for item in args['intervals'].split(',')]
+
+        for trade_plan, candles, results in backtest_trade_plans(
+            runner,
+            ohlc=args.get('ohlc'),
+            ohlc_interval=args.get('ohlc_interval'),
+            amounts=amounts,
+            intervals=intervals,
+            fee=args.get('fee'),
+        ):
+            start, end = (datetime.fromtimestamp(candles.time[i], timezone.utc).date() for i in (0, -1))
+
+            sys.stdout.write(
+                f'\n{trade_plan.pair}: {len(candles.time)} candles from {start} to {end}\n\n'
+                '    Amount |  Interval |  Buys | Failed |     Invested |       Fees |         Volume |'
+                '     Avg. price | Withdrawals |       Holdings |    Return\n'
+                '-----------+-----------+-------+--------+--------------+------------+----------------+'
+                '----------------+-------------+----------------+----------\n'
+            )
+
+            for item in results:
+                sys.stdout.write(
+                    f'{item["amount"]:10.2f} | {format_interval(item["interval"]):>9} | '
+                    f'{item["buys"]:5d} | {item["failed"]:6d} | {item["invested"]:12.2f} | '
+                    f'{item["fees"]:10.2f} | {item["volume"]:14.8f} | {item["average_price"]:14.2f} | '
+                    f'{item["withdrawals"]:11d} | {item["holdings"]:14.8f} | {item["return"]:8.2%}\n'
+                )
+
+    @staticmethod
+    def simulate(config, args):
+        '''
+        Simulate the runner of a config on a virtual clock against a fake
+        exchange, then print a summary & write the decision log (if enabled).
+
+        :param config.Config config: The config
+        :param dict args: The CLI arguments
+
+        :raises ConfigError: When the start date or the decision log is invalid
+        '''
+        from .simulate import Simulation  # pylint: disable=import-outside-toplevel
+
+        start = None
+        if args.get('start'):
+            try:
+                start = datetime.fromisoformat(args['start']).replace(tzinfo=timezone.utc).timestamp()
+            except ValueError as ex:
+                raise ConfigError(f'Invalid start date {args["start"]!r}') from ex
+
+        simulation = Simulation(config=config, start=start)
+        summary    = simulation.run(days=args.get('days'))
+
+        if args.get('decision_log'):
+            path = args['decision_log'].expanduser()
+            try:
+                with path.open('w', encoding='utf-8') as file:
+                    simulation.write_decisions(file)
+            except OSError as ex:
+                raise ConfigError(f'Decision log {str(path)!r} not writable, got «{ex}»') from ex
+
+        start, end = (datetime.fromtimestamp(summary[key], timezone.utc).date() for key in ('start', 'end'))
+
+        sys.stdout.write(
+            f'Simulated {start} to {end} in {summary["duration"]:.2f} seconds\n\n'
+            f'Cycles:      {summary["cycles"]}\n'
+            f'Decisions:   {summary["decisions"]}\n'
+            f'Orders:      {sum(summary["orders"].values())} filled, {summary["canceled"]} canceled, '
+            f'{summary["failed"]} failed\n'
+            f'Withdrawals: {summary["withdrawals"]}\n'
+            f'API calls:   {sum(summary["requests"].values())} '
+            f'({", ".join(f"{key}: {value}" for key, value in sorted(summary["requests"].items()))})\n\n'
+            '      Pair |   Orders\n'
+            '-----------+---------\n'
+        )
+
+        for pair, orders in sorted(summary['orders'].items()):
+            sys.stdout.write(f'{pair:>10} | {orders:8d}\n')
+
+    @staticmethod
+    def get_config_paths(paths):
+        '''
+        Get the config paths, while directories are expanded to the YAML files
+        they contain.
+
+        :param paths: The config paths
+        :type paths: None or list
+
+        :return: The config paths
+        :rtype: list
+
+        :raises ConfigError: When a config directory doesn't contain any config
+        '''
+        config_paths = []
+
+        for path in paths or [Path('~/.cryptobob.yml')]:
+            path = path.expanduser()
+
+            if not path.is_dir():
+                config_paths.append(path)
+                continue
+
+            found = sorted(item for item in path.iterdir() if item.suffix in ('.yml', '.yaml'))
+            if not found:
+                raise ConfigError(f'Configuration directory {str(path)!r} contains no configs')
+
+            config_paths.extend(found)
+
+        return config_paths
+
     def init_parser(self):
         '''
         Initialise the argument parser.
@@ -103,8 +286,78 @@ class CLI:
         self.parser.add_argument(
             '-c', '--config',
             type=Path,
-            default='~/.cryptobob.yml',
-            help='path to the CryptoBob config',
+            action='append',
+            help='path to the CryptoBob config or a directory of configs '
+                 '(repeat to run multiple accounts, default: ~/.cryptobob.yml)',
+        )
+
+        self.parser.add_argument(
+            '-w', '--workers',
+            type=int,
+            default=4,
+            help='max number of accounts which run concurrently',
+        )
+
+        self.parser.add_argument(
+            '-p', '--processes',
+            type=int,
+            default=1,
+            help='number of worker processes to split the accounts & trade plans across',
+        )
+
+        self.parser.add_argument(
+            '--run-dir',
+            type=Path,
+            default='~/.cache/cryptobob/run',
+            help='directory to coordinate API keys across worker processes',
+        )
+
+        self.parser.add_argument(
+            '--ohlc',
+            help='backtest: OHLC CSV file, where {pair} is replaced by the trading pair '
+                 '(default: fetch from Kraken)',
+        )
+
+        self.parser.add_argument(
+            '--ohlc-interval',
+            type=int,
+            default=1440,
+            help='backtest: candle interval in minutes when fetching from Kraken',
+        )
+
+        self.parser.add_argument(
+            '--amounts',
+            help='backtest: comma-separated amounts to sweep (default: trade plan amount)',
+        )
+
+        self.parser.add_argument(
+            '--intervals',
+            help='backtest: comma-separated intervals to sweep, e.g. 1d,1w (default: trade plan interval)',
+        )
+
+        self.parser.add_argument(
+            '--fee',
+            type=float,
+            default=0.004,
+            help='backtest: trading fee rate',
+        )
+
+        self.parser.add_argument(
+            '--days',
+            type=float,
+            default=90,
+            help='simulate: number of days to simulate',
+        )
+
+        self.parser.add_argument(
+            '--start',
+            help='simulate: start date, e.g. 2024-01-01 (default: now)',
+        )
+
+        self.parser.add_argument(
+            '--decision-log',
+            type=Path,
+            help='simulate: path of the decision log (JSON lines)',
         )
 
         self.parser.add_argument(
@@ -121,7 +374,7 @@ class CLI:
 
         self.parser.add_argument(
             'action',
-            choices=['run', 'buy', 'assets', 'otp'],
+            choices=['run', 'buy', 'assets', 'backtest', 'simulate', 'otp'],
             help='action to execute',
         )
 
@@ -0,0 +1,63 @@
+'''
+CryptoBob clock module.
+'''
+
+__all__ = (
+    'Clock',
+    'VirtualClock',
+)
+
+import time
+
+
+class Clock:
+    '''
+    The real wall clock, which is used by the runner, the trade plans and the
+    withdrawals to get the current time and to sleep.
+    '''
+
+    def time(self):
+        '''
+        Get the current time.
+
+        :return: The UNIX timestamp
+        :rtype: float
+        '''
+        return time.time()
+
+    def sleep(self, seconds):
+        '''
+        Sleep for a duration.
+
+        :param float seconds: The duration in seconds
+        '''
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    '''
+    A virtual clock, which doesn't sleep at all, but advances its time
+    instead. This way months of runner cycles can be simulated in seconds.
+
+    :param float start: The UNIX timestamp at which the clock starts
+    '''
+
+    def __init__(self, start):
+        self.now = float(start)
+
+    def time(self):
+        '''
+        Get the current virtual time.
+
+        :return: The UNIX timestamp
+        :rtype: float
+        '''
+        return self.now
+
+    def sleep(self, seconds):
+        '''
+        Advance the virtual time instead of sleeping.
+
+        :param float seconds: The duration in seconds
+        '''
+        self.now += max(0.0, seconds)
@@ -6,16 +6,18 @@ __all__ = (
     'Config',
 )
 
+import os
+from hashlib import sha256
 from logging import getLogger
-
-from yaml import safe_load
+from marshal import dumps, loads
+from pathlib import Path
 
 from .exceptions import ConfigError
 
 LOGGER = getLogger(__name__)
 
 
-class Config:  # pylint: disable=too-few-public-methods
+class Config:
     '''
     Configuration class of CryptoBob.
 
@@ -24,12 +26,32 @@ class Config:  # pylint: disable=too-few-public-methods
     instance attributes. If a parameter wasn't found, an exception is
     raised.
 
+    Additionally, the configuration can be split into fragments, which are
+    YAML files in the ``.d`` directory next to the configuration (e.g.
+    ``~/.cryptobob.d/`` for ``~/.cryptobob.yml``). The fragments are merged
+    in alphabetical order, where lists (e.g. trade plans) are extended and
+    all other parameters are overwritten.
+
+    Parsing YAML is slow, therefore the merged configuration is cached in
+    :attr:`cache_dir` as marshalled data, which is keyed by the path and
+    invalidated as soon as the modification time or size of the
+    configuration or one of its fragments changes. Since the cache contains
+    the keys, it's only accessible by the owner, and it's ignored otherwise.
+
     :param pathlib.Path path: The path to the config
     '''
 
+    #: The directory of the configuration cache (``None`` disables the cache).
+    cache_dir = Path('~/.cache/cryptobob/config')
+
+    #: The version of the configuration cache format.
+    cache_version = 1
+
     def __init__(self, path):
-        self.data = {}
-        self.path = path.expanduser()
+        self.data      = {}
+        self.path      = path.expanduser()
+        self.fragments = self.path.with_suffix('.d')
+        self.mtimes    = None
 
         self.verify_permissions()
         self.load()
@@ -56,25 +78,221 @@ class Config:  # pylint: disable=too-few-public-methods
         '''
         return self.data.get(attr, default)
 
-    def verify_permissions(self):
+    def verify_permissions(self, path=None):
         '''
-        Verify the permissions of the configuration file.
+        Verify the permissions of the configuration file (or a fragment).
+
+        :param path: The path (optional, defaults to the configuration file)
+        :type path: None or pathlib.Path
 
         :raises ConfigError: When configuration file is missing or permissions too open
         '''
-        loc = str(self.path)
+        path = path or self.path
+        loc  = str(path)
 
-        if not self.path.is_file():
+        if not path.is_file():
             raise ConfigError(f'Configuration file {loc!r} not found')
 
-        if self.path.stat().st_mode & 0o77:
+        if path.stat().st_mode & 0o77:
             raise ConfigError(f'Configuration file {loc!r} must only be accessible by owner')
 
+    def get_fragment_paths(self):
+        '''
+        Get the paths of the configuration fragments.
+
+        :return: The fragment paths in alphabetical order
+        :rtype: list
+        '''
+        if not self.fragments.is_dir():
+            return []
+
+        return sorted(item for item in self.fragments.iterdir() if item.suffix in ('.yml', '.yaml'))
+
+    def get_mtimes(self):
+        '''
+        Get the modification times (and sizes) of the configuration file, the
+        fragment directory and the fragments.
+
+        :return: The modification times in nanoseconds & sizes by path
+        :rtype: dict
+        '''
+        mtimes = {}
+
+        for path in [self.path, self.fragments, *self.get_fragment_paths()]:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            mtimes[str(path)] = (stat.st_mtime_ns, stat.st_size)
+
+        return mtimes
+
+    @staticmethod
+    def read(path):
+        '''
+        Read a YAML file.
+
+        :param pathlib.Path path: The path
+
+        :return: The data
+        :rtype: dict
+
+        :raises ConfigError: When the YAML file is invalid
+        '''
+        # PyYAML is only imported when the configuration isn't cached, since importing it is slow.
+        from yaml import YAMLError, safe_load  # pylint: disable=import-outside-toplevel
+
+        try:
+            with path.open('r', encoding='utf-8') as file:
+                data = safe_load(file)
+        except (OSError, YAMLError) as ex:
+            raise ConfigError(f'Configuration file {str(path)!r} not readable, got «{ex}»') from ex
+
+        if data is None:
+            return {}
+
+        if not isinstance(data, dict):
+            raise ConfigError(f'Configuration file {str(path)!r} must contain a mapping')
+
+        return data
+
+    def get_cache_path(self):
+        '''
+        Get the path of the configuration cache.
+
+        :return: The cache path, or ``None`` when the cache is disabled
+        :rtype: None or pathlib.Path
+        '''
+        if not self.cache_dir:
+            return None
+
+        key = sha256(str(self.path.resolve()).encode('utf-8')).hexdigest()[:32]
+
+        return self.cache_dir.expanduser() / f'{key}.marshal'
+
+    def read_cache(self, mtimes):
+        '''
+        Read the cached configuration.
+
+        :param dict mtimes: The current modification times & sizes
+
+        :return: The data, or ``None`` when it isn't cached or outdated
+        :rtype: None or dict
+        '''
+        path = self.get_cache_path()
+        if not path:
+            return None
+
+        try:
+            with path.open('rb') as file:
+                stat = os.fstat(file.fileno())
+                if stat.st_uid != os.getuid() or stat.st_mode & 0o77:
+                    LOGGER.warning('Ignoring configuration cache %r, it must only be accessible by owner',
+                                   str(path))
+                    return None
+                version, cached_path, cached_mtimes, data = loads(file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError) as ex:
+            LOGGER.debug('Ignoring invalid configuration cache %r, got «%s»', str(path), ex)
+            return None
+
+        if version != self.cache_version or cached_path != str(self.path) or cached_mtimes != mtimes:
+            return None
+
+        LOGGER.debug('Loaded configuration from cache %r', str(path))
+
+        return data
+
+    def write_cache(self, mtimes, data):
+        '''
+        Write the configuration to the cache.
+
+        :param dict mtimes: The modification times & sizes
+        :param dict data: The data
+        '''
+        path = self.get_cache_path()
+        if not path:
+            return
+
+        try:
+            content = dumps((self.cache_version, str(self.path), mtimes, data))
+        except ValueError as ex:
+            LOGGER.debug('Configuration not cacheable, got «%s»', ex)
+            return
+
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+        try:
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:
+                file.write(content)
+            os.replace(tmp, path)
+        except OSError as ex:
+            LOGGER.warning('Writing configuration cache %r failed, got «%s»', str(path), ex)
+
     def load(self):
         '''
-        Load the configuration file.
+        Load the configuration file and its fragments, either from the cache
+        or by parsing them.
         '''
         LOGGER.debug('Loading configuration from %r', str(self.path))
 
-        with self.path.open('r', encoding='utf-8') as file:
-            self.data = safe_load(file)
+        mtimes    = self.get_mtimes()
+        fragments = self.get_fragment_paths()
+
+        for path in fragments:
+            self.verify_permissions(path)
+
+        data = self.read_cache(mtimes)
+
+        if data is None:
+            data = self.read(self.path)
+
+            for path in fragments:
+                LOGGER.debug('Loading configuration fragment from %r', str(path))
+
+                for key, value in self.read(path).items():
+                    if isinstance(value, list) and isinstance(data.get(key), list):
+                        data[key] = data[key] + value
+                    else:
+                        data[key] = value
+
+            self.write_cache(mtimes, data)
+
+        self.data   = data
+        self.mtimes = mtimes
+
+    def changed(self):
+        '''
+        Check if the configuration file or its fragments changed since they
+        were loaded.
+
+        :return: The changed flag
+        :rtype: bool
+        '''
+        return self.get_mtimes() != self.mtimes
+
+    def reload(self):
+        '''
+        Reload the configuration, if it changed.
+
+        :return: The configuration was reloaded
+        :rtype: bool
+
+        :raises ConfigError: When the changed configuration is invalid
+        '''
+        mtimes = self.get_mtimes()
+        if mtimes == self.mtimes:
+            return False
+
+        # Remember the changes right away, so an invalid configuration is only reported once.
+        self.mtimes = mtimes
+
+        LOGGER.info('Configuration %r changed, reloading it', str(self.path))
+
+        self.verify_permissions()
+        self.load()
+
+        return True
@@ -0,0 +1,283 @@
+'''
+CryptoBob HTTP connection module.
+'''
+
+__all__ = (
+    'ConnectionPool',
+    'Response',
+    'Timing',
+)
+
+from collections import namedtuple
+from gzip import decompress
+from http.client import HTTPConnection, HTTPException, HTTPSConnection, RemoteDisconnected
+from logging import getLogger
+from select import select
+from threading import Lock
+from time import perf_counter
+
+from .exceptions import ConfigError
+
+LOGGER = getLogger(__name__)
+
+Timing = namedtuple('Timing', ('connect', 'ttfb', 'total', 'reused'))
+Timing.__doc__ = '''
+Timings of a single HTTP request in seconds.
+
+The ``connect`` time is ``0.0`` when an existing keep-alive connection was
+reused, ``ttfb`` is the time until the response headers were received, and
+``total`` is the time until the whole response body was read.
+'''
+
+Response = namedtuple('Response', ('status', 'body', 'timing'))
+Response.__doc__ = '''
+A decoded HTTP response with its status code, body (bytes) and timing.
+'''
+
+
+class ConnectionPool:
+    '''
+    A simple pool of persistent keep-alive HTTP(S) connections.
+
+    Establishing a new TCP connection, doing the DNS lookup and the TLS
+    handshake costs a multiple of the actual API round-trip. Therefore the
+    pool keeps idle connections to the hosts around and reuses them for
+    subsequent requests. Idle connections which were closed by the server in
+    the meantime are discarded before they're reused. When a reused connection
+    fails nevertheless, the request is transparently resent on a fresh
+    connection, as long as it wasn't written yet, or it's idempotent. Other
+    requests (e.g. ``AddOrder``) might have been received by the server
+    already, therefore their errors are raised instead of sending them twice.
+
+    The pool is thread-safe, it hands out each connection to a single
+    request only.
+
+    Each connection has a connect timeout, and a read timeout which applies
+    to each socket operation of a request, so that a hung connection fails
+    with a :class:`TimeoutError` instead of stalling the runner.
+
+    :param int maxsize: The max number of idle connections kept per host
+    :param connect_timeout: The connect timeout in seconds (``None`` to wait forever)
+    :type connect_timeout: None or float
+    :param read_timeout: The read timeout in seconds (``None`` to wait forever)
+    :type read_timeout: None or float
+    '''
+
+    #: The connection class per URL scheme.
+    connection_classes = {
+        'http': HTTPConnection,
+        'https': HTTPSConnection,
+    }
+
+    #: Errors which indicate that a reused connection was closed by the server.
+    reconnect_errors = (
+        BrokenPipeError,
+        ConnectionResetError,
+        ConnectionAbortedError,
+        RemoteDisconnected,
+    )
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        '''
+        Create a connection pool from a ``timeout`` configuration, which
+        defines the ``connect`` and ``read`` timeouts in seconds.
+
+        :param config: The timeout configuration
+        :type config: None or dict
+        :param dict \\**kwargs: Additional constructor arguments
+
+        :return: The connection pool
+        :rtype: ConnectionPool
+
+        :raises ConfigError: When the configuration is invalid
+        '''
+        config   = dict(config or {})
+        timeouts = {f'{key}_timeout': config.pop(key) for key in ('connect', 'read') if key in config}
+
+        if config:
+            raise ConfigError(f'Unknown timeout configuration {", ".join(sorted(config))}')
+
+        return cls(**timeouts, **kwargs)
+
+    def __init__(self, maxsize=4, connect_timeout=10.0, read_timeout=30.0):
+        self.maxsize         = maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout    = read_timeout
+        self.idle            = {}
+        self.lock            = Lock()
+
+    def acquire(self, host, scheme='https'):
+        '''
+        Get an idle connection for a host, or create a new one.
+
+        :param str host: The host
+        :param str scheme: The URL scheme
+
+        :return: The connection & if it was reused
+        :rtype: tuple(http.client.HTTPConnection, bool)
+        '''
+        while True:
+            with self.lock:
+                idle = self.idle.get((scheme, host))
+                if not idle:
+                    break
+                connection = idle.pop()
+
+            if not self.is_closed(connection):
+                return connection, True
+
+            LOGGER.debug('Idle connection to %r was closed by server, discarding it', f'{scheme}://{host}')
+            connection.close()
+
+        LOGGER.debug('Creating new connection to %r', f'{scheme}://{host}')
+        return self.connection_classes[scheme](host, timeout=self.connect_timeout), False
+
+    @staticmethod
+    def is_closed(connection):
+        '''
+        Check if an idle connection was closed by the server, i.e. its socket
+        is readable, although no request was sent.
+
+        :param http.client.HTTPConnection connection: The connection
+
+        :return: The closed flag
+        :rtype: bool
+        '''
+        if connection.sock is None:
+            return False
+
+        try:
+            return bool(select([connection.sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def release(self, host, connection, scheme='https'):
+        '''
+        Put a connection back into the pool, or close it when the pool is full.
+
+        :param str host: The host
+        :param http.client.HTTPConnection connection: The connection
+        :param str scheme: The URL scheme
+        '''
+        with self.lock:
+            idle = self.idle.setdefault((scheme, host), [])
+            if len(idle) < self.maxsize:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def close(self):
+        '''
+        Close all idle connections.
+        '''
+        with self.lock:
+            idle, self.idle = self.idle, {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def request(self, host, method, path, body=None, headers=None, scheme='https',  # pylint: disable=too-many-arguments
+                idempotent=True):
+        '''
+        Send an HTTP request over a pooled connection.
+
+        :param str host: The host
+        :param str method: The HTTP method
+        :param str path: The path incl. the query string
+        :param body: The request body
+        :type body: None or bytes
+        :param headers: The request headers
+        :type headers: None or dict
+        :param str scheme: The URL scheme
+        :param bool idempotent: The request may be resent after it was written
+
+        :return: The response
+        :rtype: Response
+
+        :raises http.client.HTTPException: When the HTTP request failed
+        :raises OSError: When the connection failed
+        '''
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        headers.setdefault('Connection', 'keep-alive')
+
+        while True:
+            connection, reused = self.acquire(host, scheme)
+            written            = False
+
+            try:
+                start, connected = self._write(connection, method, path, body, headers)
+                written          = True
+                return self._read((host, scheme), connection, reused, start, connected)
+            except self.reconnect_errors:
+                connection.close()
+                if not reused or (written and not idempotent):
+                    raise
+                LOGGER.debug('Reused connection to %r was closed by server, reconnecting', host)
+            except (HTTPException, OSError):
+                connection.close()
+                raise
+
+    def _write(self, connection, method, path, body, headers):  # pylint: disable=too-many-arguments
+        '''
+        Connect (if required), and write the request to a connection.
+
+        :param http.client.HTTPConnection connection: The connection
+        :param str method: The HTTP method
+        :param str path: The path incl. the query string
+        :param body: The request body
+        :type body: None or bytes
+        :param dict headers: The request headers
+
+        :return: The performance counters at the start & after connecting
+        :rtype: tuple(float, float)
+        '''
+        start = perf_counter()
+
+        if connection.sock is None:
+            connection.connect()
+            connection.sock.settimeout(self.read_timeout)
+
+        connected = perf_counter()
+
+        connection.request(method, path, body=body, headers=headers)
+
+        return start, connected
+
+    def _read(self, origin, connection, reused, start, connected):  # pylint: disable=too-many-arguments
+        '''
+        Read the response of a written request from a connection.
+
+        :param tuple origin: The host & URL scheme
+        :param http.client.HTTPConnection connection: The connection
+        :param bool reused: The connection was reused
+        :param float start: The performance counter at the start
+        :param float connected: The performance counter after connecting
+
+        :return: The response
+        :rtype: Response
+        '''
+        response = connection.getresponse()
+        ttfb     = perf_counter()
+        data     = response.read()
+
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            data = decompress(data)
+
+        end    = perf_counter()
+        timing = Timing(
+            connect=connected - start,
+            ttfb=ttfb - start,
+            total=end - start,
+            reused=reused,
+        )
+
+        if response.will_close:
+            connection.close()
+        else:
+            self.release(origin[0], connection, origin[1])
+
+        return Response(status=response.status, body=data, timing=timing)
@@ -0,0 +1,180 @@
+'''
+CryptoBob coordination module.
+'''
+
+__all__ = (
+    'KeyCoordinator',
+    'SharedRateLimiter',
+)
+
+import os
+from contextlib import contextmanager
+from fcntl import LOCK_EX, LOCK_UN, flock
+from hashlib import sha256
+from logging import getLogger
+from struct import Struct
+from threading import RLock
+from time import sleep, time
+
+from .exceptions import ConfigError
+from .ratelimit import RateLimiter
+
+LOGGER = getLogger(__name__)
+
+
+class KeyCoordinator:
+    '''
+    Coordinates the usage of a single API key across multiple processes.
+
+    The state of an API key is kept in a small file, which is only accessed
+    while holding an exclusive file lock. It contains the nonce high-water
+    mark and the rate limit counter (incl. the time it was last updated), so
+    that worker processes never race on the nonce or exceed the rate limit of
+    the same API key.
+
+    Since file locks are held per process, the threads of a process are
+    serialised by a lock as well. The state file can be locked again by the
+    thread which holds the lock already, e.g. to keep it locked from the
+    generation of a nonce until the request was sent.
+
+    :param pathlib.Path run_dir: The directory of the state files
+    :param str api_key: The API key
+    '''
+
+    layout = Struct('!Qdd')
+
+    def __init__(self, run_dir, api_key):
+        run_dir = run_dir.expanduser()
+        name    = sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+        try:
+            run_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            self.fd = os.open(run_dir / f'{name}.key', os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as ex:
+            raise ConfigError(f'Run directory {str(run_dir)!r} not accessible, got «{ex}»') from ex
+
+        self.lock  = RLock()
+        self.state = None
+
+    def __del__(self):
+        fd = getattr(self, 'fd', None)
+        if fd is not None:
+            os.close(fd)
+
+    @contextmanager
+    def locked(self):
+        '''
+        Lock the state file and yield its current state.
+
+        The yielded list can be modified, and is written back to the file
+        before the outermost lock is released.
+
+        :return: The nonce high-water mark, rate limit counter & update time
+        :rtype: generator
+        '''
+        with self.lock:
+            if self.state is not None:
+                yield self.state
+                return
+
+            flock(self.fd, LOCK_EX)
+
+            try:
+                data       = os.pread(self.fd, self.layout.size, 0)
+                state      = list(self.layout.unpack(data)) if len(data) == self.layout.size else [0, 0.0, 0.0]
+                old        = list(state)
+                self.state = state
+
+                try:
+                    yield state
+                finally:
+                    # Write back even on errors, since a nonce might have been sent anyway.
+                    if state != old:
+                        os.pwrite(self.fd, self.layout.pack(*state), 0)
+            finally:
+                self.state = None
+                flock(self.fd, LOCK_UN)
+
+    def next_nonce(self, candidate):
+        '''
+        Get the next nonce, which is guaranteed to be higher than any nonce
+        used by another process for the same API key.
+
+        To ensure the nonces also reach Kraken in order, the state file must
+        be kept locked (see :meth:`locked`) until the request was sent.
+
+        :param int candidate: The nonce candidate (e.g. a timestamp)
+
+        :return: The nonce
+        :rtype: int
+        '''
+        with self.locked() as state:
+            state[0] = max(state[0] + 1, candidate)
+            return state[0]
+
+
+class SharedRateLimiter(RateLimiter):
+    '''
+    A rate limiter, which shares its counter with other processes via a key
+    coordinator.
+
+    :param KeyCoordinator coordinator: The key coordinator
+    :param \\**kwargs: The rate limiter arguments
+    '''
+
+    def __init__(self, coordinator, **kwargs):
+        super().__init__(**kwargs)
+        self.coordinator = coordinator
+
+    def _shared(self, cost=0.0, minimum=0.0):
+        '''
+        Decay the shared counter, add a cost, and ensure a minimum.
+
+        :param float cost: The cost to add
+        :param float minimum: The minimum counter
+
+        :return: The counter
+        :rtype: float
+        '''
+        with self.coordinator.locked() as state:
+            now      = time()
+            counter  = max(0.0, state[1] - (now - state[2]) * self.decay)
+            counter  = max(counter + cost, minimum)
+            state[1] = counter
+            state[2] = now
+            return counter
+
+    @property
+    def counter(self):
+        '''
+        The current shared call counter.
+
+        :return: The counter
+        :rtype: float
+        '''
+        return self._shared()
+
+    def acquire(self, api_method):
+        '''
+        Reserve the cost of an API call in the shared counter and wait until
+        it can be sent.
+
+        :param str api_method: The API method
+        '''
+        cost = self.costs.get(api_method, 1)
+        if not cost:
+            return
+
+        counter = self._shared(cost=cost)
+        wait    = (counter - self.max_counter) / self.decay
+
+        if wait > 0:
+            LOGGER.debug('Shared rate limit counter at %.2f, delaying %s for %.2f seconds',
+                         counter, api_method, wait)
+            sleep(wait)
+
+    def exceeded(self):
+        '''
+        Register that Kraken reported an exceeded rate limit.
+        '''
+        self._shared(minimum=float(self.max_counter))
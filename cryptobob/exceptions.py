@@ -27,6 +27,20 @@ class StatusError(ResponseError):
     '''
 
 
+class TransientError(ResponseError):
+    '''
+    Exception which is thrown when a request failed temporarily (e.g. because
+    of a timeout or an HTTP 5xx error), so that it can be retried.
+    '''
+
+
+class CircuitOpenError(ResponseError):
+    '''
+    Exception which is thrown when a request isn't sent, because the circuit
+    of its endpoint is open.
+    '''
+
+
 class TradePlanError(CryptoBobError):
     '''
     Exception which is thrown when there's an error in the trade plan.
@@ -0,0 +1,227 @@
+'''
+CryptoBob funding module.
+'''
+
+__all__ = (
+    'FundingTracker',
+)
+
+from logging import getLogger
+from threading import Lock
+
+from .metrics import WITHDRAWALS
+
+LOGGER = getLogger(__name__)
+
+
+class FundingTracker:  # pylint: disable=too-many-instance-attributes
+    '''
+    The funding tracker, which caches the withdrawal metadata and tracks the
+    in-flight withdrawals.
+
+    The ``WithdrawInfo`` (i.e. the method, limit & fee) and ``WithdrawMethods``
+    (i.e. the minimum) results rarely change, therefore they're cached with a
+    TTL, per asset, key & amount (since the fee might depend on the amount)
+    and per asset respectively. Both are used to skip doomed withdrawals,
+    instead of sending them blindly.
+
+    Initiated withdrawals are tracked until their status is final. Their
+    status is only queried when a withdrawal of the same asset is due again,
+    via a single ``WithdrawStatus`` request per asset. As long as a withdrawal
+    is still in-flight, no other withdrawal of the same asset is initiated.
+    Nothing ever waits for a withdrawal to complete.
+
+    :param kraken.KrakenClient client: The client
+    :param clock.Clock clock: The clock
+    :param float ttl: The TTL of the withdrawal metadata in seconds
+    :param float timeout: The time in seconds after which withdrawals without
+                          status are no longer tracked
+    '''
+
+    #: The statuses of withdrawals which are final.
+    final_status = ('Success', 'Failure')
+
+    #: The additional status properties of withdrawals which are final.
+    final_status_prop = ('canceled', 'return')
+
+    def __init__(self, client, clock, ttl=3600, timeout=604800):
+        self.client  = client
+        self.clock   = clock
+        self.ttl     = ttl
+        self.timeout = timeout
+        self.info    = {}
+        self.methods = {}
+        self.pending = {}
+        self.lock    = Lock()
+
+    def cached(self, cache, cache_key, api_method, **data):
+        '''
+        Get a cached result, or request it when it's missing or expired.
+
+        :param dict cache: The cache
+        :param tuple cache_key: The cache key
+        :param str api_method: The API method
+        :param dict \\**data: The API data
+
+        :return: The result
+        :rtype: mixed
+        '''
+        now   = self.clock.time()
+        entry = cache.get(cache_key)
+
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        for expired in [key for key, (expiry, _) in list(cache.items()) if expiry <= now]:
+            cache.pop(expired, None)
+
+        result           = self.client.request(api_method, **data)
+        cache[cache_key] = (now + self.ttl, result)
+
+        return result
+
+    def get_limits(self, asset, key, amount):
+        '''
+        Get the limits of a withdrawal.
+
+        :param str asset: The asset
+        :param str key: The withdrawal key
+        :param float amount: The amount
+
+        :return: The max amount, the min amount & the fee
+        :rtype: tuple(float, float, float)
+
+        :raises exceptions.ResponseError: When the metadata couldn't be retrieved
+        '''
+        info    = self.cached(self.info, (asset, key, amount), 'WithdrawInfo', asset=asset, key=key, amount=amount)
+        methods = self.cached(self.methods, (asset,), 'WithdrawMethods', asset=asset)
+        method  = info.get('method')
+        minimum = next((item.get('minimum') for item in methods if item.get('method') == method), 0)
+
+        return float(info.get('limit') or 0), float(minimum or 0), float(info.get('fee') or 0)
+
+    def validate(self, asset, key, amount):
+        '''
+        Validate a withdrawal against its limits.
+
+        The amount is capped at the withdrawal limit.
+
+        :param str asset: The asset
+        :param str key: The withdrawal key
+        :param float amount: The amount
+
+        :return: The decision, reason & the (capped) amount
+        :rtype: tuple(bool, str, float)
+
+        :raises exceptions.ResponseError: When the metadata couldn't be retrieved
+        '''
+        limit, minimum, fee = self.get_limits(asset=asset, key=key, amount=amount)
+        amount              = min(amount, limit)
+
+        if amount <= 0:
+            return False, f'Withdrawal limit of {limit:f} exhausted', amount
+
+        if amount < minimum:
+            return False, f'Amount {amount:f} below withdrawal minimum {minimum:f}', amount
+
+        if amount <= fee:
+            return False, f'Amount {amount:f} does not exceed withdrawal fee {fee:f}', amount
+
+        return True, f'Amount {amount:f} within withdrawal limits', amount
+
+    def add(self, asset, refid, amount):
+        '''
+        Track an initiated withdrawal.
+
+        Withdrawals without reference ID can't be matched with their status,
+        therefore they're not tracked at all.
+
+        :param str asset: The asset
+        :param refid: The reference ID
+        :type refid: None or str
+        :param float amount: The amount
+        '''
+        if not refid:
+            LOGGER.warning('Withdrawal of %f %s has no reference ID, not tracking it', amount, asset)
+            return
+
+        with self.lock:
+            self.pending.setdefault(asset, {})[refid] = {'amount': amount, 'time': self.clock.time()}
+
+    def is_pending(self, asset):
+        '''
+        Check if there are in-flight withdrawals of an asset.
+
+        :param str asset: The asset
+
+        :return: The pending flag
+        :rtype: bool
+        '''
+        return bool(self.pending.get(asset))
+
+    def update_status(self, asset):
+        '''
+        Update the status of the in-flight withdrawals of an asset.
+
+        :param str asset: The asset
+
+        :return: The number of failed withdrawals
+        :rtype: int
+
+        :raises exceptions.ResponseError: When the status couldn't be retrieved
+        '''
+        LOGGER.debug('Updating status of in-flight %s withdrawals', asset)
+
+        statuses = {item.get('refid'): item for item in self.client.request('WithdrawStatus', asset=asset)}
+        failed   = 0
+        now      = self.clock.time()
+
+        with self.lock:
+            pending = self.pending.get(asset, {})
+
+            for refid in list(pending):
+                item = statuses.get(refid)
+                if item is None:
+                    if now > pending[refid]['time'] + self.timeout:
+                        LOGGER.warning('Withdrawal %s of %s has no status, no longer tracking it', refid, asset)
+                        del pending[refid]
+                    continue
+
+                status = item.get('status')
+                prop   = item.get('status-prop')
+
+                if status not in self.final_status and prop not in self.final_status_prop:
+                    continue
+
+                del pending[refid]
+
+                if status == 'Success' and prop is None:
+                    LOGGER.info('Withdrawal %s of %s succeeded', refid, asset)
+                    WITHDRAWALS.labels(asset, 'succeeded').inc()
+                else:
+                    LOGGER.warning('Withdrawal %s of %s failed with status %s (%s)', refid, asset, status, prop)
+                    WITHDRAWALS.labels(asset, 'failed').inc()
+                    failed += 1
+
+            if not pending:
+                self.pending.pop(asset, None)
+
+        return failed
+
+    def load(self, state):
+        '''
+        Load the in-flight withdrawals from the state store.
+
+        :param state.StateStore state: The state store
+        '''
+        with self.lock:
+            self.pending = state.get('pending_withdrawals', {})
+
+    def save(self, state):
+        '''
+        Save the in-flight withdrawals to the state store.
+
+        :param state.StateStore state: The state store
+        '''
+        with self.lock:
+            state.set('pending_withdrawals', self.pending)
@@ -0,0 +1,96 @@
+'''
+CryptoBob helpers module, i.e. the helpers shared by otherwise unrelated
+modules (e.g. the backtests & the indicators, or the CLI & the workers).
+'''
+
+__all__ = (
+    'INTERVAL_UNITS',
+    'format_interval',
+    'init_logging',
+    'numpy',
+    'parse_interval',
+)
+
+from logging import basicConfig
+from re import fullmatch
+
+from .exceptions import ConfigError, CryptoBobError
+
+#: The units of interval specs in seconds.
+INTERVAL_UNITS = {
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 604800,
+}
+
+
+def init_logging(level, simple=False):
+    '''
+    Initialise the logging config.
+
+    :param int level: The logging level
+    :param bool simple: Enable simple logging
+    '''
+    if simple:
+        log_format = '%(message)s'
+    else:
+        log_format = '%(asctime)s - %(levelname)s - %(name)s: %(message)s'
+
+    basicConfig(
+        level=(4 - level) * 10,
+        format=log_format,
+    )
+
+
+def numpy():
+    '''
+    Import NumPy, which is an optional dependency.
+
+    :return: The NumPy module
+    :rtype: module
+
+    :raises CryptoBobError: When NumPy isn't installed
+    '''
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel,redefined-outer-name
+    except ImportError as ex:
+        raise CryptoBobError(
+            'Backtests & indicators require NumPy, install it via «pip install cryptobob[backtest]»'
+        ) from ex
+
+    return numpy
+
+
+def parse_interval(spec):
+    '''
+    Parse an interval spec like ``30m``, ``12h``, ``1d`` or ``2w``.
+
+    :param str spec: The interval spec
+
+    :return: The interval in seconds
+    :rtype: int
+
+    :raises ConfigError: When the interval spec is invalid
+    '''
+    match = fullmatch(r'(\d+)([mhdw])', spec.strip())
+    if not match:
+        raise ConfigError(f'Invalid interval {spec!r}, expected e.g. 30m, 12h, 1d or 2w')
+
+    return int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+
+
+def format_interval(seconds):
+    '''
+    Format an interval in seconds as interval spec (e.g. ``1d``).
+
+    :param float seconds: The interval in seconds
+
+    :return: The interval spec
+    :rtype: str
+    '''
+    for unit, size in sorted(INTERVAL_UNITS.items(), key=lambda item: -item[1]):
+        if seconds >= size and not seconds % size:
+            return f'{int(seconds // size)}{unit}'
+
+    return f'{int(seconds)}s'
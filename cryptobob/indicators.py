@@ -0,0 +1,400 @@
+'''
+CryptoBob indicators module.
+'''
+
+__all__ = (
+    'Condition',
+    'IndicatorEngine',
+    'Series',
+)
+
+from collections import namedtuple
+from logging import getLogger
+from math import inf, log, sqrt
+from threading import Lock
+
+from .exceptions import ConfigError, TradePlanError
+from .helpers import format_interval, numpy, parse_interval
+
+LOGGER = getLogger(__name__)
+
+
+class Series:
+    '''
+    The OHLC series of a trading pair in fixed-size NumPy ring buffers.
+
+    Each candle is stored as row of its close price, volume, traded value
+    (i.e. VWAP × volume), log return and squared log return. For each window
+    (in candles) of an indicator, the running sums of these columns are kept.
+    When a candle is added, its row is added to the sums, while the row which
+    drops out of the window is subtracted. This way the indicators are
+    updated in O(1) per candle, regardless of the window size. The current
+    candle is updated in place until the next one starts.
+
+    To prevent floating point drift, the sums are recalculated from the
+    buffer whenever it wrapped around once.
+
+    :param int size: The max number of candles
+    '''
+
+    #: The columns of the candle rows.
+    columns = ('close', 'volume', 'value', 'return', 'return2')
+
+    def __init__(self, size):
+        np = numpy()
+
+        self.size  = size
+        self.time  = np.zeros(size)
+        self.rows  = np.zeros((size, len(self.columns)))
+        self.count = 0
+        self.sums  = {}
+
+    @property
+    def last_time(self):
+        '''
+        The UNIX timestamp of the current candle.
+
+        :return: The timestamp (``-inf`` when empty)
+        :rtype: float
+        '''
+        return self.time[(self.count - 1) % self.size] if self.count else -inf
+
+    @property
+    def price(self):
+        '''
+        The current price, i.e. the close price of the current candle.
+
+        :return: The price (``None`` when empty)
+        :rtype: None or float
+        '''
+        return float(self.rows[(self.count - 1) % self.size, 0]) if self.count else None
+
+    def add_window(self, window):
+        '''
+        Add the running sums of a window.
+
+        :param int window: The window in candles
+
+        :raises ValueError: When the window exceeds the buffer size
+        '''
+        if window > self.size:
+            raise ValueError(f'Window of {window} candles exceeds buffer of {self.size} candles')
+
+        self.sums[window] = self.window_rows(window).sum(axis=0)
+
+    def window_rows(self, window):
+        '''
+        Get the rows of the last candles.
+
+        :param int window: The window in candles
+
+        :return: The rows (unordered)
+        :rtype: numpy.ndarray
+        '''
+        count = min(window, self.count)
+        index = (self.count - 1 - numpy().arange(count)) % self.size
+
+        return self.rows[index]
+
+    def row(self, close, volume, vwap, previous):
+        '''
+        Create the row of a candle.
+
+        :param float close: The close price
+        :param float volume: The volume
+        :param float vwap: The VWAP
+        :param previous: The close price of the previous candle
+        :type previous: None or float
+
+        :return: The row
+        :rtype: numpy.ndarray
+        '''
+        ret = log(close / previous) if previous else 0.0
+
+        return numpy().array((close, volume, vwap * volume, ret, ret * ret))
+
+    def update(self, timestamp, close, volume, vwap):
+        '''
+        Add a new candle, or update the current one.
+
+        :param float timestamp: The UNIX timestamp of the candle
+        :param float close: The close price
+        :param float volume: The volume
+        :param float vwap: The VWAP
+        '''
+        last_time = self.last_time
+
+        if timestamp < last_time:
+            return
+
+        if timestamp == last_time:
+            index    = (self.count - 1) % self.size
+            previous = self.rows[(self.count - 2) % self.size, 0] if self.count > 1 else None
+            row      = self.row(close, volume, vwap, previous)
+            delta    = row - self.rows[index]
+
+            for sums in self.sums.values():
+                sums += delta
+
+            self.rows[index] = row
+            return
+
+        index = self.count % self.size
+        row   = self.row(close, volume, vwap, self.price)
+
+        for window, sums in self.sums.items():
+            sums += row
+            if self.count >= window:
+                sums -= self.rows[(self.count - window) % self.size]
+
+        self.time[index] = timestamp
+        self.rows[index] = row
+        self.count      += 1
+
+        if not self.count % self.size:
+            for window in self.sums:
+                self.add_window(window)
+
+    def sma(self, window):
+        '''
+        Get the simple moving average of the close prices.
+
+        :param int window: The window in candles
+
+        :return: The SMA (``None`` while the window isn't filled yet)
+        :rtype: None or float
+        '''
+        if self.count < window:
+            return None
+
+        return float(self.sums[window][0] / window)
+
+    def vwap(self, window):
+        '''
+        Get the volume-weighted average price.
+
+        :param int window: The window in candles
+
+        :return: The VWAP (``None`` while the window isn't filled yet, or without volume)
+        :rtype: None or float
+        '''
+        sums = self.sums[window]
+
+        if self.count < window or sums[1] <= 0:
+            return None
+
+        return float(sums[2] / sums[1])
+
+    def volatility(self, window):
+        '''
+        Get the volatility, i.e. the standard deviation of the log returns
+        per candle.
+
+        :param int window: The window in candles
+
+        :return: The volatility (``None`` while the window isn't filled yet)
+        :rtype: None or float
+        '''
+        if self.count <= window:
+            return None
+
+        sums = self.sums[window]
+        mean = sums[3] / window
+
+        return sqrt(max(0.0, sums[4] / window - mean * mean))
+
+
+class Condition(namedtuple('Condition', ('indicator', 'window', 'below', 'above', 'multiplier'))):
+    '''
+    A condition of a trade plan on an indicator.
+
+    The ``sma`` & ``vwap`` indicators are compared to the current price, where
+    ``below`` & ``above`` are factors of the indicator (e.g. a price below
+    ``0.9`` × SMA is 10% under the moving average). The ``volatility`` is
+    compared to ``below`` & ``above`` directly.
+
+    Without a ``multiplier``, the condition is required to open an order.
+    With a ``multiplier``, the order amount is multiplied when the condition
+    is met, while the order is opened regardless.
+    '''
+
+    __slots__ = ()
+
+    #: The supported indicators.
+    indicators = ('sma', 'vwap', 'volatility')
+
+    @classmethod
+    def from_config(cls, indicator, window, below=None, above=None,  # pylint: disable=too-many-arguments
+                    multiplier=None):
+        '''
+        Create a condition from its configuration.
+
+        :param str indicator: The indicator
+        :param str window: The window spec (e.g. ``7d``)
+        :param below: The upper bound (optional)
+        :type below: None or float
+        :param above: The lower bound (optional)
+        :type above: None or float
+        :param multiplier: The amount multiplier (optional)
+        :type multiplier: None or float
+
+        :return: The condition
+        :rtype: Condition
+
+        :raises ConfigError: When the condition is invalid
+        '''
+        if indicator not in cls.indicators:
+            raise ConfigError(f'Unknown indicator {indicator!r}, expected one of {", ".join(cls.indicators)}')
+
+        if below is None and above is None:
+            raise ConfigError(f'Condition on {indicator} requires «below» or «above»')
+
+        return cls(indicator, parse_interval(str(window)), below, above, multiplier)
+
+    def __str__(self):
+        '''
+        The informal string version of the condition.
+
+        :return: The informal string version
+        :rtype: str
+        '''
+        return f'{format_interval(self.window)} {self.indicator}'
+
+    def evaluate(self, series, window, price=None):
+        '''
+        Evaluate the condition.
+
+        :param Series series: The series
+        :param int window: The window in candles
+        :param price: The current price (optional, defaults to the last close price)
+        :type price: None or float
+
+        :return: The condition is met & the reason
+        :rtype: tuple(bool, str)
+
+        :raises TradePlanError: When the indicator isn't available yet
+        '''
+        value = getattr(series, self.indicator)(window)
+        if value is None:
+            raise TradePlanError(f'Indicator {self} not available yet')
+
+        price = series.price if price is None else price
+
+        if self.indicator == 'volatility':
+            actual, scale, subject = value, 1.0, f'{self} {value:f}'
+        else:
+            actual, scale, subject = price, value, f'price {price:f}'
+
+        def bound(factor):
+            return f'{factor:g}' if self.indicator == 'volatility' else f'{factor:g} × {self} {value:f}'
+
+        if self.below is not None and actual >= self.below * scale:
+            return False, f'{subject} not below {bound(self.below)}'
+
+        if self.above is not None and actual <= self.above * scale:
+            return False, f'{subject} not above {bound(self.above)}'
+
+        bounds = [f'{name} {bound(factor)}' for name, factor in (('below', self.below), ('above', self.above))
+                  if factor is not None]
+
+        return True, f'{subject} {" and ".join(bounds)}'
+
+
+class IndicatorEngine:
+    '''
+    The indicator engine, which keeps the OHLC series of the trading pairs
+    of conditional trade plans.
+
+    The first update of a pair fetches the last candles (up to the buffer
+    size), while all further updates only fetch the candles since the
+    ``last`` cursor of the previous response, i.e. typically the current
+    candle only. A pair is updated at most once per :attr:`min_refresh`
+    seconds, so that trade plans of the same pair share an update.
+
+    :param kraken.KrakenClient client: The client
+    :param clock.Clock clock: The clock
+    :param int interval: The candle interval in minutes
+    '''
+
+    #: The size of the OHLC buffers, which is the max number of candles Kraken returns.
+    size = 720
+
+    #: The min time in seconds between updates of a pair.
+    min_refresh = 60
+
+    def __init__(self, client, clock, interval=60):
+        self.client   = client
+        self.clock    = clock
+        self.interval = interval
+        self.series   = {}
+        self.cursors  = {}
+        self.updated  = {}
+        self.lock     = Lock()
+
+    def candles(self, seconds):
+        '''
+        Get the number of candles of a window.
+
+        :param float seconds: The window in seconds
+
+        :return: The number of candles
+        :rtype: int
+
+        :raises ConfigError: When the window doesn't fit into the buffer
+        '''
+        candles = max(1, round(seconds / (self.interval * 60)))
+
+        if candles > self.size:
+            raise ConfigError(f'Indicator window of {format_interval(seconds)} exceeds {self.size} candles '
+                              f'of {self.interval} minutes, increase the «indicator_interval»')
+
+        return candles
+
+    def get(self, pair, windows):
+        '''
+        Get the up-to-date series of a trading pair.
+
+        :param str pair: The trading pair
+        :param list windows: The windows in candles, which are required
+
+        :return: The series
+        :rtype: Series
+
+        :raises exceptions.ResponseError: When the OHLC data couldn't be fetched
+        '''
+        with self.lock:
+            series = self.series.get(pair)
+            if series is None:
+                series = self.series[pair] = Series(self.size)
+
+            for window in windows:
+                if window not in series.sums:
+                    series.add_window(window)
+
+            if self.clock.time() >= self.updated.get(pair, -inf) + self.min_refresh:
+                self.update(pair, series)
+
+            return series
+
+    def update(self, pair, series):
+        '''
+        Update the series of a trading pair with the candles since the cursor.
+
+        :param str pair: The trading pair
+        :param Series series: The series
+
+        :raises exceptions.ResponseError: When the OHLC data couldn't be fetched
+        '''
+        cursor = self.cursors.get(pair)
+        data   = {'pair': pair, 'interval': self.interval, **({'since': cursor} if cursor else {})}
+        result = self.client.request('OHLC', **data)
+        rows   = next(value for key, value in result.items() if key != 'last')
+
+        # Columns: time, open, high, low, close, vwap, volume, count
+        for row in rows:
+            series.update(float(row[0]), float(row[4]), float(row[6]), float(row[5]))
+
+        LOGGER.debug('Updated %s series with %d candles since %r', pair, len(rows), cursor)
+
+        self.cursors[pair] = result.get('last', cursor)
+        self.updated[pair] = self.clock.time()
@@ -6,23 +6,29 @@ __all__ = (
     'KrakenClient',
 )
 
-from base64 import b64decode, b64encode
-from hashlib import sha256, sha512
-from hmac import digest as hmac_digest
-from json import load
-from logging import getLogger
-from time import time
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-
-from pyotp import parse_uri as otp_parse_uri
-
-from .exceptions import ResponseError, StatusError
+from asyncio import to_thread
+from base64 import b64decode
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from http.client import HTTPException
+from json import loads
+from logging import DEBUG, getLogger
+from threading import Lock, RLock
+from time import sleep, time
+from urllib.parse import urlencode, urlsplit
+
+from .cache import MISS
+from .connection import ConnectionPool
+from .exceptions import ConfigError, ResponseError, StatusError, TransientError
+from .metrics import API_REQUEST_DURATION, API_REQUEST_ERRORS, API_REQUEST_RETRIES, API_REQUESTS_SHARED
+from .order import Order
+from .signing import RequestSigner
+from .tracing import TRACER
 
 LOGGER = getLogger(__name__)
 
 
-class KrakenClient:
+class KrakenClient:  # pylint: disable=too-many-instance-attributes
     '''
     The API client to talk to the Kraken REST API.
 
@@ -32,9 +38,24 @@ class KrakenClient:
     :type private_key: None or str
     :param otp_uri: The 2FA / OTP URI retreived from Kraken (optional)
     :type otp_uri: None or str
+    :param pool: The HTTP connection pool (optional)
+    :type pool: None or connection.ConnectionPool
+    :param rate_limiter: The rate limiter for private API calls (optional)
+    :type rate_limiter: None or ratelimit.RateLimiter
+    :param cache: The response cache for public API calls (optional)
+    :type cache: None or cache.ResponseCache
+    :param coordinator: The cross-process coordinator of the API key (optional)
+    :type coordinator: None or coordination.KeyCoordinator
+    :param api_url: The base URL of the API (optional, e.g. for a mock server)
+    :type api_url: None or str
+    :param retry_policy: The retry policy of public & read-only API calls (optional)
+    :type retry_policy: None or resilience.RetryPolicy
+    :param circuit_breaker: The circuit breaker of the API methods (optional)
+    :type circuit_breaker: None or resilience.CircuitBreaker
     '''
 
-    api_host = 'api.kraken.com'
+    api_scheme = 'https'
+    api_host   = 'api.kraken.com'
 
     public_api_methods = [
         'AssetPairs',
@@ -48,22 +69,142 @@ class KrakenClient:
         'Trades',
     ]
 
-    @classmethod
-    def assets(cls):
+    #: Private API methods which only read data and can safely be shared.
+    read_only_api_methods = [
+        'Balance',
+        'BalanceEx',
+        'ClosedOrders',
+        'Ledgers',
+        'OpenOrders',
+        'QueryLedgers',
+        'QueryOrders',
+        'TradeBalance',
+        'TradesHistory',
+        'WithdrawInfo',
+        'WithdrawMethods',
+        'WithdrawStatus',
+    ]
+
+    #: API errors which indicate that Kraken is temporarily unavailable.
+    transient_api_errors = [
+        'EService:Busy',
+        'EService:Unavailable',
+    ]
+
+    #: Private API methods which return orders.
+    order_api_methods = [
+        'ClosedOrders',
+        'OpenOrders',
+        'QueryOrders',
+    ]
+
+    public_headers = {
+        'User-Agent': 'CryptoBob',
+    }
+
+    private_headers = {
+        'User-Agent': 'CryptoBob',
+        'Content-Type': 'application/x-www-form-urlencoded',
+    }
+
+    def assets(self):
         '''
         Return the available assets.
 
         :return: The asset ID & altname
         :rtype: generator
         '''
-        for iid, item in cls().request('Assets').items():
+        for iid, item in self.request('Assets').items():
             yield iid, item['altname']
 
-    def __init__(self, api_key=None, private_key=None, otp_uri=None):
-        self.api_key     = api_key
-        self.private_key = b64decode(private_key) if private_key else None
-        self.otp_uri     = otp_uri
-        self.balance     = {}
+    def __init__(self, api_key=None, private_key=None, otp_uri=None, pool=None,  # pylint: disable=too-many-arguments
+                 rate_limiter=None, cache=None, coordinator=None, api_url=None,
+                 retry_policy=None, circuit_breaker=None):
+        self.api_key         = api_key
+        self.private_key     = b64decode(private_key) if private_key else None
+        self.otp_uri         = otp_uri
+        self.pool            = pool or ConnectionPool()
+        self.rate_limiter    = rate_limiter
+        self.cache           = cache
+        self.coordinator     = coordinator
+        self.retry_policy    = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.endpoints       = {}
+        self._signer         = None
+        self.balance         = {}
+        self.last_timing     = None
+        self.last_nonce      = 0
+        self.nonce_lock      = RLock()
+        self.inflight        = {}
+        self.inflight_lock   = Lock()
+
+        if api_url:
+            url = urlsplit(api_url)
+            if url.scheme not in self.pool.connection_classes or not url.netloc:
+                raise ConfigError(f'Invalid API URL {api_url!r}')
+            self.api_scheme = url.scheme
+            self.api_host   = url.netloc
+
+    def _next_nonce(self):
+        '''
+        Get the next nonce.
+
+        The nonce is based on the UNIX timestamp in milliseconds, but it's
+        guaranteed to be strictly increasing, even when multiple requests are
+        signed within the same millisecond by concurrent threads (or by other
+        processes, when a coordinator is set). To also send the requests in
+        order, the nonce must be generated within :meth:`_nonce_order`.
+
+        :return: The nonce
+        :rtype: str
+        '''
+        with self.nonce_lock:
+            candidate = max(self.last_nonce + 1, int(time() * 1000))
+
+            if self.coordinator:
+                candidate = self.coordinator.next_nonce(candidate)
+
+            self.last_nonce = candidate
+            return str(candidate)
+
+    @contextmanager
+    def _nonce_order(self, private):
+        '''
+        Keep the nonces of private requests in order, from their generation
+        until the request was sent and answered.
+
+        Kraken rejects a nonce which is lower than the last one it received,
+        therefore private requests are serialised across threads (and across
+        processes, when a coordinator is set). Public requests aren't affected.
+
+        :param bool private: The request is private
+
+        :return: The context manager
+        :rtype: contextlib.AbstractContextManager
+        '''
+        if not private:
+            yield
+            return
+
+        with self.nonce_lock, (self.coordinator.locked() if self.coordinator else nullcontext()):
+            yield
+
+    @property
+    def signer(self):
+        '''
+        The request signer, which is created on first use.
+
+        :return: The request signer
+        :rtype: signing.RequestSigner
+        '''
+        if self._signer is None:
+            self._signer = RequestSigner(
+                api_key=self.api_key,
+                private_key=self.private_key,
+                otp_uri=self.otp_uri,
+            )
+
+        return self._signer
 
     def _sign_request(self, endpoint, **data):
         '''
@@ -74,35 +215,38 @@ class KrakenClient:
         :param dict \\**data: The API data
 
         :return: The signed data & headers
-        :rtype: tuple(str, list)
+        :rtype: tuple(str, dict)
         '''
-        # Use UNIX timestamp as nonce and append it do the data.
-        data['nonce'] = str(int(time() * 1000))
+        signer = self.signer
+
+        # Use strictly increasing UNIX timestamp as nonce and append it do the data.
+        data['nonce'] = nonce = self._next_nonce()
 
         # Add OTP if OTP is set
-        if self.otp_uri:
-            data['otp'] = otp_parse_uri(self.otp_uri).now()
+        if signer.totp:
+            data['otp'] = signer.otp()
 
         # URL-encode data.
         data_encoded = urlencode(data)
 
-        # Create SHA256 hash of nonce & data.
-        hash_sha256 = sha256(f'{data["nonce"]}{data_encoded}'.encode('utf-8')).digest()
+        return data_encoded, signer.headers(endpoint, nonce, data_encoded)
 
-        # Create SHA512 HMAC digest for endpoint & SHA256-hashed nonce & data.
-        hmac_sha512 = hmac_digest(
-            key=self.private_key,
-            msg=endpoint.encode('utf-8') + hash_sha256,
-            digest=sha512
-        )
+    def _endpoint(self, api_method):
+        '''
+        Get the endpoint of an API method, and if it's a private one.
 
-        # Create headers.
-        headers = {
-            'API-Key': self.api_key,
-            'API-Sign': b64encode(hmac_sha512),
-        }
+        :param str api_method: The API method
 
-        return data_encoded, headers
+        :return: The endpoint & the private flag
+        :rtype: tuple(str, bool)
+        '''
+        try:
+            return self.endpoints[api_method]
+        except KeyError:
+            private  = api_method not in self.public_api_methods
+            endpoint = f'/0/{"private" if private else "public"}/{api_method}'
+            self.endpoints[api_method] = endpoint, private
+            return endpoint, private
 
     def _prepare_request(self, api_method, **data):
         '''
@@ -111,31 +255,37 @@ class KrakenClient:
         :param str api_method: The API method
         :param dict \\**data: The API data
 
-        :return: The URL, urlencoded data, and headers
+        :return: The URL scheme, host, HTTP method, path, body, and headers
         :rtype: dict
         '''
-        scope    = 'public' if api_method in self.public_api_methods else 'private'
-        endpoint = f'/0/{scope}/{api_method}'
-
-        kwargs = {
-            'url': f'https://{self.api_host}{endpoint}',
-            'headers': {
-                'User-Agent': 'CryptoBob',
+        endpoint, private = self._endpoint(api_method)
+
+        if private:
+            data_encoded, headers = self._sign_request(endpoint=endpoint, **data)
+            headers.update(self.private_headers)
+            kwargs = {
+                'scheme': self.api_scheme,
+                'host': self.api_host,
+                'method': 'POST',
+                'path': endpoint,
+                'body': data_encoded.encode('utf-8'),
+                'headers': headers,
+            }
+        else:
+            kwargs = {
+                'scheme': self.api_scheme,
+                'host': self.api_host,
+                'method': 'GET',
+                'path': f'{endpoint}?{urlencode(data)}' if data else endpoint,
+                'body': None,
+                'headers': self.public_headers,
             }
-        }
-
-        if scope == 'private':
-            data_encoded, add_headers = self._sign_request(endpoint=endpoint, **data)
-            kwargs['data'] = data_encoded.encode('utf-8')
-            kwargs['headers'].update(add_headers)
-        elif data:
-            data_encoded = urlencode(data)
-            kwargs['url'] += f'?{data_encoded}'
 
-        LOGGER.debug('HTTP request:')
-        LOGGER.debug('    URL:     %r', kwargs['url'])
-        LOGGER.debug('    Data:    %r', kwargs.get('data', b'').decode('utf-8'))
-        LOGGER.debug('    Headers: %r', kwargs['headers'])
+        if LOGGER.isEnabledFor(DEBUG):
+            LOGGER.debug('HTTP request:')
+            LOGGER.debug('    URL:     %r', f'{kwargs["scheme"]}://{kwargs["host"]}{kwargs["path"]}')
+            LOGGER.debug('    Data:    %r', (kwargs['body'] or b'').decode('utf-8'))
+            LOGGER.debug('    Headers: %r', kwargs['headers'])
 
         return kwargs
 
@@ -143,6 +293,16 @@ class KrakenClient:
         '''
         Make a request to the Kraken API.
 
+        Responses of public API methods are served from the response cache
+        (if any) as long as they're fresh.
+
+        Identical requests to read-only API methods, which are sent while
+        another one is still in-flight (e.g. by concurrent trade plans), aren't
+        sent again. Instead they'll wait for the in-flight request and share
+        its result. Since they're idempotent, they're also retried after
+        transient errors (if a retry policy is set), while other private API
+        methods (e.g. ``AddOrder``) are never retried.
+
         :param str api_method: The API method
         :param dict \\**data: The API data
 
@@ -151,20 +311,197 @@ class KrakenClient:
 
         :raises ResponseError: When there was an error in the response
         '''
-        kwargs  = self._prepare_request(api_method=api_method, **data)
-        request = Request(**kwargs)
+        with TRACER.span('request', method=api_method) as span:
+            return self._shared_request(span, api_method, **data)
 
-        with urlopen(request) as response:  # nosemgrep: dynamic-urllib-use-detected
-            response_data  = load(response)
+    def _shared_request(self, span, api_method, **data):
+        '''
+        Make a request to the Kraken API, or share the result of the cache or
+        an in-flight request.
 
-            LOGGER.debug('HTTP response: %r', response_data)
+        :param span: The span of the request
+        :type span: tracing.Span or tracing.NullSpan
+        :param str api_method: The API method
+        :param dict \\**data: The API data
 
-            response_error = response_data.get('error')
-            if response_error:
-                raise ResponseError(', '.join(response_error))
+        :return: The response result
+        :rtype: dict
+
+        :raises ResponseError: When there was an error in the response
+        '''
+        public = api_method in self.public_api_methods
+
+        if not public and api_method not in self.read_only_api_methods:
+            return self._request(api_method, **data)
+
+        if public and self.cache:
+            result = self.cache.get(api_method, data)
+            if result is not MISS:
+                API_REQUESTS_SHARED.labels(api_method, 'cache').inc()
+                span.set(source='cache')
+                return result
+
+        key = (api_method, tuple(sorted((name, str(value)) for name, value in data.items())))
+
+        with self.inflight_lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+
+        if not leader:
+            LOGGER.debug('Joining in-flight %s request', api_method)
+            API_REQUESTS_SHARED.labels(api_method, 'inflight').inc()
+            span.set(source='inflight')
+            return future.result()
+
+        try:
+            result = self._retrying_request(api_method, **data)
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+            if public and self.cache:
+                self.cache.set(api_method, data, result)
+        finally:
+            with self.inflight_lock:
+                del self.inflight[key]
+
+        return result
+
+    async def arequest(self, api_method, **data):
+        '''
+        Make a request to the Kraken API without blocking the event loop.
+
+        :param str api_method: The API method
+        :param dict \\**data: The API data
+
+        :return: The response result
+        :rtype: dict
+        '''
+        return await to_thread(self.request, api_method, **data)
+
+    def _retrying_request(self, api_method, **data):
+        '''
+        Send an idempotent request to the Kraken API, and retry it after
+        transient errors with a jittered exponential backoff.
+
+        :param str api_method: The API method
+        :param dict \\**data: The API data
+
+        :return: The response result
+        :rtype: dict
+
+        :raises ResponseError: When there was an error in the response
+        '''
+        attempt = 0
+
+        while True:
+            try:
+                return self._request(api_method, **data)
+            except TransientError as ex:
+                if not self.retry_policy or attempt >= self.retry_policy.retries:
+                    raise
+
+                delay = self.retry_policy.delay(attempt)
+                LOGGER.warning('Request to %s failed with «%s», retrying in %.2f seconds', api_method, ex, delay)
+                API_REQUEST_RETRIES.labels(api_method).inc()
+
+                sleep(delay)
+                attempt += 1
+
+    def _request(self, api_method, **data):  # pylint: disable=too-many-branches
+        '''
+        Send a request to the Kraken API and return the result.
+
+        :param str api_method: The API method
+        :param dict \\**data: The API data
+
+        :return: The response result
+        :rtype: dict
+
+        :raises ResponseError: When there was an error in the response
+        :raises TransientError: When the request failed temporarily
+        :raises CircuitOpenError: When the circuit of the API method is open
+        '''
+        if self.circuit_breaker:
+            self.circuit_breaker.check(api_method)
+
+        if self.rate_limiter and api_method not in self.public_api_methods:
+            with TRACER.span('rate_limit'):
+                self.rate_limiter.acquire(api_method)
+
+        private = self._endpoint(api_method)[1]
+
+        with self._nonce_order(private):
+            kwargs = self._prepare_request(api_method=api_method, **data)
+
+            with TRACER.span('http') as span:
+                try:
+                    # Private requests are never sent twice, since Kraken would reject the nonce anyway.
+                    response = self.pool.request(**kwargs, idempotent=not private)
+                except TimeoutError as ex:
+                    API_REQUEST_ERRORS.labels(api_method, 'timeout').inc()
+                    self._failure(api_method)
+                    raise TransientError(f'HTTP request to {api_method} timed out') from ex
+                except (HTTPException, OSError) as ex:
+                    API_REQUEST_ERRORS.labels(api_method, 'connection').inc()
+                    self._failure(api_method)
+                    raise TransientError(f'HTTP request to {api_method} failed with «{ex}»') from ex
+
+                self.last_timing = timing = response.timing
+                span.set(status=response.status, connect=round(timing.connect, 6),
+                         ttfb=round(timing.ttfb, 6), reused=timing.reused, size=len(response.body))
+
+        API_REQUEST_DURATION.labels(api_method).observe(timing.total)
+
+        LOGGER.debug('HTTP timing of %s: connect=%.3fs, ttfb=%.3fs, total=%.3fs, reused=%r',
+                     api_method, timing.connect, timing.ttfb, timing.total, timing.reused)
+
+        if response.status >= 500:
+            API_REQUEST_ERRORS.labels(api_method, 'http').inc()
+            self._failure(api_method)
+            raise TransientError(f'HTTP request to {api_method} failed with status {response.status}')
+
+        if response.status >= 400:
+            API_REQUEST_ERRORS.labels(api_method, 'http').inc()
+            raise ResponseError(f'HTTP request to {api_method} failed with status {response.status}')
+
+        with TRACER.span('decode'):
+            if api_method in self.order_api_methods:
+                response_data = loads(response.body, object_hook=Order.object_hook)
+            else:
+                response_data = loads(response.body)
+
+        LOGGER.debug('HTTP response: %r', response_data)
+
+        response_error = response_data.get('error')
+        if response_error:
+            API_REQUEST_ERRORS.labels(api_method, 'api').inc()
+            if self.rate_limiter and 'EAPI:Rate limit exceeded' in response_error:
+                self.rate_limiter.exceeded()
+            if any(error in self.transient_api_errors for error in response_error):
+                self._failure(api_method)
+                raise TransientError(', '.join(response_error))
+
+        if self.circuit_breaker:
+            self.circuit_breaker.success(api_method)
+
+        if response_error:
+            raise ResponseError(', '.join(response_error))
 
         return response_data['result']
 
+    def _failure(self, api_method):
+        '''
+        Record a failed request of an API method at the circuit breaker.
+
+        :param str api_method: The API method
+        '''
+        if self.circuit_breaker:
+            self.circuit_breaker.failure(api_method)
+
     def assert_online_status(self):
         '''
         Assert that the exchange status is online (and not maintenance).
@@ -175,6 +512,9 @@ class KrakenClient:
 
         status = self.request('SystemStatus')['status']
         if status != 'online':
+            # Skip the following cycles until the cooldown is over, instead of querying the status again.
+            if self.circuit_breaker:
+                self.circuit_breaker.trip('SystemStatus')
             raise StatusError(f'System status is {status!r}')
 
     def update_balance(self):
@@ -0,0 +1,147 @@
+'''
+CryptoBob market data module.
+'''
+
+__all__ = (
+    'MarketData',
+    'Snapshot',
+    'Ticker',
+)
+
+from collections import namedtuple
+from logging import getLogger
+from threading import Lock
+from types import MappingProxyType
+
+LOGGER = getLogger(__name__)
+
+Ticker = namedtuple('Ticker', ('ask', 'bid', 'last', 'vwap', 'volume'))
+Ticker.__doc__ = '''
+The ticker of a trading pair, i.e. the best ask & bid, the last trade price,
+and the VWAP & volume of the last 24 hours.
+'''
+
+
+class Snapshot(namedtuple('Snapshot', ('time', 'tickers'))):
+    '''
+    An immutable snapshot of the tickers of all trading pairs, taken at once.
+
+    The tickers are a read-only mapping of the trading pairs (as configured)
+    to their :class:`Ticker`, so the snapshot can be shared safely across
+    concurrently evaluated trade plans & withdrawals.
+    '''
+
+    __slots__ = ()
+
+    def get(self, pair):
+        '''
+        Get the ticker of a trading pair.
+
+        :param str pair: The trading pair
+
+        :return: The ticker (``None`` when not part of the snapshot)
+        :rtype: None or Ticker
+        '''
+        return self.tickers.get(pair)
+
+
+class MarketData:
+    '''
+    The market data, which fetches the tickers of the trading pairs of all
+    trade plans in a single multi-pair ``Ticker`` request per cycle.
+
+    The snapshot is taken lazily on first access within a cycle, so cycles
+    which don't need prices don't send any market data request at all, while
+    all others send exactly one, regardless of the number of trade plans.
+
+    Kraken responds with its own pair names (e.g. ``XXBTZEUR`` for
+    ``XBTEUR``), which are mapped back to the configured ones via their
+    ``AssetPairs`` altnames once.
+
+    :param kraken.KrakenClient client: The client
+    :param clock.Clock clock: The clock
+    '''
+
+    def __init__(self, client, clock):
+        self.client  = client
+        self.clock   = clock
+        self.pairs   = frozenset()
+        self.aliases = {}
+        self.current = None
+        self.lock    = Lock()
+
+    def reset(self, pairs):
+        '''
+        Start a new cycle, which discards the current snapshot.
+
+        :param pairs: The trading pairs of all trade plans
+        :type pairs: iterable
+        '''
+        with self.lock:
+            self.pairs   = frozenset(pairs)
+            self.current = None
+
+    def snapshot(self):
+        '''
+        Get the snapshot of the current cycle, and take it when there's none
+        yet.
+
+        :return: The snapshot
+        :rtype: Snapshot
+
+        :raises exceptions.ResponseError: When the tickers couldn't be fetched
+        '''
+        with self.lock:
+            if self.current is None:
+                self.current = self.take()
+
+            return self.current
+
+    def take(self):
+        '''
+        Take a new snapshot of the tickers.
+
+        :return: The snapshot
+        :rtype: Snapshot
+
+        :raises exceptions.ResponseError: When the tickers couldn't be fetched
+        '''
+        if not self.pairs:
+            return Snapshot(self.clock.time(), MappingProxyType({}))
+
+        LOGGER.debug('Taking market data snapshot of %d pairs', len(self.pairs))
+
+        result  = self.client.request('Ticker', pair=','.join(sorted(self.pairs)))
+        tickers = {}
+
+        if result.keys() - self.pairs - self.aliases.keys():
+            self.update_aliases()
+
+        for name, item in result.items():
+            pair = name if name in self.pairs else self.aliases.get(name)
+            if pair is None:
+                LOGGER.warning('Ignoring ticker of unknown pair %s', name)
+                continue
+
+            tickers[pair] = Ticker(
+                ask=float(item['a'][0]),
+                bid=float(item['b'][0]),
+                last=float(item['c'][0]),
+                vwap=float(item['p'][1]),
+                volume=float(item['v'][1]),
+            )
+
+        return Snapshot(self.clock.time(), MappingProxyType(tickers))
+
+    def update_aliases(self):
+        '''
+        Update the aliases of Kraken's pair names to the configured ones.
+
+        :raises exceptions.ResponseError: When the asset pairs couldn't be fetched
+        '''
+        result = self.client.request('AssetPairs', pair=','.join(sorted(self.pairs)))
+
+        for name, item in result.items():
+            for pair in (name, item.get('altname'), item.get('wsname')):
+                if pair in self.pairs:
+                    self.aliases[name] = pair
@@ -0,0 +1,513 @@
+'''
+CryptoBob metrics module.
+'''
+
+__all__ = (
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'MetricsServer',
+    'Registry',
+    'REGISTRY',
+)
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from math import inf
+from threading import Lock, Thread
+
+from .exceptions import ConfigError
+
+LOGGER = getLogger(__name__)
+
+
+class Registry:
+    '''
+    The registry of all metrics, which renders them in the Prometheus text
+    exposition format.
+    '''
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        '''
+        Register a metric.
+
+        :param Metric metric: The metric
+        '''
+        self.metrics.append(metric)
+
+    def render(self):
+        '''
+        Render all metrics in the Prometheus text exposition format.
+
+        :return: The metrics
+        :rtype: str
+        '''
+        lines = []
+
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+#: The default registry.
+REGISTRY = Registry()
+
+
+def format_labels(names, values):
+    '''
+    Format labels for the Prometheus text exposition format.
+
+    :param tuple names: The label names
+    :param tuple values: The label values
+
+    :return: The formatted labels
+    :rtype: str
+    '''
+    if not names:
+        return ''
+
+    labels = ','.join(
+        f'{name}="{value}"'
+        for name, value in zip(names, (
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            for value in values
+        ))
+    )
+
+    return f'{{{labels}}}'
+
+
+def format_value(value):
+    '''
+    Format a value for the Prometheus text exposition format.
+
+    :param float value: The value
+
+    :return: The formatted value
+    :rtype: str
+    '''
+    if value == inf:
+        return '+Inf'
+    if value == -inf:
+        return '-Inf'
+    return repr(float(value))
+
+
+class Metric(ABC):
+    '''
+    The abstract base class of all metrics.
+
+    A metric is a family of children, one per combination of label values.
+    The children are created once and then cached, so that hot paths only
+    need a dict lookup (or none at all, when the child is kept) and a cheap,
+    uncontended per-child lock to update a value.
+
+    :param str name: The metric name
+    :param str documentation: The metric help text
+    :param tuple labelnames: The label names
+    :param Registry registry: The registry
+    '''
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name          = name
+        self.documentation = documentation
+        self.labelnames    = tuple(labelnames)
+        self.children      = {}
+        self.lock          = Lock()
+
+        registry.register(self)
+
+    @abstractmethod
+    def new_child(self):
+        '''
+        Create a new child.
+
+        :return: The child
+        :rtype: object
+        '''
+
+    def labels(self, *values):
+        '''
+        Get the child for the label values.
+
+        :param tuple \\*values: The label values, in the order of the label names
+
+        :return: The child
+        :rtype: object
+        '''
+        child = self.children.get(values)
+        if child is not None:
+            return child
+
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'Metric {self.name} expects labels {self.labelnames!r}')
+
+        with self.lock:
+            return self.children.setdefault(values, self.new_child())
+
+    def render(self):
+        '''
+        Render the samples of all children.
+
+        :return: The samples
+        :rtype: list
+        '''
+        return [
+            f'{self.name}{format_labels(self.labelnames, values)} {format_value(child.get())}'
+            for values, child in list(self.children.items())
+        ]
+
+
+class CounterChild:
+    '''
+    A single counter value.
+    '''
+
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock  = Lock()
+
+    def inc(self, amount=1):
+        '''
+        Increase the counter.
+
+        :param float amount: The amount
+        '''
+        with self.lock:
+            self.value += amount
+
+    def get(self):
+        '''
+        Get the counter value.
+
+        :return: The value
+        :rtype: float
+        '''
+        return self.value
+
+
+class Counter(Metric):
+    '''
+    A counter, which only ever increases.
+    '''
+
+    type = 'counter'
+
+    def new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        '''
+        Increase the counter without labels.
+
+        :param float amount: The amount
+        '''
+        self.labels().inc(amount)
+
+
+class GaugeChild:
+    '''
+    A single gauge value, which is either set explicitly, or calculated by a
+    function when the metrics are rendered.
+    '''
+
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value    = 0.0
+        self.function = None
+
+    def set(self, value):
+        '''
+        Set the gauge value.
+
+        :param float value: The value
+        '''
+        self.value = value
+
+    def set_function(self, function):
+        '''
+        Calculate the gauge value with a function, when the metrics are
+        rendered. This way the value costs nothing on hot paths.
+
+        :param callable function: The function
+        '''
+        self.function = function
+
+    def get(self):
+        '''
+        Get the gauge value.
+
+        :return: The value
+        :rtype: float
+        '''
+        if self.function:
+            return self.function()
+        return self.value
+
+
+class Gauge(Metric):
+    '''
+    A gauge, which can go up and down.
+    '''
+
+    type = 'gauge'
+
+    def new_child(self):
+        return GaugeChild()
+
+    def set(self, value):
+        '''
+        Set the gauge value without labels.
+
+        :param float value: The value
+        '''
+        self.labels().set(value)
+
+
+class HistogramChild:
+    '''
+    A single histogram, which counts observations in buckets.
+
+    :param tuple buckets: The upper bounds of the buckets
+    '''
+
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.sum     = 0.0
+        self.lock    = Lock()
+
+    def observe(self, value):
+        '''
+        Observe a value.
+
+        :param float value: The value
+        '''
+        index = bisect_left(self.buckets, value)
+
+        with self.lock:
+            self.counts[index] += 1
+            self.sum           += value
+
+    def get(self):
+        '''
+        Get the cumulative bucket counts & the sum.
+
+        :return: The cumulative counts & sum
+        :rtype: tuple(list, float)
+        '''
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+
+        return counts, total
+
+
+class Histogram(Metric):
+    '''
+    A histogram, which counts observations (e.g. durations) in buckets.
+
+    :param str name: The metric name
+    :param str documentation: The metric help text
+    :param tuple labelnames: The label names
+    :param tuple buckets: The upper bounds of the buckets (in seconds)
+    :param Registry registry: The registry
+    '''
+
+    type = 'histogram'
+
+    #: The default buckets in seconds.
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None,  # pylint: disable=too-many-arguments
+                 registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets or self.default_buckets)) + (inf,)
+        super().__init__(name, documentation, labelnames=labelnames, registry=registry)
+
+    def new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        '''
+        Observe a value without labels.
+
+        :param float value: The value
+        '''
+        self.labels().observe(value)
+
+    def render(self):
+        lines = []
+
+        for values, child in list(self.children.items()):
+            counts, total = child.get()
+            labels        = format_labels(self.labelnames, values)
+
+            for bound, count in zip(self.buckets, counts):
+                bucket = format_labels(self.labelnames + ('le',), values + (format_value(bound),))
+                lines.append(f'{self.name}_bucket{bucket} {count}')
+
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+
+        return lines
+
+
+API_REQUEST_DURATION = Histogram(
+    'cryptobob_api_request_duration_seconds',
+    'Duration of the HTTP requests to the Kraken API.',
+    labelnames=('method',),
+)
+
+API_REQUEST_ERRORS = Counter(
+    'cryptobob_api_request_errors_total',
+    'Failed requests to the Kraken API.',
+    labelnames=('method', 'error'),
+)
+
+API_REQUEST_RETRIES = Counter(
+    'cryptobob_api_request_retries_total',
+    'Requests to the Kraken API which were retried after a transient error.',
+    labelnames=('method',),
+)
+
+API_CIRCUIT_OPENED = Counter(
+    'cryptobob_api_circuit_opened_total',
+    'Circuits of Kraken API methods which were opened, since Kraken was degraded.',
+    labelnames=('method',),
+)
+
+API_REQUESTS_SHARED = Counter(
+    'cryptobob_api_requests_shared_total',
+    'Requests to the Kraken API which were served by the cache or an in-flight request.',
+    labelnames=('method', 'source'),
+)
+
+CYCLE_DURATION = Histogram(
+    'cryptobob_cycle_duration_seconds',
+    'Duration of the runner cycles.',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+
+CYCLE_ERRORS = Counter(
+    'cryptobob_cycle_errors_total',
+    'Runner cycles which failed with an error.',
+    labelnames=('error',),
+)
+
+TRADE_PLANS = Counter(
+    'cryptobob_trade_plans_total',
+    'Trade plans which were due, skipped without opening an order, or deferred to the next cycle.',
+    labelnames=('result',),
+)
+
+ORDERS = Counter(
+    'cryptobob_orders_total',
+    'Orders which were opened, or failed to open.',
+    labelnames=('pair', 'result'),
+)
+
+WITHDRAWALS = Counter(
+    'cryptobob_withdrawals_total',
+    'Withdrawals which were initiated, skipped, deferred, failed or succeeded.',
+    labelnames=('asset', 'result'),
+)
+
+RATE_LIMIT_HEADROOM = Gauge(
+    'cryptobob_rate_limit_headroom',
+    'Remaining headroom of the rate limit counter.',
+    labelnames=('account',),
+)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    '''
+    The HTTP handler, which serves the metrics of the server's registry.
+    '''
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        '''
+        Serve the metrics.
+        '''
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug('Metrics request: ' + format, *args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    '''
+    The HTTP server, which exposes the metrics in the Prometheus text format
+    in a background thread.
+
+    :param str address: The bind address
+    :param int port: The port
+    :param Registry registry: The registry
+    '''
+
+    daemon_threads = True
+
+    @classmethod
+    def from_config(cls, config, port_offset=0):
+        '''
+        Create & start a metrics server from a ``metrics`` configuration.
+
+        :param config: The metrics configuration
+        :type config: None or dict
+        :param int port_offset: The offset added to the port (e.g. per worker process)
+
+        :return: The metrics server (if configured)
+        :rtype: None or MetricsServer
+
+        :raises ConfigError: When the configuration is invalid
+        '''
+        if not config:
+            return None
+
+        address = config.get('address', '127.0.0.1')
+        port    = config.get('port', 9464) + port_offset
+
+        try:
+            server = cls(address=address, port=port)
+        except OSError as ex:
+            raise ConfigError(f'Metrics server on {address}:{port} failed, got «{ex}»') from ex
+
+        server.start()
+        return server
+
+    def __init__(self, address='127.0.0.1', port=9464, registry=REGISTRY):
+        super().__init__((address, port), MetricsHandler)
+        self.registry = registry
+
+    def start(self):
+        '''
+        Serve the metrics in a background thread.
+        '''
+        LOGGER.info('Serving metrics on http://%s:%d/metrics', *self.server_address[:2])
+        Thread(target=self.serve_forever, name='MetricsServer', daemon=True).start()
@@ -0,0 +1,1160 @@
+#!/usr/bin/env python3
+'''
+The mock Kraken server of CryptoBob.
+
+Run it via ``python -m cryptobob.mockserver``.
+'''
+
+# pylint: disable=too-many-lines
+
+__all__ = (
+    'MockKraken',
+    'MockKrakenStream',
+    'main',
+    'record',
+)
+
+import os
+import sys
+from argparse import ArgumentParser
+from base64 import b64decode, b64encode
+from collections import Counter
+from datetime import datetime, timezone
+from hashlib import sha1
+from hmac import compare_digest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dump, dumps, load, loads
+from logging import getLogger
+from math import sin
+from pathlib import Path
+from random import Random
+from socket import SHUT_RDWR
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from struct import pack, unpack
+from threading import Lock, RLock, Thread
+from time import sleep, time
+from urllib.parse import parse_qsl, urlsplit
+
+from .helpers import init_logging
+from .ratelimit import RateLimiter
+from .signing import RequestSigner
+
+LOGGER = getLogger(__name__)
+
+#: The GUID of the WebSocket opening handshake.
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+#: The API methods which are recorded by default, incl. their parameters.
+RECORD_METHODS = {
+    'public': [
+        ('SystemStatus', {}),
+        ('Time', {}),
+        ('Assets', {}),
+        ('AssetPairs', {}),
+        ('Ticker', {'pair': 'XBTEUR'}),
+    ],
+    'private': [
+        ('Balance', {}),
+        ('OpenOrders', {}),
+        ('ClosedOrders', {}),
+    ],
+}
+
+
+class MockError(Exception):
+    '''
+    Exception which is thrown by API method handlers, and then returned as
+    Kraken API error.
+    '''
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    '''
+    The HTTP handler of the mock Kraken server.
+    '''
+
+    protocol_version = 'HTTP/1.1'
+
+    # Send the headers & body at once, and without delay.
+    wbufsize                = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        '''
+        Handle a public API request.
+        '''
+        url = urlsplit(self.path)
+        self.handle_api(url.path, dict(parse_qsl(url.query)), body=b'')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        '''
+        Handle a private API request.
+        '''
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.handle_api(urlsplit(self.path).path, dict(parse_qsl(body.decode('utf-8'))), body=body)
+
+    def handle_api(self, path, params, body):
+        '''
+        Handle an API request by the server, then send its response.
+
+        :param str path: The path
+        :param dict params: The parameters
+        :param bytes body: The raw request body
+        '''
+        status, data = self.server.handle_api(path, params, body, self.headers)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug('Mock request: ' + format, *args)
+
+
+class MockKraken(ThreadingHTTPServer):  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    '''
+    An in-process mock of the Kraken REST API.
+
+    The mock verifies the signatures & nonces of private requests, enforces
+    Kraken's rate limit, and can inject latency & errors. It keeps a small
+    in-memory exchange state (balances, open & closed orders), where market
+    orders are filled right away.
+
+    Recorded responses (see :func:`record`) can be replayed as fixtures, so
+    that the mock responds with real response shapes.
+
+    :param str api_key: The accepted API key
+    :param str private_key: The accepted private key (base64 encoded)
+    :param str address: The bind address
+    :param int port: The port (``0`` for a random one)
+    :param float latency: The injected latency per request in seconds
+    :param float error_rate: The probability of an injected ``EService:Unavailable`` error
+    :param float http_error_rate: The probability of an injected HTTP 502 error
+    :param rate_limit: The rate limit config (see :meth:`ratelimit.RateLimiter.from_config`),
+                       or ``False`` to disable it
+    :type rate_limit: None or bool or dict
+    :param fixtures: The recorded responses to replay, by API method
+    :type fixtures: None or dict
+    :param seed: The random seed of the injected errors
+    :type seed: None or int
+    '''
+
+    daemon_threads = True
+
+    #: The page size of closed orders.
+    page_size = 50
+
+    #: The token of the WebSocket API.
+    ws_token = 'mock'
+
+    def __init__(self, api_key='key', private_key=None, address='127.0.0.1',  # pylint: disable=too-many-arguments
+                 port=0, latency=0.0, error_rate=0.0, http_error_rate=0.0, rate_limit=None,
+                 fixtures=None, seed=None):
+        super().__init__((address, port), MockHandler)
+
+        private_key = private_key or b64encode(bytes(range(64))).decode('ascii')
+
+        self.api_key         = api_key
+        self.private_key     = private_key
+        self.signer          = RequestSigner(api_key=api_key, private_key=b64decode(private_key))
+        self.latency         = latency
+        self.error_rate      = error_rate
+        self.http_error_rate = http_error_rate
+        self.rate_limiter    = None if rate_limit is False else RateLimiter.from_config(rate_limit)
+        self.fixtures        = {method: dumps({'error': [], 'result': result}).encode('utf-8')
+                                for method, result in (fixtures or {}).items()}
+        self.random          = Random(seed)
+        self.lock            = Lock()
+        self.last_nonce      = 0
+        self.txids           = 0
+        self.orders          = {}
+        self.balance         = {}
+        self.ledger          = {}
+        self.requests        = Counter()
+        self.errors          = Counter()
+        self.thread          = None
+
+    @property
+    def url(self):
+        '''
+        The base URL of the mock server.
+
+        :return: The URL
+        :rtype: str
+        '''
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        '''
+        Serve the API in a background thread.
+        '''
+        LOGGER.info('Serving mock Kraken API on %s', self.url)
+        self.thread = Thread(target=self.serve_forever, name='MockKraken', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Stop serving the API.
+        '''
+        self.shutdown()
+        self.server_close()
+
+    def reset_stats(self):
+        '''
+        Reset the request & error statistics.
+        '''
+        with self.lock:
+            self.requests.clear()
+            self.errors.clear()
+
+    def add_order(self, userref, pair, status='closed', timestamp=None, **fields):  # pylint: disable=too-many-arguments
+        '''
+        Add an order to the exchange state.
+
+        :param int userref: The userref
+        :param str pair: The trading pair
+        :param str status: The order status
+        :param timestamp: The UNIX timestamp at which the order was opened & closed
+        :type timestamp: None or float
+        :param dict \\**fields: Additional order fields
+
+        :return: The transaction ID
+        :rtype: str
+        '''
+        timestamp = time() if timestamp is None else timestamp
+
+        with self.lock:
+            self.txids += 1
+            txid        = f'O{self.txids:05d}-MOCK-{self.txids % 997:06d}'
+
+        self.orders[txid] = {
+            'refid': None,
+            'userref': userref,
+            'status': status,
+            'opentm': timestamp,
+            'closetm': timestamp if status != 'open' else 0,
+            'starttm': 0,
+            'expiretm': 0,
+            'descr': {
+                'pair': pair,
+                'type': 'buy',
+                'ordertype': 'market',
+                'price': '0',
+                'price2': '0',
+                'leverage': 'none',
+                'order': f'buy {fields.get("vol", "0.00100000")} {pair} @ market',
+                'close': '',
+            },
+            'vol': '0.00100000',
+            'vol_exec': '0.00100000' if status == 'closed' else '0.00000000',
+            'cost': '25.00000',
+            'fee': '0.06500',
+            'price': '25000.0',
+            'stopprice': '0.00000',
+            'limitprice': '0.00000',
+            'misc': '',
+            'oflags': 'fciq',
+            **fields,
+        }
+
+        return txid
+
+    def add_history(self, userrefs, size, pair='XBTEUR', interval=86400):
+        '''
+        Add an order history of closed orders, which are spread across the
+        userrefs and closed at the interval (the last ones right now).
+
+        :param list userrefs: The userrefs
+        :param int size: The number of closed orders
+        :param str pair: The trading pair
+        :param float interval: The interval between the orders per userref in seconds
+        '''
+        now = time()
+
+        for i in range(size):
+            userref = userrefs[i % len(userrefs)] if userrefs else 0
+            age     = (size - i - 1) // max(1, len(userrefs))
+            self.add_order(userref=userref, pair=pair, timestamp=now - age * interval)
+
+    def handle_api(self, path, params, body, headers):
+        '''
+        Handle an API request.
+
+        :param str path: The path
+        :param dict params: The parameters
+        :param bytes body: The raw request body
+        :param headers: The request headers
+        :type headers: email.message.Message
+
+        :return: The HTTP status & response body
+        :rtype: tuple(int, bytes)
+        '''
+        method = path.rsplit('/', 1)[-1]
+
+        with self.lock:
+            self.requests[method] += 1
+
+        if self.latency:
+            sleep(self.latency)
+
+        if self.http_error_rate and self.random.random() < self.http_error_rate:
+            self.count_error(method, 'HTTP 502')
+            return 502, b'Bad Gateway'
+
+        try:
+            if path.startswith('/0/private/'):
+                self.authenticate(path, params, body, headers)
+
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise MockError('EService:Unavailable')
+
+            if method in self.fixtures:
+                return 200, self.fixtures[method]
+
+            handler = getattr(self, f'api_{method}', None)
+            if handler is None:
+                raise MockError('EGeneral:Unknown method')
+
+            try:
+                result = handler(**params)
+            except TypeError as ex:
+                raise MockError('EGeneral:Invalid arguments') from ex
+
+        except MockError as ex:
+            self.count_error(method, str(ex))
+            return 200, dumps({'error': [str(ex)]}).encode('utf-8')
+
+        return 200, dumps({'error': [], 'result': result}).encode('utf-8')
+
+    def count_error(self, method, error):
+        '''
+        Count an error.
+
+        :param str method: The API method
+        :param str error: The error
+        '''
+        LOGGER.debug('Mock %s request failed with %r', method, error)
+
+        with self.lock:
+            self.errors[error] += 1
+
+    def authenticate(self, path, params, body, headers):
+        '''
+        Verify the API key, signature, nonce & rate limit of a private request.
+
+        :param str path: The path
+        :param dict params: The parameters
+        :param bytes body: The raw request body
+        :param headers: The request headers
+        :type headers: email.message.Message
+
+        :raises MockError: When the authentication failed
+        '''
+        if headers.get('API-Key') != self.api_key:
+            raise MockError('EAPI:Invalid key')
+
+        nonce     = params.pop('nonce', '')
+        signature = self.signer.sign(path, nonce, body.decode('utf-8'))
+
+        if not compare_digest(signature, headers.get('API-Sign', '').encode('ascii')):
+            raise MockError('EAPI:Invalid signature')
+
+        with self.lock:
+            if not nonce.isdigit() or int(nonce) <= self.last_nonce:
+                raise MockError('EAPI:Invalid nonce')
+            self.last_nonce = int(nonce)
+
+        params.pop('otp', None)
+
+        if self.rate_limiter and not self.rate_limiter.try_acquire(path.rsplit('/', 1)[-1]):
+            raise MockError('EAPI:Rate limit exceeded')
+
+    def filter_orders(self, status, userref=None, txids=None):
+        '''
+        Filter the orders.
+
+        :param tuple status: The order statuses
+        :param userref: The userref
+        :type userref: None or str
+        :param txids: The transaction IDs
+        :type txids: None or list
+
+        :return: The orders
+        :rtype: dict
+        '''
+        return {
+            txid: order for txid, order in self.orders.items()
+            if order['status'] in status
+            and (userref is None or order['userref'] == int(userref))
+            and (txids is None or txid in txids)
+        }
+
+    @staticmethod
+    def api_Time(**_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Time`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The server time
+        :rtype: dict
+        '''
+        now = datetime.now(timezone.utc)
+        return {'unixtime': int(now.timestamp()), 'rfc1123': now.strftime('%a, %d %b %y %H:%M:%S +0000')}
+
+    @staticmethod
+    def api_SystemStatus(**_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``SystemStatus`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The system status
+        :rtype: dict
+        '''
+        return {'status': 'online', 'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+    @staticmethod
+    def api_Assets(**_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Assets`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The assets
+        :rtype: dict
+        '''
+        return {
+            iid: {'aclass': 'currency', 'altname': altname, 'decimals': 10, 'display_decimals': 5,
+                  'status': 'enabled'}
+            for iid, altname in (('XXBT', 'XBT'), ('XETH', 'ETH'), ('ZEUR', 'EUR'), ('ZCHF', 'CHF'))
+        }
+
+    @classmethod
+    def api_AssetPairs(cls, pair='XBTEUR,ETHEUR', **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``AssetPairs`` API method.
+
+        :param str pair: The comma-separated trading pairs
+        :param dict \\**_: The other API data
+
+        :return: The asset pairs
+        :rtype: dict
+        '''
+        assets = {item['altname']: iid for iid, item in cls.api_Assets().items()}
+
+        return {
+            name: {'altname': name, 'base': assets.get(name[:3], name[:3]),
+                   'quote': assets.get(name[3:], name[3:]), 'pair_decimals': 1, 'lot_decimals': 8,
+                   'ordermin': '0.0001', 'costmin': '0.5', 'status': 'online'}
+            for name in pair.split(',')
+        }
+
+    @staticmethod
+    def api_OHLC(pair='XBTEUR', interval=1, since=None, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``OHLC`` API method, which returns the last 720 candles of
+        a deterministic price series.
+
+        :param str pair: The trading pair
+        :param interval: The candle interval in minutes
+        :type interval: int or str
+        :param since: The UNIX timestamp of the first candle (optional)
+        :type since: None or str
+        :param dict \\**_: The other API data
+
+        :return: The candles & the timestamp of the last one
+        :rtype: dict
+        '''
+        width = int(interval) * 60
+        last  = int(time()) // width * width
+        start = last - 719 * width
+
+        if since:
+            start = max(start, int(since) // width * width + width)
+
+        candles = []
+        for timestamp in range(start, last + 1, width):
+            price = 25000 + 2500 * sin(timestamp / width / 50)
+            candles.append([timestamp, f'{price:.1f}', f'{price * 1.01:.1f}', f'{price * 0.99:.1f}',
+                            f'{price:.1f}', f'{price:.1f}', '1.00000000', 10])
+
+        return {pair: candles, 'last': last}
+
+    @staticmethod
+    def api_Ticker(pair='XBTEUR', **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Ticker`` API method.
+
+        :param str pair: The comma-separated trading pairs
+        :param dict \\**_: The other API data
+
+        :return: The tickers
+        :rtype: dict
+        '''
+        return {
+            name: {'a': ['25000.0', '1', '1.000'], 'b': ['24999.0', '1', '1.000'],
+                   'c': ['25000.0', '0.001'], 'v': ['100.0', '1000.0'], 'p': ['25000.0', '25000.0'],
+                   't': [100, 1000], 'l': ['24000.0', '24000.0'], 'h': ['26000.0', '26000.0'],
+                   'o': '25000.0'}
+            for name in pair.split(',')
+        }
+
+    def api_Balance(self, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Balance`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The balance
+        :rtype: dict
+        '''
+        return dict(self.balance)
+
+    def api_GetWebSocketsToken(self, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``GetWebSocketsToken`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The token
+        :rtype: dict
+        '''
+        return {'token': self.ws_token, 'expires': 900}
+
+    def api_OpenOrders(self, userref=None, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``OpenOrders`` API method.
+
+        :param userref: The userref
+        :type userref: None or str
+        :param dict \\**_: The other API data
+
+        :return: The open orders
+        :rtype: dict
+        '''
+        return {'open': self.filter_orders(status=('open', 'pending'), userref=userref)}
+
+    def api_ClosedOrders(self, userref=None, start=None, ofs=0, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``ClosedOrders`` API method, which returns a page of the
+        latest closed orders.
+
+        :param userref: The userref
+        :type userref: None or str
+        :param start: The exclusive UNIX timestamp of the oldest closed order
+        :type start: None or str
+        :param ofs: The result offset
+        :type ofs: int or str
+        :param dict \\**_: The other API data
+
+        :return: The closed orders & their total count
+        :rtype: dict
+        '''
+        orders = sorted(
+            (
+                (txid, order) for txid, order in self.filter_orders(
+                    status=('closed', 'canceled', 'expired'), userref=userref
+                ).items()
+                if start is None or order['closetm'] > float(start)
+            ),
+            key=lambda item: item[1]['closetm'],
+            reverse=True,
+        )
+
+        ofs = int(ofs)
+        return {'closed': dict(orders[ofs:ofs + self.page_size]), 'count': len(orders)}
+
+    def api_Ledgers(self, start=None, ofs=0, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Ledgers`` API method, which returns a page of the latest
+        ledger entries.
+
+        :param start: The exclusive UNIX timestamp of the oldest ledger entry
+        :type start: None or str
+        :param ofs: The result offset
+        :type ofs: int or str
+        :param dict \\**_: The other API data
+
+        :return: The ledger entries & their total count
+        :rtype: dict
+        '''
+        entries = sorted(
+            (
+                (ledger_id, entry) for ledger_id, entry in self.ledger.items()
+                if start is None or entry['time'] > float(start)
+            ),
+            key=lambda item: item[1]['time'],
+            reverse=True,
+        )
+
+        ofs = int(ofs)
+        return {'ledger': dict(entries[ofs:ofs + self.page_size]), 'count': len(entries)}
+
+    def api_QueryOrders(self, txid, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``QueryOrders`` API method.
+
+        :param str txid: The comma-separated transaction IDs
+        :param dict \\**_: The other API data
+
+        :return: The orders
+        :rtype: dict
+        '''
+        return self.filter_orders(status=('open', 'pending', 'closed', 'canceled', 'expired'),
+                                  txids=txid.split(','))
+
+    def api_AddOrder(self, pair, userref=0, volume=0, validate='False', **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``AddOrder`` API method, which fills the order right away.
+
+        :param str pair: The trading pair
+        :param userref: The userref
+        :type userref: int or str
+        :param volume: The volume
+        :type volume: float or str
+        :param str validate: Only validate the order
+        :param dict \\**_: The other API data
+
+        :return: The order description & transaction IDs
+        :rtype: dict
+        '''
+        descr = {'order': f'buy {volume} {pair} @ market'}
+
+        if validate == 'True':
+            return {'descr': descr}
+
+        return {'descr': descr, 'txid': [self.add_order(userref=int(userref), pair=pair)]}
+
+    def api_Withdraw(self, asset, amount, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Withdraw`` API method.
+
+        :param str asset: The asset
+        :param str amount: The amount
+        :param dict \\**_: The other API data
+
+        :return: The reference ID
+        :rtype: dict
+
+        :raises MockError: When the balance is insufficient
+        '''
+        balance = float(self.balance.get(asset, 0))
+        if float(amount) > balance:
+            raise MockError('EFunding:Insufficient funds')
+
+        refid = f'MOCK-{self.requests["Withdraw"]:06d}'
+        now   = time()
+
+        self.balance[asset] = f'{balance - float(amount):.10f}'
+
+        self.ledger[f'L{len(self.ledger) + 1:05d}-MOCK'] = {
+            'refid': refid,
+            'time': now,
+            'type': 'withdrawal',
+            'asset': asset,
+            'amount': f'{-float(amount):.10f}',
+            'fee': '0.0000000000',
+            'balance': self.balance[asset],
+        }
+
+        return {'refid': refid}
+
+    def api_WithdrawInfo(self, asset, amount, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``WithdrawInfo`` API method.
+
+        :param str asset: The asset
+        :param str amount: The amount
+        :param dict \\**_: The other API data
+
+        :return: The withdrawal info
+        :rtype: dict
+        '''
+        return {'method': asset, 'limit': self.balance.get(asset, '0'), 'amount': amount, 'fee': '0.0000000000'}
+
+    @staticmethod
+    def api_WithdrawMethods(asset, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``WithdrawMethods`` API method.
+
+        :param str asset: The asset
+        :param dict \\**_: The other API data
+
+        :return: The withdrawal methods
+        :rtype: list
+        '''
+        return [{'asset': asset, 'method': asset, 'network': asset, 'minimum': '0'}]
+
+    def api_WithdrawStatus(self, asset, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``WithdrawStatus`` API method, where all withdrawals have
+        succeeded right away.
+
+        :param str asset: The asset
+        :param dict \\**_: The other API data
+
+        :return: The withdrawal statuses
+        :rtype: list
+        '''
+        return [
+            {'method': asset, 'asset': asset, 'refid': entry['refid'], 'amount': entry['amount'][1:],
+             'fee': entry['fee'], 'time': int(entry['time']), 'status': 'Success'}
+            for entry in self.ledger.values() if entry['asset'] == asset and entry['type'] == 'withdrawal'
+        ]
+
+
+class MockStreamHandler(StreamRequestHandler):
+    '''
+    The WebSocket handler of the mock Kraken stream server.
+
+    It does the opening handshake, then reads the (masked) client frames
+    until the connection is closed.
+    '''
+
+    def handle(self):
+        '''
+        Handle a WebSocket connection.
+        '''
+        if not self.handshake():
+            return
+
+        self.server.add_connection(self)
+
+        try:
+            while self.read_frame():
+                pass
+        except (OSError, ValueError, MockError) as ex:
+            LOGGER.debug('Mock stream connection failed, got «%s»', ex)
+        finally:
+            self.server.remove_connection(self)
+
+    def handshake(self):
+        '''
+        Do the opening handshake, which is rejected with HTTP 400, when it
+        isn't a valid WebSocket upgrade request.
+
+        :return: The handshake succeeded
+        :rtype: bool
+        '''
+        request = self.rfile.readline().decode('iso-8859-1').split()
+        headers = {}
+
+        while True:
+            line = self.rfile.readline().decode('iso-8859-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        key = headers.get('sec-websocket-key', '')
+
+        try:
+            valid_key = len(b64decode(key, validate=True)) == 16
+        except ValueError:
+            valid_key = False
+
+        if request[:2] != ['GET', self.server.path] or headers.get('upgrade', '').lower() != 'websocket' \
+                or headers.get('sec-websocket-version') != '13' or not valid_key:
+            self.server.count_error(f'Invalid handshake {" ".join(request)!r}')
+            self.wfile.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            return False
+
+        accept = b64encode(sha1(f'{key}{WS_GUID}'.encode('ascii')).digest()).decode('ascii')
+
+        self.wfile.write((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n'
+            '\r\n'
+        ).encode('ascii'))
+
+        return True
+
+    def read_frame(self):
+        '''
+        Read & handle a single client frame.
+
+        :return: The connection is still open
+        :rtype: bool
+
+        :raises MockError: When the frame isn't masked
+        '''
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return False
+
+        first, second = header
+        opcode        = first & 0x0F
+        length        = second & 0x7F
+
+        if length == 126:
+            length = unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = unpack('!Q', self.rfile.read(8))[0]
+
+        if not second & 0x80:
+            self.server.count_error('Unmasked client frame')
+            self.send_frame(0x8, pack('!H', 1002))
+            raise MockError('Unmasked client frame')
+
+        mask    = self.rfile.read(4)
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(self.rfile.read(length)))
+
+        if opcode == 0x8:
+            self.send_frame(0x8, payload[:2])
+            return False
+
+        if opcode == 0x9:
+            self.send_frame(0xA, payload)
+        elif opcode == 0xA:
+            self.server.pongs.append(payload)
+        elif opcode == 0x1:
+            self.server.handle_message(self, loads(payload.decode('utf-8')))
+
+        return True
+
+    def send_frame(self, opcode, payload):
+        '''
+        Send a single, unmasked server frame.
+
+        :param int opcode: The opcode
+        :param bytes payload: The payload
+        '''
+        length = len(payload)
+
+        if length < 126:
+            header = pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = pack('!BBQ', 0x80 | opcode, 127, length)
+
+        with self.server.lock:
+            self.wfile.write(header + payload)
+
+    def send(self, message):
+        '''
+        Send a JSON message.
+
+        :param dict message: The message
+        '''
+        self.send_frame(0x1, dumps(message).encode('utf-8'))
+
+
+class MockKrakenStream(ThreadingTCPServer):  # pylint: disable=too-many-instance-attributes
+    '''
+    An in-process stand-in of Kraken's authenticated WebSocket API (v2),
+    which serves the ``executions`` & ``balances`` channels of a
+    :class:`MockKraken` exchange state.
+
+    The subscriptions are verified against the token of the mock's
+    ``GetWebSocketsToken`` method, and answered with a snapshot of the open
+    orders or balances. Further updates, pings & disconnects are triggered
+    explicitly (see :meth:`publish`, :meth:`ping` & :meth:`drop`).
+
+    :param MockKraken kraken: The mock Kraken server
+    :param str address: The bind address
+    :param int port: The port (``0`` for a random one)
+    '''
+
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    #: The path of the WebSocket API.
+    path = '/v2'
+
+    #: WebSocket asset names which differ from Kraken's REST asset altnames.
+    asset_aliases = {
+        'XBT': 'BTC',
+        'XDG': 'DOGE',
+    }
+
+    def __init__(self, kraken, address='127.0.0.1', port=0):
+        super().__init__((address, port), MockStreamHandler)
+
+        self.kraken        = kraken
+        self.lock          = RLock()
+        self.connections   = []
+        self.subscriptions = {}
+        self.connects      = 0
+        self.messages      = []
+        self.pongs         = []
+        self.errors        = []
+        self.thread        = None
+
+    @property
+    def url(self):
+        '''
+        The WebSocket URL of the mock server.
+
+        :return: The URL
+        :rtype: str
+        '''
+        host, port = self.server_address[:2]
+        return f'ws://{host}:{port}{self.path}'
+
+    def start(self):
+        '''
+        Serve the WebSocket API in a background thread.
+        '''
+        LOGGER.info('Serving mock Kraken WebSocket API on %s', self.url)
+        self.thread = Thread(target=self.serve_forever, name='MockKrakenStream', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Stop serving the WebSocket API, and drop all connections.
+        '''
+        self.shutdown()
+        self.drop()
+        self.server_close()
+
+    def count_error(self, error):
+        '''
+        Count an error of a client.
+
+        :param str error: The error
+        '''
+        LOGGER.debug('Mock stream error: %s', error)
+        self.errors.append(error)
+
+    def add_connection(self, handler):
+        '''
+        Add a connection after its handshake.
+
+        :param MockStreamHandler handler: The handler of the connection
+        '''
+        with self.lock:
+            self.connections.append(handler)
+            self.subscriptions[handler] = set()
+            self.connects += 1
+
+    def remove_connection(self, handler):
+        '''
+        Remove a closed connection.
+
+        :param MockStreamHandler handler: The handler of the connection
+        '''
+        with self.lock:
+            if handler in self.connections:
+                self.connections.remove(handler)
+            self.subscriptions.pop(handler, None)
+
+    def handle_message(self, handler, message):
+        '''
+        Handle a client message, i.e. a subscription.
+
+        :param MockStreamHandler handler: The handler of the connection
+        :param dict message: The message
+        '''
+        self.messages.append(message)
+
+        params  = message.get('params', {})
+        channel = params.get('channel')
+
+        if message.get('method') != 'subscribe':
+            return
+
+        if params.get('token') != self.kraken.ws_token:
+            handler.send({'method': 'subscribe', 'success': False, 'error': 'EAccount:Invalid permissions'})
+            return
+
+        handler.send({'method': 'subscribe', 'success': True, 'result': {'channel': channel}})
+
+        # The snapshot is sent before any update published in the meantime.
+        with self.lock:
+            self.subscriptions[handler].add(channel)
+
+            if channel == 'executions' and params.get('snap_orders'):
+                handler.send({'channel': channel, 'type': 'snapshot', 'data': self.get_open_executions()})
+            elif channel == 'balances' and params.get('snapshot'):
+                handler.send({'channel': channel, 'type': 'snapshot', 'data': self.get_balances()})
+
+    def get_open_executions(self):
+        '''
+        Get the open orders of the exchange state as executions.
+
+        :return: The executions
+        :rtype: list
+        '''
+        return [
+            self.execution(txid, order_status='new')
+            for txid, order in list(self.kraken.orders.items()) if order['status'] == 'open'
+        ]
+
+    def execution(self, txid, **fields):
+        '''
+        Create an execution of an order of the exchange state.
+
+        :param str txid: The transaction ID
+        :param dict \\**fields: Additional execution fields
+
+        :return: The execution
+        :rtype: dict
+        '''
+        order = self.kraken.orders[txid]
+
+        return {
+            'order_id': txid,
+            'order_userref': order['userref'],
+            'symbol': order['descr']['pair'],
+            'order_qty': float(order['vol']),
+            'cum_qty': float(order['vol_exec']),
+            'cum_cost': float(order['cost']),
+            'avg_price': float(order['price']),
+            'timestamp': datetime.fromtimestamp(order['opentm'], timezone.utc).isoformat(),
+            **fields,
+        }
+
+    def get_balances(self):
+        '''
+        Get the balances of the exchange state, by WebSocket asset name.
+
+        :return: The balances
+        :rtype: list
+        '''
+        balances = []
+
+        for iid, amount in self.kraken.balance.items():
+            altname = self.kraken.api_Assets().get(iid, {}).get('altname', iid)
+            balances.append({'asset': self.asset_aliases.get(altname, altname), 'balance': float(amount)})
+
+        return balances
+
+    def publish(self, channel, data, message_type='update'):
+        '''
+        Publish a message to all subscribers of a channel.
+
+        :param str channel: The channel
+        :param list data: The data
+        :param str message_type: The message type
+        '''
+        with self.lock:
+            for handler, channels in self.subscriptions.items():
+                if channel in channels:
+                    handler.send({'channel': channel, 'type': message_type, 'data': data})
+
+    def ping(self, payload=b''):
+        '''
+        Ping all connections.
+
+        :param bytes payload: The ping payload
+        '''
+        with self.lock:
+            handlers = list(self.connections)
+
+        for handler in handlers:
+            handler.send_frame(0x9, payload)
+
+    def drop(self):
+        '''
+        Drop all connections without a closing handshake.
+        '''
+        with self.lock:
+            handlers = list(self.connections)
+
+        for handler in handlers:
+            handler.connection.shutdown(SHUT_RDWR)
+
+
+def record(client, path, private=False):
+    '''
+    Record real responses of the Kraken API as fixtures, which can then be
+    replayed by the mock server.
+
+    Please note the recorded private responses contain account data, and
+    therefore the fixtures file is only accessible by its owner.
+
+    :param kraken.KrakenClient client: The client
+    :param pathlib.Path path: The fixtures file path
+    :param bool private: Also record private API methods
+    '''
+    fixtures = {}
+    methods  = RECORD_METHODS['public'] + (RECORD_METHODS['private'] if private else [])
+
+    for method, params in methods:
+        LOGGER.info('Recording %s response', method)
+        fixtures[method] = client.request(method, **params)
+
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as file:
+        dump(fixtures, file, indent=2, default=lambda item: item.to_dict())
+
+
+def main():
+    '''
+    Main function for the mock server execution.
+    '''
+    # Imported here, since the mock server itself doesn't need them.
+    from .config import Config  # pylint: disable=import-outside-toplevel
+    from .kraken import KrakenClient  # pylint: disable=import-outside-toplevel
+
+    parser     = ArgumentParser(description='CryptoBob mock Kraken server')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    serve = subparsers.add_parser('serve', help='serve the mock Kraken API')
+    serve.add_argument('-a', '--address', default='127.0.0.1', help='bind address')
+    serve.add_argument('-p', '--port', type=int, default=8080, help='port')
+    serve.add_argument('-k', '--api-key', default='key', help='accepted API key')
+    serve.add_argument('-s', '--private-key', help='accepted private key (base64 encoded)')
+    serve.add_argument('-l', '--latency', type=float, default=0.0, help='injected latency in seconds')
+    serve.add_argument('-e', '--error-rate', type=float, default=0.0, help='probability of API errors')
+    serve.add_argument('--http-error-rate', type=float, default=0.0, help='probability of HTTP errors')
+    serve.add_argument('-f', '--fixtures', type=Path, help='recorded responses to replay')
+    serve.add_argument('-w', '--ws-port', type=int, help='port of the stand-in WebSocket API (optional)')
+
+    rec = subparsers.add_parser('record', help='record real Kraken API responses')
+    rec.add_argument('-c', '--config', type=Path, default=Path('~/.cryptobob.yml'),
+                     help='path to the CryptoBob config (for private API methods)')
+    rec.add_argument('-o', '--output', type=Path, required=True, help='fixtures file path')
+    rec.add_argument('--private', action='store_true', help='also record private API methods')
+
+    args = parser.parse_args()
+
+    init_logging(level=2)
+
+    if args.action == 'record':
+        config = Config(args.config) if args.private else None
+        client = KrakenClient(
+            api_key=config.api_key if config else None,
+            private_key=config.private_key if config else None,
+            otp_uri=config.get('otp_uri') if config else None,
+        )
+        record(client, args.output, private=args.private)
+        return
+
+    fixtures = None
+    if args.fixtures:
+        with args.fixtures.open('r', encoding='utf-8') as file:
+            fixtures = load(file)
+
+    server = MockKraken(
+        api_key=args.api_key,
+        private_key=args.private_key,
+        address=args.address,
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        http_error_rate=args.http_error_rate,
+        fixtures=fixtures,
+    )
+
+    if args.ws_port is not None:
+        stream = MockKrakenStream(server, address=args.address, port=args.ws_port)
+        stream.start()
+        sys.stdout.write(f'Serving mock Kraken WebSocket API on {stream.url}\n')
+
+    sys.stdout.write(f'Serving mock Kraken API on {server.url}, press Ctrl+C to stop\n')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
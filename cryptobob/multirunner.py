@@ -0,0 +1,132 @@
+'''
+CryptoBob multi runner.
+'''
+
+__all__ = (
+    'MultiRunner',
+)
+
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from time import sleep, time
+
+from .cache import ResponseCache
+from .connection import ConnectionPool
+from .exceptions import CryptoBobError
+from .metrics import MetricsServer
+from .runner import Runner
+from .tracing import TRACER
+
+LOGGER = getLogger(__name__)
+
+
+class MultiRunner:
+    '''
+    The multi runner, which hosts the runners of many accounts (i.e. configs)
+    in a single process.
+
+    All runners share the same HTTP connection pool (with the timeouts of the
+    first config) and the same response cache for public API calls, while
+    each runner keeps its own client, and therefore its own nonces, rate
+    limiter and circuit breaker per API key.
+
+    The runners are scheduled fairly: whenever runners are due, they're run
+    in the order of their deadlines (i.e. the longest waiting runner first),
+    and an error of one account doesn't affect the others.
+
+    :param list configs: The configs
+    :param int workers: The max number of runners which run concurrently
+    :param shards: The shard (index & count) per config (optional)
+    :type shards: None or list
+    :param run_dir: The directory to coordinate API keys across processes (optional)
+    :type run_dir: None or pathlib.Path
+    :param int metrics_port_offset: The offset added to the metrics port (e.g. per worker process)
+    '''
+
+    #: The max sleep duration in seconds when runners have a stream feed.
+    stream_poll_interval = 1.0
+
+    def __init__(self, configs, workers=4, shards=None, run_dir=None,  # pylint: disable=too-many-arguments
+                 metrics_port_offset=0):
+        self.workers = workers
+        self.configs = configs
+        self.offset  = metrics_port_offset
+        self.pool    = ConnectionPool.from_config(configs[0].get('timeout'), maxsize=max(workers, 4))
+        self.cache   = self.init_cache(configs)
+        self.runners = [
+            Runner(config=config, pool=self.pool, cache=self.cache, shard=shard, run_dir=run_dir)
+            for config, shard in zip(configs, shards or [None] * len(configs))
+        ]
+
+    @staticmethod
+    def init_cache(configs):
+        '''
+        Initialise the shared response cache.
+
+        The cache settings are taken from the first config which defines any.
+
+        :param list configs: The configs
+
+        :return: The response cache
+        :rtype: cache.ResponseCache
+        '''
+        for config in configs:
+            if config.get('cache_file') or config.get('cache_ttl'):
+                return ResponseCache.from_config(config)
+
+        return ResponseCache()
+
+    def run_runner(self, runner):
+        '''
+        Run the due cycle of a runner, while logging its errors.
+
+        :param runner.Runner runner: The runner
+        '''
+        try:
+            runner.run_due()
+        except CryptoBobError as ex:
+            LOGGER.error('Runner cycle for %r failed, got «%s»', str(runner.config.path), ex)
+
+    def run(self):
+        '''
+        Start all runners in an endless loop.
+        '''
+        LOGGER.info('Starting CryptoBob multi runner for %d accounts', len(self.runners))
+
+        metrics = next((config.get('metrics') for config in self.configs if config.get('metrics')), None)
+        MetricsServer.from_config(metrics, port_offset=self.offset)
+
+        trace_file = next((config.get('trace_file') for config in self.configs
+                           if config.get('trace_file')), None)
+        if trace_file:
+            TRACER.open(Path(trace_file))
+
+        for runner in self.runners:
+            runner.start()
+
+        streaming = any(runner.stream for runner in self.runners)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                for runner in self.runners:
+                    runner.handle_stream_changes()
+                    runner.reload()
+
+                now       = time()
+                deadlines = [(runner.scheduler.next_deadline(), i, runner)
+                             for i, runner in enumerate(self.runners)]
+                due       = sorted(item for item in deadlines if item[0] <= now)
+
+                if not due:
+                    reload = min(runner.next_reload() for runner in self.runners)
+                    delay  = min(min(deadlines)[0], reload) - now
+                    delay  = min(delay, Runner.max_sleep)
+                    if streaming:
+                        delay = min(delay, self.stream_poll_interval)
+                    LOGGER.debug('Nothing due, sleeping for %d seconds', delay)
+                    sleep(delay)
+                    continue
+
+                for future in [executor.submit(self.run_runner, runner) for _, _, runner in due]:
+                    future.result()
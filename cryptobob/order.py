@@ -0,0 +1,170 @@
+'''
+CryptoBob order module.
+'''
+
+__all__ = (
+    'Order',
+)
+
+
+class Order:  # pylint: disable=too-many-instance-attributes
+    '''
+    A compact representation of a Kraken order.
+
+    Kraken returns a lot of order information, while CryptoBob only needs a
+    few fields of it. Therefore orders are directly converted to instances of
+    this class while the API response is decoded, and all other fields are
+    dropped. The amounts are kept as they're returned by Kraken (i.e. as
+    strings), and only converted when they're accessed. The same applies to
+    the order description, of which only the pair is kept.
+
+    :param userref: The userref
+    :type userref: None or int
+    :param str status: The status
+    :param float opentm: The UNIX timestamp when the order was opened
+    :param float closetm: The UNIX timestamp when the order was closed
+    :param str vol: The volume
+    :param str vol_exec: The executed volume
+    :param str cost: The total cost
+    :param str fee: The total fee
+    :param str price: The average price
+    :param descr: The order description (only its pair is kept)
+    :type descr: None or dict
+    '''
+
+    __slots__ = (
+        'userref',
+        'status',
+        'opentm',
+        'closetm',
+        'vol',
+        'vol_exec',
+        'cost',
+        'fee',
+        'price',
+        'descr',
+    )
+
+    @classmethod
+    def from_dict(cls, data):
+        '''
+        Create an order from a dict, while ignoring unknown fields.
+
+        :param dict data: The order data
+
+        :return: The order
+        :rtype: Order
+        '''
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+    @classmethod
+    def object_hook(cls, data):
+        '''
+        JSON object hook, which converts order objects to orders.
+
+        :param dict data: The decoded JSON object
+
+        :return: The order or the unchanged object
+        :rtype: Order or dict
+        '''
+        if 'status' in data and 'opentm' in data:
+            return cls.from_dict(data)
+        return data
+
+    def __init__(self, userref=None, status='', opentm=0.0, closetm=0.0,  # pylint: disable=too-many-arguments
+                 vol='0', vol_exec='0', cost='0', fee='0', price='0', descr=None):
+        self.userref  = userref
+        self.status   = status
+        self.opentm   = opentm
+        self.closetm  = closetm
+        self.vol      = vol
+        self.vol_exec = vol_exec
+        self.cost     = cost
+        self.fee      = fee
+        self.price    = price
+        self.descr    = {'pair': descr.get('pair')} if descr else None
+
+    def __repr__(self):
+        '''
+        The official string version of the object.
+
+        :return: The informal string version
+        :rtype: str
+        '''
+        return (f'<{self.__class__.__name__}: {self.pair} {self.status}, '
+                f'closetm={self.closetm!r}, vol_exec={self.vol_exec}, cost={self.cost}>')
+
+    def __eq__(self, other):
+        '''
+        Compare the order with another order.
+
+        :param other: The other order
+        :type other: mixed
+
+        :return: The orders are equal
+        :rtype: bool
+        '''
+        if not isinstance(other, Order):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def to_dict(self):
+        '''
+        Convert the order to a dict (e.g. for serialisation).
+
+        :return: The order data
+        :rtype: dict
+        '''
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @property
+    def pair(self):
+        '''
+        The trading pair.
+
+        :return: The pair
+        :rtype: None or str
+        '''
+        return self.descr.get('pair') if self.descr else None
+
+    @property
+    def volume_executed(self):
+        '''
+        The executed volume.
+
+        :return: The volume
+        :rtype: float
+        '''
+        return float(self.vol_exec)
+
+    @property
+    def total_cost(self):
+        '''
+        The total cost.
+
+        :return: The cost
+        :rtype: float
+        '''
+        return float(self.cost)
+
+    @property
+    def total_fee(self):
+        '''
+        The total fee.
+
+        :return: The fee
+        :rtype: float
+        '''
+        return float(self.fee)
+
+    @property
+    def average_price(self):
+        '''
+        The average price.
+
+        :return: The price
+        :rtype: float
+        '''
+        return float(self.price)
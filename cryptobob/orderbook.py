@@ -0,0 +1,263 @@
+'''
+CryptoBob order book module.
+'''
+
+__all__ = (
+    'OrderBook',
+)
+
+from logging import getLogger
+from threading import Lock
+
+LOGGER = getLogger(__name__)
+
+
+class OrderBook:
+    '''
+    The order book, which tracks the open & closed orders of all trade plans.
+
+    Instead of querying the open & closed orders for each trade plan
+    individually, the order book fetches them once per runner cycle for all
+    trade plans, then indexes them by their ``userref``. This keeps the number
+    of private API calls constant, regardless of the number of trade plans.
+
+    The closed orders are retrieved incrementally. The order book remembers
+    the close time of the newest closed order it has seen (the cursor), and
+    only queries closed orders which were closed afterwards. Per userref only
+    the last closed order is kept, which is updated in constant time.
+
+    Orders which were known to be open, but disappeared from the open orders
+    since the last refresh, are re-checked cheaply via their transaction ID.
+    This ensures they're known, even if they aren't part of the most recent
+    closed orders anymore.
+
+    :param kraken.KrakenClient client: The client
+    '''
+
+    #: Max number of transaction IDs which can be queried at once.
+    query_batch_size = 50
+
+    #: The order status of orders which aren't closed yet.
+    open_status = ('open', 'pending')
+
+    def __init__(self, client):
+        self.client      = client
+        self.open_orders = {}
+        self.last_orders = {}
+        self.known_open  = set()
+        self.cursor      = None
+        self.dirty       = set()
+        self.lock        = Lock()
+
+    @staticmethod
+    def index(orders):
+        '''
+        Index orders by their userref.
+
+        :param dict orders: The orders by transaction ID
+
+        :return: The orders by userref & transaction ID
+        :rtype: dict
+        '''
+        index = {}
+
+        for txid, order in orders.items():
+            index.setdefault(order.userref, {})[txid] = order
+
+        return index
+
+    def refresh(self):
+        '''
+        Refresh the open & closed orders of all trade plans.
+
+        :return: The number of newly closed orders
+        :rtype: int
+        '''
+        LOGGER.debug('Refreshing order book')
+
+        open_orders   = self.client.request('OpenOrders')['open']
+        closed_orders = self.fetch_closed_orders()
+        cursor        = max((order.closetm for order in closed_orders.values()),
+                            default=self.cursor)
+
+        gone = self.known_open - open_orders.keys() - closed_orders.keys()
+        if gone:
+            LOGGER.debug('Re-checking %d orders which are no longer open', len(gone))
+            for txid, order in self.query_orders(gone).items():
+                if order.status in self.open_status:
+                    open_orders[txid] = order
+                else:
+                    closed_orders[txid] = order
+
+        with self.lock:
+            self.open_orders = self.index(open_orders)
+            self.known_open  = set(open_orders)
+
+            for txid, order in closed_orders.items():
+                self.update_last_order(txid, order)
+
+            self.cursor = cursor
+
+        return len(closed_orders)
+
+    def fetch_closed_orders(self):
+        '''
+        Fetch the closed orders which were closed since the last refresh.
+
+        On the first refresh, only the most recent closed orders are fetched.
+        Afterwards all orders closed after the cursor are fetched page by page.
+
+        :return: The closed orders by transaction ID
+        :rtype: dict
+        '''
+        if self.cursor is None:
+            return self.client.request('ClosedOrders', closetime='close')['closed']
+
+        orders = {}
+
+        while True:
+            result = self.client.request(
+                'ClosedOrders',
+                closetime='close',
+                start=self.cursor,
+                ofs=len(orders),
+            )
+
+            page = result['closed']
+            orders.update(page)
+
+            if not page or len(orders) >= result.get('count', 0):
+                break
+
+        LOGGER.debug('Fetched %d orders closed since %r', len(orders), self.cursor)
+
+        return orders
+
+    def update_last_order(self, txid, order):
+        '''
+        Update the last closed order of a userref.
+
+        :param str txid: The transaction ID
+        :param order.Order order: The closed order
+        '''
+        closetm = order.closetm
+        userref = order.userref
+        last    = self.last_orders.get(userref)
+
+        if last is None or closetm > last[1].closetm:
+            self.last_orders[userref] = (txid, order)
+            self.dirty.add(userref)
+
+    def apply(self, txid, order):
+        '''
+        Apply a pushed order update (e.g. from the stream feed).
+
+        :param str txid: The transaction ID
+        :param order.Order order: The order
+        '''
+        with self.lock:
+            open_orders = self.open_orders.setdefault(order.userref, {})
+
+            if order.status in self.open_status:
+                open_orders[txid] = order
+                self.known_open.add(txid)
+                return
+
+            open_orders.pop(txid, None)
+            self.known_open.discard(txid)
+            self.update_last_order(txid, order)
+
+    def query_orders(self, txids):
+        '''
+        Query orders by their transaction IDs.
+
+        :param txids: The transaction IDs
+        :type txids: iterable
+
+        :return: The orders by transaction ID
+        :rtype: dict
+        '''
+        txids  = sorted(txids)
+        orders = {}
+        size   = self.query_batch_size
+
+        for i in range(0, len(txids), size):
+            orders.update(self.client.request('QueryOrders', txid=','.join(txids[i:i + size])))
+
+        return orders
+
+    def add_open_orders(self, txids):
+        '''
+        Add the transaction IDs of newly opened orders.
+
+        :param list txids: The transaction IDs
+        '''
+        with self.lock:
+            self.known_open.update(txids)
+
+    def get_open_orders(self, userref):
+        '''
+        Get the open orders of a userref.
+
+        :param int userref: The userref
+
+        :return: The open orders by transaction ID
+        :rtype: dict
+        '''
+        return self.open_orders.get(userref, {})
+
+    def get_last_closed_order(self, userref):
+        '''
+        Get the last closed order of a userref.
+
+        If the userref wasn't seen by the order book yet, its closed orders are
+        queried specifically once.
+
+        :param int userref: The userref
+
+        :return: The last closed order
+        :rtype: None or order.Order
+        '''
+        if userref not in self.last_orders:
+            LOGGER.debug('Userref %r unknown to order book, querying its closed orders', userref)
+            orders = self.client.request('ClosedOrders', userref=userref)['closed']
+
+            with self.lock:
+                self.last_orders.setdefault(userref, None)
+                self.dirty.add(userref)
+                for txid, order in orders.items():
+                    self.update_last_order(txid, order)
+
+        last = self.last_orders[userref]
+
+        return last[1] if last else None
+
+    def load(self, state):
+        '''
+        Load the order book from the state store.
+
+        :param state.StateStore state: The state store
+        '''
+        with self.lock:
+            self.last_orders = state.get_last_orders()
+            self.known_open  = set(state.get('known_open', []))
+            self.cursor      = state.get('closed_orders_cursor')
+            self.dirty       = set()
+
+        LOGGER.debug('Loaded %d last closed orders from state store, cursor is %r',
+                     len(self.last_orders), self.cursor)
+
+    def save(self, state):
+        '''
+        Save the changes of the order book to the state store.
+
+        :param state.StateStore state: The state store
+        '''
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+
+            for userref in dirty:
+                state.set_last_order(userref, self.last_orders.get(userref))
+
+            state.set('known_open', sorted(self.known_open))
+            state.set('closed_orders_cursor', self.cursor)
@@ -0,0 +1,180 @@
+'''
+CryptoBob rate limit module.
+'''
+
+__all__ = (
+    'RateLimiter',
+)
+
+from logging import getLogger
+from threading import Lock
+from time import monotonic, sleep
+
+from .exceptions import ConfigError
+
+LOGGER = getLogger(__name__)
+
+
+class RateLimiter:
+    '''
+    A client-side model of Kraken's API call counter.
+
+    Kraken assigns a call counter to each API key. Each private API call
+    increases the counter by its cost, while the counter decreases over time
+    depending on the verification tier. When the counter exceeds its max,
+    Kraken responds with ``EAPI:Rate limit exceeded``.
+
+    The rate limiter mirrors that counter as a token bucket. Each call
+    reserves its cost right away, and waits until the counter decayed enough
+    to stay within the max. This way concurrent calls are queued in order and
+    paced at the highest sustainable rate.
+
+    :param float max_counter: The max counter
+    :param float decay: The counter decay per second
+    :param costs: Custom costs per API method (optional)
+    :type costs: None or dict
+    '''
+
+    #: The max counter & decay per second for each verification tier.
+    tiers = {
+        'starter': (15, 0.33),
+        'intermediate': (20, 0.5),
+        'pro': (20, 1.0),
+    }
+
+    #: The cost per API method, where it differs from the default cost of 1.
+    #: Trading calls have their own limits on Kraken's matching engine.
+    costs = {
+        'AddOrder': 0,
+        'AddOrderBatch': 0,
+        'CancelAll': 0,
+        'CancelAllOrdersAfter': 0,
+        'CancelOrder': 0,
+        'CancelOrderBatch': 0,
+        'EditOrder': 0,
+        'Ledgers': 2,
+        'QueryLedgers': 2,
+        'QueryTrades': 2,
+        'TradesHistory': 2,
+    }
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        '''
+        Create a rate limiter from a ``rate_limit`` configuration.
+
+        The configuration can either reference a ``tier``, or define the
+        ``max_counter`` and ``decay`` explicitly. Additionally, the ``costs``
+        of API methods can be overwritten.
+
+        :param config: The rate limit configuration
+        :type config: None or dict
+        :param dict \\**kwargs: Additional constructor arguments
+
+        :return: The rate limiter
+        :rtype: RateLimiter
+
+        :raises ConfigError: When the configuration is invalid
+        '''
+        config = dict(config or {})
+        tier   = config.pop('tier', 'starter')
+
+        try:
+            max_counter, decay = cls.tiers[tier]
+        except KeyError as ex:
+            raise ConfigError(f'Unknown rate limit tier {tier!r}') from ex
+
+        try:
+            return cls(**{'max_counter': max_counter, 'decay': decay, **config, **kwargs})
+        except TypeError as ex:
+            raise ConfigError(f'Rate limit configuration misconfigured, got «{ex}»') from ex
+
+    def __init__(self, max_counter=15, decay=0.33, costs=None):
+        self.max_counter = max_counter
+        self.decay       = decay
+        self.costs       = {**self.costs, **(costs or {})}
+        self.value       = 0.0
+        self.updated     = monotonic()
+        self.lock        = Lock()
+
+    def _update(self):
+        '''
+        Decay the counter until now.
+
+        :return: The decayed counter
+        :rtype: float
+        '''
+        now          = monotonic()
+        self.value   = max(0.0, self.value - (now - self.updated) * self.decay)
+        self.updated = now
+        return self.value
+
+    @property
+    def counter(self):
+        '''
+        The current call counter, incl. the reserved but not yet sent calls.
+
+        :return: The counter
+        :rtype: float
+        '''
+        with self.lock:
+            return self._update()
+
+    @property
+    def headroom(self):
+        '''
+        The remaining headroom until the max counter is reached.
+
+        :return: The headroom
+        :rtype: float
+        '''
+        return max(0.0, self.max_counter - self.counter)
+
+    def acquire(self, api_method):
+        '''
+        Reserve the cost of an API call and wait until it can be sent.
+
+        :param str api_method: The API method
+        '''
+        cost = self.costs.get(api_method, 1)
+        if not cost:
+            return
+
+        with self.lock:
+            counter = self._update() + cost
+            self.value = counter
+
+        wait = (counter - self.max_counter) / self.decay
+        if wait > 0:
+            LOGGER.debug('Rate limit counter at %.2f, delaying %s for %.2f seconds',
+                         counter, api_method, wait)
+            sleep(wait)
+
+    def try_acquire(self, api_method):
+        '''
+        Reserve the cost of an API call, but only if the counter stays within
+        its max (i.e. how Kraken itself enforces the rate limit).
+
+        :param str api_method: The API method
+
+        :return: The cost was reserved
+        :rtype: bool
+        '''
+        cost = self.costs.get(api_method, 1)
+
+        with self.lock:
+            counter = self._update() + cost
+            if counter > self.max_counter:
+                return False
+            self.value = counter
+
+        return True
+
+    def exceeded(self):
+        '''
+        Register that Kraken reported an exceeded rate limit, which means the
+        counter on Kraken's side is at its max.
+        '''
+        with self.lock:
+            self._update()
+            self.value = max(self.value, float(self.max_counter))
@@ -0,0 +1,182 @@
+'''
+CryptoBob resilience module.
+'''
+
+__all__ = (
+    'CircuitBreaker',
+    'RetryPolicy',
+)
+
+from logging import getLogger
+from random import uniform
+from threading import Lock
+from time import monotonic
+
+from .exceptions import CircuitOpenError, ConfigError
+from .metrics import API_CIRCUIT_OPENED
+
+LOGGER = getLogger(__name__)
+
+
+class RetryPolicy:
+    '''
+    The retry policy of requests, which failed with a transient error (e.g.
+    a timeout or an HTTP 5xx error).
+
+    The retries are delayed by an exponential backoff with full jitter, i.e.
+    a random delay between zero and the exponentially growing backoff, so
+    that concurrent requests don't retry in lockstep.
+
+    :param int retries: The max number of retries
+    :param float backoff: The backoff of the first retry in seconds
+    :param float max_backoff: The max backoff in seconds
+    '''
+
+    @classmethod
+    def from_config(cls, config):
+        '''
+        Create a retry policy from a ``retry`` configuration.
+
+        :param config: The retry configuration
+        :type config: None or dict
+
+        :return: The retry policy
+        :rtype: RetryPolicy
+
+        :raises ConfigError: When the configuration is invalid
+        '''
+        try:
+            return cls(**(config or {}))
+        except TypeError as ex:
+            raise ConfigError(f'Retry configuration misconfigured, got «{ex}»') from ex
+
+    def __init__(self, retries=2, backoff=0.5, max_backoff=8.0):
+        self.retries     = retries
+        self.backoff     = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt):
+        '''
+        Get the jittered delay before a retry.
+
+        :param int attempt: The number of the failed attempt (starting at 0)
+
+        :return: The delay in seconds
+        :rtype: float
+        '''
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker:
+    '''
+    A circuit breaker per API method, which stops sending requests to an
+    endpoint while Kraken is degraded.
+
+    After :attr:`threshold` consecutive failures (i.e. HTTP 5xx errors,
+    timeouts or connection errors) of an endpoint, its circuit opens, and requests fail right away
+    without being sent. A circuit can also be tripped explicitly, e.g. the one
+    of the system status, when it isn't online. Since each cycle starts by
+    asserting the system status, cycles then end before sending anything.
+    After the cooldown, the circuit is half-open and lets a single trial
+    request through, which either closes the circuit again, or reopens it.
+
+    :param int threshold: The number of consecutive failures to open a circuit
+    :param float cooldown: The time in seconds until an open circuit is retried
+    '''
+
+    @classmethod
+    def from_config(cls, config):
+        '''
+        Create a circuit breaker from a ``circuit_breaker`` configuration.
+
+        :param config: The circuit breaker configuration
+        :type config: None or dict
+
+        :return: The circuit breaker
+        :rtype: CircuitBreaker
+
+        :raises ConfigError: When the configuration is invalid
+        '''
+        try:
+            return cls(**(config or {}))
+        except TypeError as ex:
+            raise ConfigError(f'Circuit breaker configuration misconfigured, got «{ex}»') from ex
+
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown  = cooldown
+        self.failures  = {}
+        self.opened    = {}
+        self.lock      = Lock()
+
+    def check(self, api_method):
+        '''
+        Check if a request to an API method may be sent.
+
+        When the cooldown of an open circuit is over, the circuit turns
+        half-open, and only the current request is let through as a trial.
+
+        :param str api_method: The API method
+
+        :raises exceptions.CircuitOpenError: When the circuit is open
+        '''
+        now = monotonic()
+
+        with self.lock:
+            opened = self.opened.get(api_method)
+            if opened is None:
+                return
+
+            if now < opened + self.cooldown:
+                raise CircuitOpenError(f'Circuit of {api_method} is open, since Kraken is degraded')
+
+            LOGGER.info('Circuit of %s is half-open, sending trial request', api_method)
+
+            # Restart the cooldown until the trial request succeeded, so that only one is sent.
+            self.opened[api_method] = now
+
+    def success(self, api_method):
+        '''
+        Record a successful request, which closes the circuit.
+
+        :param str api_method: The API method
+        '''
+        with self.lock:
+            self.failures.pop(api_method, None)
+
+            if self.opened.pop(api_method, None) is not None:
+                LOGGER.info('Circuit of %s closed', api_method)
+
+    def failure(self, api_method):
+        '''
+        Record a failed request, which opens the circuit after too many
+        consecutive failures.
+
+        :param str api_method: The API method
+        '''
+        with self.lock:
+            self.failures[api_method] = self.failures.get(api_method, 0) + 1
+
+            if self.failures[api_method] >= self.threshold:
+                self._open(api_method)
+
+    def trip(self, api_method):
+        '''
+        Open the circuit of an API method right away.
+
+        :param str api_method: The API method
+        '''
+        with self.lock:
+            self._open(api_method)
+
+    def _open(self, api_method):
+        '''
+        Open a circuit, or restart its cooldown.
+
+        :param str api_method: The API method
+        '''
+        if api_method not in self.opened:
+            LOGGER.warning('Opening circuit of %s for %d seconds', api_method, self.cooldown)
+            API_CIRCUIT_OPENED.labels(api_method).inc()
+
+        self.opened[api_method] = monotonic()
@@ -6,28 +6,109 @@ __all__ = (
     'Runner',
 )
 
+from asyncio import Semaphore, gather, get_running_loop, to_thread
+from asyncio import run as asyncio_run
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from logging import getLogger
-from time import sleep
-
-from .exceptions import ConfigError, TradePlanError
+from math import inf
+from pathlib import Path
+from time import perf_counter
+
+from .balance import BalanceTracker
+from .cache import ResponseCache
+from .clock import Clock
+from .connection import ConnectionPool
+from .coordination import KeyCoordinator, SharedRateLimiter
+from .exceptions import ConfigError, CryptoBobError, TradePlanError
+from .funding import FundingTracker
+from .indicators import IndicatorEngine
 from .kraken import KrakenClient
+from .marketdata import MarketData
+from .metrics import CYCLE_DURATION, CYCLE_ERRORS, RATE_LIMIT_HEADROOM, TRADE_PLANS, WITHDRAWALS, MetricsServer
+from .orderbook import OrderBook
+from .ratelimit import RateLimiter
+from .resilience import CircuitBreaker, RetryPolicy
+from .scheduler import Scheduler
+from .state import StateStore
+from .stream import StreamFeed
+from .tracing import TRACER, CycleProfiler
 from .tradeplan import TradePlan
 from .withdrawal import Withdrawal
 
 LOGGER = getLogger(__name__)
 
 
-class Runner:
+class Runner:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
     '''
     The CryptoBob runner class which initiates all the trades.
     '''
 
-    def __init__(self, config):
+    #: The max sleep duration in seconds, even when nothing is scheduled.
+    max_sleep = 3600
+
+    #: The config keys which can't be reloaded, but require a restart.
+    restart_keys = (
+        'api_key',
+        'private_key',
+        'otp_uri',
+        'api_url',
+        'rate_limit',
+        'timeout',
+        'retry',
+        'circuit_breaker',
+        'indicator_interval',
+        'cache_file',
+        'cache_ttl',
+        'state_file',
+        'streaming',
+        'stream_url',
+        'metrics',
+        'trace_file',
+        'profile',
+    )
+
+    def __init__(self, config, pool=None, cache=None, shard=None,  # pylint: disable=too-many-arguments
+                 run_dir=None, clock=None, client=None):
         '''
         Constructor.
+
+        :param config.Config config: The config
+        :param pool: A shared HTTP connection pool (optional)
+        :type pool: None or connection.ConnectionPool
+        :param cache: A shared response cache (optional)
+        :type cache: None or cache.ResponseCache
+        :param shard: The shard index & count of the trade plans (optional)
+        :type shard: None or tuple(int, int)
+        :param run_dir: The directory to coordinate API keys across processes (optional)
+        :type run_dir: None or pathlib.Path
+        :param clock: The clock (optional, e.g. a virtual clock for simulations)
+        :type clock: None or clock.Clock
+        :param client: The client (optional, e.g. a fake exchange for simulations)
+        :type client: None or kraken.KrakenClient
         '''
         self.config      = config
-        self.client      = None
+        self.pool        = pool
+        self.cache       = cache
+        self.shard       = shard
+        self.run_dir     = run_dir
+        self.clock       = clock or Clock()
+        self.client      = client
+        self.order_book  = None
+        self.balances    = None
+        self.funding     = None
+        self.indicators  = None
+        self.market_data = None
+        self.state       = None
+        self.scheduler   = Scheduler()
+        self.profiler    = None
+        self.stream      = None
+        self.reconciled  = 0.0
+        self.reloaded    = 0.0
+        self.decisions   = None
+        self.cycles      = 0
+        self.deadline    = None
+        self.deferred    = []
         self.trade_plans = []
         self.withdrawals  = []
 
@@ -38,22 +119,59 @@ class Runner:
         Run the runner by executing all test cases.
         '''
         self.init_client()
+        self.init_indicators()
+        self.init_market_data()
         self.init_trade_plans()
         self.init_withdrawals()
+        self.init_balances()
+        self.init_funding()
+        self.init_state()
+        self.init_profiler()
 
     def init_client(self):
         '''
-        Initialise the client.
+        Initialise the client, unless it was passed to the runner.
         '''
+        if self.client:
+            self.order_book = OrderBook(client=self.client)
+            return
+
         LOGGER.debug('Initialising client')
 
         kwargs = {
             'api_key': self.config.api_key,
             'private_key': self.config.private_key,
-            'otp_uri': self.config.get('otp_uri')
+            'otp_uri': self.config.get('otp_uri'),
+            'pool': self.pool or ConnectionPool.from_config(self.config.get('timeout')),
+            'cache': self.cache or self.init_cache(),
+            'api_url': self.config.get('api_url'),
+            'retry_policy': RetryPolicy.from_config(self.config.get('retry')),
+            'circuit_breaker': CircuitBreaker.from_config(self.config.get('circuit_breaker')),
         }
 
-        self.client = KrakenClient(**kwargs)
+        if self.run_dir:
+            coordinator            = KeyCoordinator(run_dir=self.run_dir, api_key=self.config.api_key)
+            kwargs['coordinator']  = coordinator
+            kwargs['rate_limiter'] = SharedRateLimiter.from_config(self.config.get('rate_limit'),
+                                                                   coordinator=coordinator)
+        else:
+            kwargs['rate_limiter'] = RateLimiter.from_config(self.config.get('rate_limit'))
+
+        self.client     = KrakenClient(**kwargs)
+        self.order_book = OrderBook(client=self.client)
+
+        RATE_LIMIT_HEADROOM.labels(self.config.path.stem).set_function(
+            lambda limiter=self.client.rate_limiter: limiter.headroom
+        )
+
+    def init_cache(self):
+        '''
+        Initialise the response cache for public API calls.
+
+        :return: The response cache
+        :rtype: cache.ResponseCache
+        '''
+        return ResponseCache.from_config(self.config)
 
     def init_configuration_instances(self, klass):
         '''
@@ -68,24 +186,82 @@ class Runner:
 
         :param class klass: The class
 
+        :raises ConfigError: When there's configuration / kwarg error
+        '''
+        LOGGER.debug('Initialising %s instances', klass.__name__)
+
+        items = []
+        setattr(self, klass.configuration_attribute, items)
+
+        for item in self.get_configuration_definitions(klass):
+            items.append(self.create_configuration_instance(klass, item))
+
+    def get_configuration_definitions(self, klass):
+        '''
+        Get the configuration definitions of a class, which belong to the
+        shard of the runner.
+
+        If the runner is a shard, only every n-th trade plan is kept, while
+        only the first shard keeps the withdrawals.
+
+        :param class klass: The class
+
+        :return: The definitions
+        :rtype: list
+
+        :raises ConfigError: When the definitions are missing
+        '''
+        definitions = getattr(self.config, klass.configuration_attribute)
+
+        if not self.shard:
+            return definitions
+
+        index, count = self.shard
+
+        if klass is TradePlan:
+            return definitions[index::count]
+
+        return definitions if index == 0 else []
+
+    def create_configuration_instance(self, klass, item):
+        '''
+        Create an instance from its configuration definition.
+
+        :param class klass: The class
+        :param dict item: The definition
+
+        :return: The instance
+        :rtype: mixed
+
         :raises ConfigError: When there's configuration / kwarg error
         '''
         name = klass.__name__
-        attr = klass.configuration_attribute
 
-        LOGGER.debug('Initialising %s instances', name)
+        LOGGER.debug('Initialising %s instance for configuration %r', name, item)
 
-        items = []
-        setattr(self, attr, items)
+        try:
+            return klass(runner=self, **item)
+        except TypeError as ex:
+            error = f'{name} configuration {item!r} misconfigured, got «{ex}»'
+            raise ConfigError(error) from ex
 
-        for item in getattr(self.config, attr):
-            LOGGER.debug('Initialising %s instance for configuration %r', name, item)
+    def init_indicators(self):
+        '''
+        Initialise the indicator engine, which keeps the OHLC series of the
+        trading pairs of conditional trade plans.
+        '''
+        self.indicators = IndicatorEngine(
+            client=self.client,
+            clock=self.clock,
+            interval=self.config.get('indicator_interval', 60),
+        )
 
-            try:
-                items.append(klass(runner=self, **item))
-            except TypeError as ex:
-                error = f'{name} configuration {item!r} misconfigured, got «{ex}»'
-                raise ConfigError(error) from ex
+    def init_market_data(self):
+        '''
+        Initialise the market data, which shares a single ticker snapshot of
+        all trading pairs per cycle.
+        '''
+        self.market_data = MarketData(client=self.client, clock=self.clock)
 
     def init_trade_plans(self):
         '''
@@ -99,39 +275,598 @@ class Runner:
         '''
         self.init_configuration_instances(Withdrawal)
 
+    def init_balances(self):
+        '''
+        Initialise the balance tracker, which refreshes the full balance when
+        the projected balance crosses the threshold of a withdrawal.
+        '''
+        self.balances = BalanceTracker(
+            client=self.client,
+            clock=self.clock,
+            reconcile_interval=self.config.get('balance_reconcile_interval', 1440) * 60,
+            thresholds=self.get_withdrawal_thresholds(),
+        )
+
+    def get_withdrawal_thresholds(self):
+        '''
+        Get the lowest withdrawal threshold of each asset.
+
+        :return: The thresholds by asset
+        :rtype: dict
+        '''
+        thresholds = {}
+
+        for withdrawal in self.withdrawals:
+            threshold                    = thresholds.get(withdrawal.asset, withdrawal.threshold)
+            thresholds[withdrawal.asset] = min(threshold, withdrawal.threshold)
+
+        return thresholds
+
+    def init_funding(self):
+        '''
+        Initialise the funding tracker, which caches the withdrawal metadata
+        and tracks the in-flight withdrawals.
+        '''
+        self.funding = FundingTracker(
+            client=self.client,
+            clock=self.clock,
+            ttl=self.config.get('withdrawal_cache_ttl', 60) * 60,
+        )
+
+    def init_state(self):
+        '''
+        Initialise the optional state store and restore the runtime state.
+        '''
+        path = self.config.get('state_file')
+        if not path:
+            return
+
+        LOGGER.debug('Initialising state store')
+
+        path = Path(path).expanduser()
+        if self.shard and self.shard[1] > 1:
+            path = path.with_name(f'{path.stem}.{self.shard[0]}{path.suffix}')
+
+        self.state = StateStore(path=path)
+        self.order_book.load(self.state)
+        self.balances.load(self.state)
+        self.funding.load(self.state)
+
+        failures = self.state.get_failures()
+        for trade_plan in self.trade_plans:
+            trade_plan.last_failed = failures.get(trade_plan.userref)
+            trade_plan.expire_failure()
+
+    def init_profiler(self):
+        '''
+        Initialise the optional cycle profiler.
+        '''
+        prefix = self.config.path.stem
+        if self.shard and self.shard[1] > 1:
+            prefix = f'{prefix}.{self.shard[0]}'
+
+        self.profiler = CycleProfiler.from_config(self.config.get('profile'), prefix=prefix)
+
+    def save_state(self, **cycle):
+        '''
+        Save the runtime state to the state store (if any), and commit it.
+
+        :param dict \\**cycle: The cycle metadata
+        '''
+        if not self.state:
+            return
+
+        self.order_book.save(self.state)
+        self.balances.save(self.state)
+        self.funding.save(self.state)
+
+        for trade_plan in self.trade_plans:
+            self.state.set_failure(trade_plan.userref, trade_plan.last_failed)
+
+        if cycle:
+            self.state.set('cycle', cycle)
+
+        self.state.commit()
+
     def buy(self):
         '''
         Open buy orders, regardless of the interval.
         '''
         LOGGER.info('Opening buy orders')
 
+        self.market_data.reset(trade_plan.pair for trade_plan in self.trade_plans)
+
         for trade_plan in self.trade_plans:
             trade_plan.open_order()
 
-    def run(self):
+        self.save_state()
+
+    def start(self):
         '''
-        Start the runner cycle in an endless loop.
+        Start the runner by scheduling all trade plans & withdrawals, and by
+        starting the stream feed (if enabled).
         '''
         LOGGER.info('Starting CryptoBob runner')
 
-        interval = self.config.interval * 60
+        self.cycles = self.state.get('cycle', {}).get('count', 0) if self.state else 0
+
+        for item in self.trade_plans + self.withdrawals:
+            self.scheduler.schedule(item, self.clock.time())
+
+        if self.config.get('streaming', False):
+            self.stream = StreamFeed(runner=self, url=self.config.get('stream_url'))
+            self.stream.start()
+
+    def run(self, until=None):
+        '''
+        Start the runner in an endless loop.
+
+        The runner keeps the next due time of each trade plan & withdrawal in
+        a scheduler. It sleeps until the earliest deadline, then runs a cycle
+        for the due trade plans and withdrawals only. When nothing is due, no
+        API requests are made at all.
+
+        A failed cycle (e.g. because Kraken is in maintenance, or its circuit
+        is open) is logged, while the loop goes on.
+
+        :param until: The UNIX timestamp at which the loop ends (optional)
+        :type until: None or float
+        '''
+        MetricsServer.from_config(self.config.get('metrics'))
+
+        if self.config.get('trace_file'):
+            TRACER.open(Path(self.config.get('trace_file')))
+
+        self.start()
+
+        while until is None or self.clock.time() < until:
+            self.reload()
+
+            now   = self.clock.time()
+            delay = min(self.scheduler.next_deadline(), self.next_reload()) - now
+            delay = min(delay, self.max_sleep)
+            if until is not None:
+                delay = min(delay, until - now)
+            if delay > 0:
+                LOGGER.debug('Nothing due, sleeping for %d seconds', delay)
+                self.sleep(delay)
+                continue
+
+            try:
+                self.run_due()
+            except CryptoBobError as ex:
+                LOGGER.error('Runner cycle failed, got «%s»', ex)
+
+    def next_reload(self):
+        '''
+        Get the time at which the config is checked for changes next.
+
+        :return: The UNIX timestamp, or infinity when reloading is disabled
+        :rtype: float
+        '''
+        interval = self.config.get('reload_interval')
+        return self.reloaded + interval * 60 if interval else inf
+
+    def reload(self):
+        '''
+        Reload the config when it changed (if enabled), then apply the changes
+        to the trade plans & withdrawals.
+
+        Only the added, changed & removed trade plans and withdrawals are
+        touched, while the others are kept as they are. Changed instances
+        keep their state (e.g. the last order or failure). An invalid config
+        is reported, while the current one is kept.
+
+        :return: The config was reloaded
+        :rtype: bool
+        '''
+        now = self.clock.time()
+        if now < self.next_reload():
+            return False
+
+        self.reloaded = now
+        previous      = self.config.data
+
+        try:
+            if not self.config.reload():
+                return False
+            changes = [self.diff_configuration_instances(klass) for klass in (TradePlan, Withdrawal)]
+        except ConfigError as ex:
+            self.config.data = previous
+            LOGGER.error('Reloading configuration %r failed, keeping current one, got «%s»',
+                         str(self.config.path), ex)
+            return False
+
+        for key in self.restart_keys:
+            if previous.get(key) != self.config.data.get(key):
+                LOGGER.warning('Changed configuration property %r requires a restart, ignoring it', key)
+                self.config.data[key] = previous.get(key)
+
+        for klass, change in zip((TradePlan, Withdrawal), changes):
+            self.apply_configuration_changes(klass, *change)
+
+        self.balances.thresholds = self.get_withdrawal_thresholds()
+
+        return True
+
+    def diff_configuration_instances(self, klass):
+        '''
+        Diff the current instances of a class with their reloaded definitions.
+
+        The instances are matched with the definitions by their configuration
+        key (e.g. the pair of trade plans) in order of appearance.
+
+        :param class klass: The class
+
+        :return: The instances, the added, the updated (incl. the reloaded) & removed instances
+        :rtype: tuple(list, list, list, list)
+
+        :raises ConfigError: When there's configuration / kwarg error
+        '''
+        key      = klass.configuration_key
+        existing = {}
+
+        for instance in getattr(self, klass.configuration_attribute):
+            existing.setdefault(getattr(instance, key), []).append(instance)
+
+        items   = []
+        added   = []
+        updated = []
+
+        for item in self.get_configuration_definitions(klass):
+            reloaded = self.create_configuration_instance(klass, item)
+            matches  = existing.get(getattr(reloaded, key))
+
+            if matches:
+                instance = matches.pop(0)
+                items.append(instance)
+                updated.append((instance, reloaded))
+            else:
+                items.append(reloaded)
+                added.append(reloaded)
+
+        removed = [instance for matches in existing.values() for instance in matches]
+
+        return items, added, updated, removed
+
+    def apply_configuration_changes(self, klass, items, added, updated, removed):  # pylint: disable=too-many-arguments
+        '''
+        Apply the changes of a diff, and (re)schedule the affected instances.
+
+        :param class klass: The class
+        :param list items: The instances
+        :param list added: The added instances
+        :param list updated: The updated & reloaded instances
+        :param list removed: The removed instances
+        '''
+        changed = [instance for instance, reloaded in updated if instance.update(reloaded)]
+
+        setattr(self, klass.configuration_attribute, items)
+
+        for instance in removed:
+            self.scheduler.unschedule(instance)
+
+        for instance in added + changed:
+            self.scheduler.schedule(instance, instance.next_due())
+
+        LOGGER.info('Reloaded %s instances: %d added, %d changed, %d removed',
+                    klass.__name__, len(added), len(changed), len(removed))
+
+    def run_due(self):
+        '''
+        Run a cycle for the trade plans & withdrawals which are due now.
+
+        If a ``concurrency`` greater than 1 is configured, the trade plans and
+        withdrawals of a cycle are evaluated concurrently. However, only their
+        public requests (e.g. the market data) are sent concurrently, while
+        the private requests of an API key are sent one after another (incl.
+        their responses), so that their nonces reach Kraken in order.
+
+        The cycle has a time budget (the ``cycle_timeout``, which defaults to
+        the runner interval). When it's exhausted, the remaining trade plans
+        and withdrawals are deferred to the next cycle, instead of delaying
+        everything else.
+
+        All trade plans & withdrawals of the cycle share a single market data
+        snapshot, which is taken on first access.
+
+        The cycle is traced as root span (if tracing is enabled), and profiled
+        (if profiling is enabled).
+        '''
+        concurrency = self.config.get('concurrency', 1)
+        due         = self.scheduler.pop_due(self.clock.time())
+        trade_plans = [item for item in due if isinstance(item, TradePlan)]
+        withdrawals = [item for item in due if isinstance(item, Withdrawal)]
+
+        LOGGER.debug('========== START: Starting new runner cycle for %d trade plans '
+                     'and %d withdrawals', len(trade_plans), len(withdrawals))
+
+        started       = self.clock.time()
+        timer         = perf_counter()
+        failed        = False
+        self.deadline = started + self.config.get('cycle_timeout', self.config.interval) * 60
+        self.deferred = []
+        self.cycles  += 1
+
+        self.market_data.reset(trade_plan.pair for trade_plan in self.trade_plans)
+
+        TRADE_PLANS.labels('due').inc(len(trade_plans))
+
+        try:
+            with TRACER.span('cycle', count=self.cycles, account=self.config.path.stem,
+                             trade_plans=len(trade_plans), withdrawals=len(withdrawals)), \
+                    self.profile(self.cycles):
+                if concurrency > 1:
+                    asyncio_run(self.run_cycle_async(
+                        trade_plans=trade_plans,
+                        withdrawals=withdrawals,
+                        concurrency=concurrency,
+                    ))
+                else:
+                    self.run_cycle(trade_plans=trade_plans, withdrawals=withdrawals)
+        except CryptoBobError as ex:
+            failed = True
+            CYCLE_ERRORS.labels(type(ex).__name__).inc()
+            raise
+        finally:
+            self.reschedule(trade_plans=trade_plans, withdrawals=withdrawals, started=started, failed=failed)
+            CYCLE_DURATION.observe(perf_counter() - timer)
+
+        self.save_state(started=started, duration=perf_counter() - timer, count=self.cycles)
+
+        LOGGER.debug('========== FINISH: Runner cycle finished')
+
+    def profile(self, cycle):
+        '''
+        Profile a cycle, if profiling is enabled.
+
+        :param int cycle: The cycle number
+
+        :return: The profiling context manager
+        :rtype: contextlib.AbstractContextManager
+        '''
+        if self.profiler:
+            return self.profiler.profile(cycle)
+        return nullcontext()
+
+    def sleep(self, delay):
+        '''
+        Sleep until the delay is over, or the stream feed pushed changes.
+
+        :param float delay: The delay in seconds
+        '''
+        if not self.stream:
+            self.clock.sleep(delay)
+            return
+
+        self.stream.changed.wait(delay)
+        self.handle_stream_changes()
+
+    def handle_stream_changes(self):
+        '''
+        Handle the changes pushed by the stream feed (i.e. orders were closed
+        or the balance changed), by rescheduling the withdrawals immediately.
+        '''
+        if not self.stream or not self.stream.changed.is_set():
+            return
+
+        self.stream.changed.clear()
+
+        for withdrawal in self.withdrawals:
+            self.scheduler.schedule(withdrawal, self.clock.time())
+
+    @property
+    def streaming(self):
+        '''
+        Check if the state is currently pushed by the stream feed, and no
+        reconciliation via the REST API is due.
+
+        :return: The streaming flag
+        :rtype: bool
+        '''
+        if not self.stream or not self.stream.connected.is_set():
+            return False
+
+        return self.clock.time() < self.reconciled + self.config.get('reconcile_interval', 60) * 60
+
+    def refresh_order_book(self):
+        '''
+        Refresh the order book via the REST API, unless it's streamed.
+        '''
+        if self.streaming:
+            LOGGER.debug('Order book is streamed, skipping refresh')
+            return
+
+        with TRACER.span('order_book'):
+            if self.order_book.refresh():
+                self.balances.mark_stale()
+        self.reconciled = self.clock.time()
 
-        while True:
-            LOGGER.debug('========== START: Starting new runner cycle')
+    def refresh_balance(self):
+        '''
+        Refresh the balance via the REST API (if it changed), unless it's
+        streamed.
+        '''
+        if self.streaming:
+            LOGGER.debug('Balance is streamed, skipping refresh')
+            return
 
-            self.client.assert_online_status()
+        with TRACER.span('balance'):
+            self.balances.update()
+
+    def reschedule(self, trade_plans, withdrawals, started, failed=False):
+        '''
+        Reschedule the trade plans & withdrawals of a cycle.
+
+        When an order was opened during the cycle, the withdrawals are
+        rescheduled after the runner interval at the latest, so that the
+        changed balance is considered soon. Deferred trade plans & withdrawals
+        are due right away. When the cycle failed, nothing is due before the
+        runner interval, so that a failing cycle isn't repeated right away.
+
+        :param list trade_plans: The trade plans of the cycle
+        :param list withdrawals: The withdrawals of the cycle
+        :param float started: The UNIX timestamp at which the cycle started
+        :param bool failed: The cycle failed
+        '''
+        earliest = self.clock.time() + self.config.interval * 60 if failed else self.clock.time()
 
-            for trade_plan in self.trade_plans:
-                try:
-                    trade_plan()
-                except TradePlanError as ex:
-                    LOGGER.warning(ex)
+        for item in trade_plans + withdrawals:
+            self.scheduler.schedule(item, max(item.next_due(), earliest))
 
-            self.client.update_balance()
+        for item in self.deferred:
+            self.scheduler.schedule(item, earliest)
 
+        if any((trade_plan.last_opened or 0) >= started for trade_plan in trade_plans):
+            deadline = self.clock.time() + self.config.interval * 60
             for withdrawal in self.withdrawals:
-                withdrawal()
+                if self.scheduler.get_deadline(withdrawal) > deadline:
+                    self.scheduler.schedule(withdrawal, deadline)
+
+    @property
+    def budget_exhausted(self):
+        '''
+        Check if the budget of the current cycle is exhausted.
+
+        :return: The exhausted flag
+        :rtype: bool
+        '''
+        return self.deadline is not None and self.clock.time() >= self.deadline
+
+    def within_budget(self, item):
+        '''
+        Check if the cycle budget is left to evaluate a trade plan or
+        withdrawal, otherwise defer it to the next cycle.
+
+        :param item: The trade plan or withdrawal
+        :type item: tradeplan.TradePlan or withdrawal.Withdrawal
+
+        :return: The budget is left
+        :rtype: bool
+        '''
+        if not self.budget_exhausted:
+            return True
+
+        LOGGER.warning('Cycle budget exhausted, deferring %r to the next cycle', item)
+        self.log_decision(item, False, 'Cycle budget exhausted, deferred to the next cycle')
+
+        if isinstance(item, TradePlan):
+            TRADE_PLANS.labels('deferred').inc()
+        else:
+            WITHDRAWALS.labels(item.asset, 'deferred').inc()
+
+        self.deferred.append(item)
+
+        return False
+
+    def run_trade_plan(self, trade_plan):
+        '''
+        Evaluate & execute a single trade plan, if the cycle budget is left.
+
+        :param tradeplan.TradePlan trade_plan: The trade plan
+        '''
+        if not self.within_budget(trade_plan):
+            return
+
+        with TRACER.span('trade_plan', pair=trade_plan.pair):
+            try:
+                trade_plan()
+            except TradePlanError as ex:
+                TRADE_PLANS.labels('skipped').inc()
+                LOGGER.warning(ex)
+                self.log_decision(trade_plan, False, str(ex))
+
+    def log_decision(self, item, decision, reason):
+        '''
+        Log a decision of a trade plan or withdrawal, and add it to the
+        decision log (if enabled).
+
+        :param item: The trade plan or withdrawal
+        :type item: tradeplan.TradePlan or withdrawal.Withdrawal
+        :param bool decision: The decision
+        :param str reason: The reason
+        '''
+        LOGGER.debug('Decision of %r:', item)
+        LOGGER.debug('    Decision: %r', decision)
+        LOGGER.debug('    Reason:   %r', reason)
+
+        if self.decisions is not None:
+            self.decisions.append({
+                'time': self.clock.time(),
+                'item': repr(item),
+                'decision': decision,
+                'reason': reason,
+            })
+
+    def run_withdrawal(self, withdrawal):
+        '''
+        Evaluate & execute a single withdrawal, if the cycle budget is left.
+
+        :param withdrawal.Withdrawal withdrawal: The withdrawal
+        '''
+        if not self.within_budget(withdrawal):
+            return
+
+        with TRACER.span('withdrawal', asset=withdrawal.asset):
+            withdrawal()
+
+    def run_cycle(self, trade_plans, withdrawals):
+        '''
+        Run a single runner cycle sequentially.
+
+        :param list trade_plans: The trade plans to evaluate
+        :param list withdrawals: The withdrawals to evaluate
+        '''
+        self.client.assert_online_status()
+
+        if trade_plans:
+            self.refresh_order_book()
+
+        for trade_plan in trade_plans:
+            self.run_trade_plan(trade_plan)
+
+        if withdrawals and not self.budget_exhausted:
+            self.refresh_balance()
+
+        for withdrawal in withdrawals:
+            self.run_withdrawal(withdrawal)
+
+    async def run_cycle_async(self, trade_plans, withdrawals, concurrency):
+        '''
+        Run a single runner cycle, while evaluating all trade plans and
+        withdrawals concurrently.
+
+        The trade plans and withdrawals themselves are blocking, therefore
+        they're executed in a thread pool, while the number of concurrently
+        evaluated instances is limited by the concurrency. Their private
+        requests are still serialised by the client (see
+        :meth:`kraken.KrakenClient._nonce_order`).
+
+        :param list trade_plans: The trade plans to evaluate
+        :param list withdrawals: The withdrawals to evaluate
+        :param int concurrency: The max number of concurrent evaluations
+        '''
+        semaphore = Semaphore(concurrency)
+
+        async def run_limited(func, *args):
+            async with semaphore:
+                await to_thread(func, *args)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            get_running_loop().set_default_executor(executor)
+
+            await to_thread(self.client.assert_online_status)
+
+            if trade_plans:
+                await to_thread(self.refresh_order_book)
+
+            await gather(*(
+                run_limited(self.run_trade_plan, trade_plan) for trade_plan in trade_plans
+            ))
+
+            if withdrawals and not self.budget_exhausted:
+                await to_thread(self.refresh_balance)
 
-            LOGGER.debug('========== FINISH: Runner cycle finished, sleeping for %d seconds',
-                         interval)
-            sleep(interval)
+            await gather(*(
+                run_limited(self.run_withdrawal, withdrawal) for withdrawal in withdrawals
+            ))
@@ -0,0 +1,108 @@
+'''
+CryptoBob scheduler module.
+'''
+
+__all__ = (
+    'Scheduler',
+)
+
+from heapq import heappop, heappush
+from itertools import count
+from logging import getLogger
+from math import inf
+
+LOGGER = getLogger(__name__)
+
+
+class Scheduler:
+    '''
+    A deadline scheduler, which keeps the next due time of items in a
+    priority queue.
+
+    Rescheduling an item doesn't remove its previous entry from the queue,
+    instead outdated entries are skipped lazily when they're popped.
+    '''
+
+    def __init__(self):
+        self.queue     = []
+        self.deadlines = {}
+        self.sequence  = count()
+
+    def __len__(self):
+        '''
+        The number of scheduled items.
+
+        :return: The number of items
+        :rtype: int
+        '''
+        return len(self.deadlines)
+
+    def schedule(self, item, deadline):
+        '''
+        Schedule (or reschedule) an item.
+
+        :param item: The item
+        :type item: mixed
+        :param float deadline: The UNIX timestamp at which the item is due
+        '''
+        LOGGER.debug('Scheduling %r at %.0f', item, deadline)
+        self.deadlines[item] = deadline
+        heappush(self.queue, (deadline, next(self.sequence), item))
+
+    def unschedule(self, item):
+        '''
+        Remove an item from the schedule.
+
+        :param item: The item
+        :type item: mixed
+        '''
+        self.deadlines.pop(item, None)
+
+    def get_deadline(self, item):
+        '''
+        Get the deadline of an item.
+
+        :param item: The item
+        :type item: mixed
+
+        :return: The deadline
+        :rtype: float
+        '''
+        return self.deadlines.get(item, inf)
+
+    def _discard_outdated(self):
+        '''
+        Discard outdated entries at the head of the queue.
+        '''
+        queue = self.queue
+
+        while queue and self.deadlines.get(queue[0][2]) != queue[0][0]:
+            heappop(queue)
+
+    def next_deadline(self):
+        '''
+        Get the earliest deadline.
+
+        :return: The earliest deadline, or infinity when nothing is scheduled
+        :rtype: float
+        '''
+        self._discard_outdated()
+        return self.queue[0][0] if self.queue else inf
+
+    def pop_due(self, now):
+        '''
+        Remove all due items from the schedule and return them.
+
+        :param float now: The current UNIX timestamp
+
+        :return: The due items ordered by their deadline
+        :rtype: list
+        '''
+        due = []
+
+        while self.next_deadline() <= now:
+            _, _, item = heappop(self.queue)
+            del self.deadlines[item]
+            due.append(item)
+
+        return due
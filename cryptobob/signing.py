@@ -0,0 +1,96 @@
+'''
+CryptoBob request signing module.
+'''
+
+__all__ = (
+    'RequestSigner',
+)
+
+from base64 import b64encode
+from hashlib import sha256, sha512
+from hmac import new as hmac_new
+
+from pyotp import parse_uri as otp_parse_uri
+
+
+class RequestSigner:
+    '''
+    The signing engine for private Kraken API requests.
+
+    Everything which doesn't change between requests is prepared once: the
+    OTP URI is parsed, the HMAC-SHA512 state is pre-keyed with the private
+    key (and then only copied per request), and the encoded endpoints are
+    cached.
+
+    :param str api_key: The API key
+    :param bytes private_key: The decoded private key
+    :param otp_uri: The 2FA / OTP URI (optional)
+    :type otp_uri: None or str
+    '''
+
+    def __init__(self, api_key, private_key, otp_uri=None):
+        self.api_key   = api_key
+        self.hmac      = hmac_new(private_key, digestmod=sha512)
+        self.totp      = otp_parse_uri(otp_uri) if otp_uri else None
+        self.endpoints = {}
+
+    def otp(self):
+        '''
+        Get the current one-time password.
+
+        :return: The OTP, or ``None`` when no OTP is configured
+        :rtype: None or str
+        '''
+        return self.totp.now() if self.totp else None
+
+    def endpoint(self, endpoint):
+        '''
+        Get the encoded endpoint.
+
+        :param str endpoint: The API endpoint / path
+
+        :return: The encoded endpoint
+        :rtype: bytes
+        '''
+        try:
+            return self.endpoints[endpoint]
+        except KeyError:
+            encoded = self.endpoints[endpoint] = endpoint.encode('utf-8')
+            return encoded
+
+    def sign(self, endpoint, nonce, data_encoded):
+        '''
+        Sign the urlencoded data of a request.
+
+        :param str endpoint: The API endpoint / path
+        :param str nonce: The nonce, which must also be part of the data
+        :param str data_encoded: The urlencoded data
+
+        :return: The signature
+        :rtype: bytes
+        '''
+        # Create SHA256 hash of nonce & data.
+        hash_sha256 = sha256((nonce + data_encoded).encode('utf-8')).digest()
+
+        # Create SHA512 HMAC digest for endpoint & SHA256-hashed nonce & data.
+        hmac_sha512 = self.hmac.copy()
+        hmac_sha512.update(self.endpoint(endpoint))
+        hmac_sha512.update(hash_sha256)
+
+        return b64encode(hmac_sha512.digest())
+
+    def headers(self, endpoint, nonce, data_encoded):
+        '''
+        Create the authentication headers of a request.
+
+        :param str endpoint: The API endpoint / path
+        :param str nonce: The nonce, which must also be part of the data
+        :param str data_encoded: The urlencoded data
+
+        :return: The headers
+        :rtype: dict
+        '''
+        return {
+            'API-Key': self.api_key,
+            'API-Sign': self.sign(endpoint, nonce, data_encoded),
+        }
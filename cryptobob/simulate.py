@@ -0,0 +1,596 @@
+'''
+CryptoBob simulation module.
+'''
+
+__all__ = (
+    'FakeExchange',
+    'Simulation',
+)
+
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime, timezone
+from heapq import heappop, heappush
+from itertools import count
+from json import dumps
+from logging import getLogger
+from math import sin
+from random import Random
+from time import perf_counter
+
+from .clock import VirtualClock
+from .exceptions import ConfigError, ResponseError
+from .mockserver import MockKraken
+from .order import Order
+from .runner import Runner
+
+LOGGER = getLogger(__name__)
+
+
+class FakeExchange:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    '''
+    An in-process, event-driven fake of the Kraken API, which is used as
+    client of the runner in simulations.
+
+    Unlike the mock server, there's no HTTP, no JSON and no real time at all.
+    Opened orders are filled (or canceled) after a delay on the virtual
+    clock, by pushing an event to a heap. Before each request, all events
+    which are due on the virtual clock are applied. Orders are filled at a
+    deterministic price series, which is the same as the mock server's.
+
+    :param clock.VirtualClock clock: The virtual clock
+    :param str api_key: The API key (used for the userrefs of trade plans)
+    :param float fill_delay: The delay in seconds after which orders are filled
+    :param float cancel_rate: The probability that an order is canceled instead
+    :param float failure_rate: The probability that opening an order fails
+    :param float fee: The trading fee rate
+    :param float withdrawal_fee: The withdrawal fee
+    :param float withdrawal_delay: The delay in seconds after which withdrawals succeed
+    :param balance: The initial balance by asset
+    :type balance: None or dict
+    :param seed: The random seed of the cancellations & failures
+    :type seed: None or int
+    '''
+
+    #: The page size of closed orders.
+    page_size = 50
+
+    #: The client has no rate limiter, since there's no rate limit.
+    rate_limiter = None
+
+    def __init__(self, clock, api_key='simulation', fill_delay=5.0,  # pylint: disable=too-many-arguments
+                 cancel_rate=0.0, failure_rate=0.0, fee=0.0026, withdrawal_fee=0.0, withdrawal_delay=3600,
+                 balance=None, seed=None):
+        self.clock            = clock
+        self.api_key          = api_key
+        self.fill_delay       = fill_delay
+        self.cancel_rate      = cancel_rate
+        self.failure_rate     = failure_rate
+        self.fee              = fee
+        self.withdrawal_fee   = withdrawal_fee
+        self.withdrawal_delay = withdrawal_delay
+        self.random           = Random(seed)
+        self.funds            = Counter({asset: float(amount) for asset, amount in (balance or {}).items()})
+        self.balance          = {}
+        self.events           = []
+        self.txids            = count(1)
+        self.orders           = {}
+        self.open_orders      = {}
+        self.closed           = []
+        self.closetms         = []
+        self.by_userref       = {}
+        self.ledger           = []
+        self.ledger_times     = []
+        self.withdrawals      = []
+        self.pairs            = {}
+        self.requests         = Counter()
+        self.stats            = Counter()
+
+    @staticmethod
+    def price(pair, timestamp):
+        '''
+        Get the price of a trading pair at a time.
+
+        :param str pair: The trading pair
+        :param float timestamp: The UNIX timestamp
+
+        :return: The price
+        :rtype: float
+        '''
+        return 25000 + 2500 * sin(timestamp / 86400 / 50 + len(pair))
+
+    def asset_pair(self, pair):
+        '''
+        Get the asset pair info of a trading pair.
+
+        :param str pair: The trading pair
+
+        :return: The asset pair info
+        :rtype: dict
+        '''
+        if pair not in self.pairs:
+            self.pairs[pair] = MockKraken.api_AssetPairs(pair=pair)[pair]
+        return self.pairs[pair]
+
+    def process_events(self):
+        '''
+        Apply all events which are due on the virtual clock.
+        '''
+        now    = self.clock.time()
+        events = self.events
+
+        while events and events[0][0] <= now:
+            timestamp, txid, status = heappop(events)
+            self.close_order(txid, status, timestamp)
+
+    def close_order(self, txid, status, timestamp):
+        '''
+        Close an open order, i.e. fill or cancel it.
+
+        :param str txid: The transaction ID
+        :param str status: The new status (``closed`` or ``canceled``)
+        :param float timestamp: The UNIX timestamp
+        '''
+        # Replace the order instead of changing it, since the runner may still hold the open one.
+        order = Order.from_dict({**self.open_orders.pop(txid).to_dict(), 'status': status, 'closetm': timestamp})
+        pair  = order.pair
+
+        if status == 'closed':
+            amount = float(order.vol)
+            price  = self.price(pair, timestamp)
+            volume = amount / price
+
+            order.vol_exec = f'{volume:.8f}'
+            order.cost     = f'{amount:.5f}'
+            order.fee      = f'{amount * self.fee:.5f}'
+            order.price    = f'{price:.1f}'
+
+            self.add_ledger_entry(self.asset_pair(pair)['quote'], -amount, amount * self.fee, timestamp)
+            self.add_ledger_entry(self.asset_pair(pair)['base'], volume, 0.0, timestamp)
+        else:
+            self.add_ledger_entry(self.asset_pair(pair)['quote'], float(order.vol) * (1 + self.fee), 0.0,
+                                  timestamp, funded=True)
+
+        self.orders[txid] = order
+        self.stats[status] += 1
+        self.closed.append((txid, order))
+        self.closetms.append(timestamp)
+        self.by_userref.setdefault(order.userref, []).append((txid, order))
+
+    def add_ledger_entry(self, asset, amount, fee, timestamp, funded=False):  # pylint: disable=too-many-arguments
+        '''
+        Add a ledger entry, and update the funds accordingly.
+
+        The quote amount of an order (incl. the fee) is already reserved when
+        the order is opened, so the funds of the quote asset are only changed
+        when it's refunded.
+
+        :param str asset: The asset
+        :param float amount: The amount
+        :param float fee: The fee
+        :param float timestamp: The UNIX timestamp
+        :param bool funded: Change the funds even when the amount is negative
+        '''
+        if amount > 0 or funded:
+            self.funds[asset] += amount
+
+        self.ledger.append((f'L{len(self.ledger) + 1:06d}-SIM', {
+            'time': timestamp,
+            'asset': asset,
+            'amount': f'{amount:.10f}',
+            'fee': f'{fee:.10f}',
+            'balance': f'{self.funds[asset]:.10f}',
+        }))
+        self.ledger_times.append(timestamp)
+
+    def request(self, api_method, **data):
+        '''
+        Handle a request like the Kraken client.
+
+        :param str api_method: The API method
+        :param dict \\**data: The API data
+
+        :return: The result
+        :rtype: dict
+
+        :raises ResponseError: When the API method is unknown, or the request failed
+        '''
+        handler = getattr(self, f'api_{api_method}', None)
+        if handler is None:
+            raise ResponseError(f'EGeneral:Unknown method {api_method}')
+
+        self.requests[api_method] += 1
+        self.process_events()
+
+        return handler(**data)
+
+    def assert_online_status(self):
+        '''
+        Assert that the exchange status is online, which it always is.
+        '''
+        self.request('SystemStatus')
+
+    def update_balance(self):
+        '''
+        Update the account balance.
+        '''
+        self.balance = self.request('Balance')
+
+    @staticmethod
+    def api_SystemStatus(**_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``SystemStatus`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The system status
+        :rtype: dict
+        '''
+        return {'status': 'online'}
+
+    def api_AssetPairs(self, pair, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``AssetPairs`` API method.
+
+        :param str pair: The comma-separated trading pairs
+        :param dict \\**_: The other API data
+
+        :return: The asset pairs
+        :rtype: dict
+        '''
+        return {name: self.asset_pair(name) for name in pair.split(',')}
+
+    def api_OHLC(self, pair, interval=1, since=None, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``OHLC`` API method, which returns the last 720 candles of
+        the simulated price series.
+
+        :param str pair: The trading pair
+        :param interval: The candle interval in minutes
+        :type interval: int or str
+        :param since: The UNIX timestamp of the first candle (optional)
+        :type since: None or str
+        :param dict \\**_: The other API data
+
+        :return: The candles & the timestamp of the last one
+        :rtype: dict
+        '''
+        width = int(interval) * 60
+        last  = int(self.clock.time()) // width * width
+        start = last - 719 * width
+
+        if since:
+            start = max(start, int(since) // width * width)
+
+        candles = []
+        for timestamp in range(start, last + 1, width):
+            price = self.price(pair, min(timestamp + width, self.clock.time()))
+            candles.append([timestamp, f'{price:.1f}', f'{price:.1f}', f'{price:.1f}',
+                            f'{price:.1f}', f'{price:.1f}', '1.00000000', 1])
+
+        return {pair: candles, 'last': last}
+
+    def api_Ticker(self, pair, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Ticker`` API method, which returns the tickers of the
+        simulated price series.
+
+        :param str pair: The comma-separated trading pairs
+        :param dict \\**_: The other API data
+
+        :return: The tickers
+        :rtype: dict
+        '''
+        now     = self.clock.time()
+        tickers = {}
+
+        for name in pair.split(','):
+            price         = self.price(name, now)
+            tickers[name] = {'a': [f'{price:.1f}', '1', '1.000'], 'b': [f'{price:.1f}', '1', '1.000'],
+                             'c': [f'{price:.1f}', '0.001'], 'v': ['24.0', '24.0'],
+                             'p': [f'{price:.1f}', f'{price:.1f}']}
+
+        return tickers
+
+    def api_Balance(self, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Balance`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The balance
+        :rtype: dict
+        '''
+        return {asset: f'{amount:.10f}' for asset, amount in self.funds.items()}
+
+    def api_OpenOrders(self, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``OpenOrders`` API method.
+
+        :param dict \\**_: The other API data
+
+        :return: The open orders
+        :rtype: dict
+        '''
+        return {'open': dict(self.open_orders)}
+
+    def api_ClosedOrders(self, userref=None, start=None, ofs=0, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``ClosedOrders`` API method, which returns a page of the
+        latest closed orders.
+
+        Since the events are applied in order, the closed orders are already
+        sorted by their close time, therefore the start is found by bisection.
+
+        :param userref: The userref
+        :type userref: None or int
+        :param start: The exclusive UNIX timestamp of the oldest closed order
+        :type start: None or float
+        :param int ofs: The result offset
+        :param dict \\**_: The other API data
+
+        :return: The closed orders & their total count
+        :rtype: dict
+        '''
+        if userref is not None:
+            orders = self.by_userref.get(int(userref), [])
+        elif start is not None:
+            orders = self.closed[bisect_right(self.closetms, float(start)):]
+        else:
+            orders = self.closed
+
+        end   = len(orders) - int(ofs)
+        first = max(0, end - self.page_size)
+
+        return {'closed': dict(reversed(orders[first:max(0, end)])), 'count': len(orders)}
+
+    def api_Ledgers(self, start=None, ofs=0, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Ledgers`` API method, which returns a page of the latest
+        ledger entries.
+
+        :param start: The exclusive UNIX timestamp of the oldest ledger entry
+        :type start: None or float
+        :param int ofs: The result offset
+        :param dict \\**_: The other API data
+
+        :return: The ledger entries & their total count
+        :rtype: dict
+        '''
+        entries = self.ledger[bisect_right(self.ledger_times, float(start)):] if start is not None else self.ledger
+        end     = len(entries) - int(ofs)
+        first   = max(0, end - self.page_size)
+
+        return {'ledger': dict(reversed(entries[first:max(0, end)])), 'count': len(entries)}
+
+    def api_QueryOrders(self, txid, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``QueryOrders`` API method.
+
+        :param str txid: The comma-separated transaction IDs
+        :param dict \\**_: The other API data
+
+        :return: The orders
+        :rtype: dict
+        '''
+        return {item: self.orders[item] for item in txid.split(',') if item in self.orders}
+
+    def api_AddOrder(self, pair, userref=0, volume=0, validate=False, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``AddOrder`` API method, which reserves the amount and
+        schedules the fill (or cancellation) of the order.
+
+        :param str pair: The trading pair
+        :param int userref: The userref
+        :param float volume: The volume in quote currency
+        :param bool validate: Only validate the order
+        :param dict \\**_: The other API data
+
+        :return: The order description & transaction IDs
+        :rtype: dict
+
+        :raises ResponseError: When opening the order failed
+        '''
+        descr = {'order': f'buy {volume} {pair} @ market'}
+
+        if validate:
+            return {'descr': descr}
+
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            self.stats['failed'] += 1
+            raise ResponseError('EService:Unavailable')
+
+        quote  = self.asset_pair(pair)['quote']
+        amount = float(volume)
+        if self.funds[quote] < amount * (1 + self.fee):
+            self.stats['failed'] += 1
+            raise ResponseError('EOrder:Insufficient funds')
+
+        self.funds[quote] -= amount * (1 + self.fee)
+
+        now   = self.clock.time()
+        txid  = f'O{next(self.txids):06d}-SIM'
+        order = Order(
+            userref=int(userref),
+            status='open',
+            opentm=now,
+            vol=f'{amount:.5f}',
+            descr={'pair': pair, 'type': 'buy', 'ordertype': 'market'},
+        )
+
+        self.orders[txid]      = order
+        self.open_orders[txid] = order
+
+        status = 'canceled' if self.cancel_rate and self.random.random() < self.cancel_rate else 'closed'
+        heappush(self.events, (now + self.fill_delay, txid, status))
+
+        return {'descr': descr, 'txid': [txid]}
+
+    def api_Withdraw(self, asset, amount, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``Withdraw`` API method.
+
+        :param str asset: The asset
+        :param float amount: The amount
+        :param dict \\**_: The other API data
+
+        :return: The reference ID
+        :rtype: dict
+
+        :raises ResponseError: When the balance is insufficient
+        '''
+        # Compare with the balance as it's returned, i.e. rounded to 10 decimals.
+        amount = float(amount)
+        if amount > round(self.funds[asset], 10):
+            raise ResponseError('EFunding:Insufficient funds')
+
+        refid = f'SIM-{self.requests["Withdraw"]:06d}'
+        now   = self.clock.time()
+
+        self.add_ledger_entry(asset, -min(amount, self.funds[asset]), self.withdrawal_fee, now, funded=True)
+        self.withdrawals.append({'refid': refid, 'asset': asset, 'amount': amount, 'time': now})
+        self.stats['withdrawals'] += 1
+
+        return {'refid': refid}
+
+    def api_WithdrawInfo(self, asset, amount, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``WithdrawInfo`` API method.
+
+        :param str asset: The asset
+        :param float amount: The amount
+        :param dict \\**_: The other API data
+
+        :return: The withdrawal info
+        :rtype: dict
+        '''
+        return {
+            'method': asset,
+            'limit': f'{self.funds[asset]:.10f}',
+            'amount': f'{float(amount) - self.withdrawal_fee:.10f}',
+            'fee': f'{self.withdrawal_fee:.10f}',
+        }
+
+    @staticmethod
+    def api_WithdrawMethods(asset, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``WithdrawMethods`` API method.
+
+        :param str asset: The asset
+        :param dict \\**_: The other API data
+
+        :return: The withdrawal methods
+        :rtype: list
+        '''
+        return [{'asset': asset, 'method': asset, 'network': asset, 'minimum': '0'}]
+
+    def api_WithdrawStatus(self, asset, **_):  # pylint: disable=invalid-name
+        '''
+        Handle the ``WithdrawStatus`` API method, where withdrawals succeed
+        after the withdrawal delay.
+
+        :param str asset: The asset
+        :param dict \\**_: The other API data
+
+        :return: The withdrawal statuses
+        :rtype: list
+        '''
+        now = self.clock.time()
+
+        return [
+            {**item, 'status': 'Success' if now >= item['time'] + self.withdrawal_delay else 'Pending'}
+            for item in self.withdrawals if item['asset'] == asset
+        ]
+
+
+class Simulation:
+    '''
+    The simulation, which runs the runner on a virtual clock against a fake
+    exchange. This way months of runner cycles for hundreds of trade plans
+    run within seconds, without any real sleeps or API requests.
+
+    Everything which has side effects outside the simulation (i.e. the state
+    store, the stream feed, the metrics server, tracing & profiling), and
+    reloading the config is disabled.
+
+    The simulation can be configured in the ``simulation`` section of the
+    config, with the constructor arguments of :class:`FakeExchange`.
+
+    :param config.Config config: The config
+    :param start: The UNIX timestamp at which the simulation starts (optional)
+    :type start: None or float
+    :param dict \\**kwargs: Additional arguments of the fake exchange
+
+    :raises ConfigError: When the simulation configuration is invalid
+    '''
+
+    #: The config keys which are disabled during simulations.
+    disabled = ('state_file', 'streaming', 'metrics', 'trace_file', 'profile', 'reload_interval')
+
+    def __init__(self, config, start=None, **kwargs):
+        options = {
+            'api_key': config.get('api_key', 'simulation'),
+            'balance': {'ZEUR': 1e9},
+            **(config.get('simulation') or {}),
+            **kwargs,
+        }
+
+        for key in self.disabled:
+            config.data.pop(key, None)
+
+        self.clock = VirtualClock(start=datetime.now(timezone.utc).timestamp() if start is None else start)
+
+        try:
+            self.exchange = FakeExchange(clock=self.clock, **options)
+        except TypeError as ex:
+            raise ConfigError(f'Simulation configuration misconfigured, got «{ex}»') from ex
+
+        self.runner           = Runner(config=config, clock=self.clock, client=self.exchange)
+        self.runner.decisions = []
+
+    def run(self, days):
+        '''
+        Run the simulation.
+
+        :param float days: The duration in days
+
+        :return: The summary
+        :rtype: dict
+        '''
+        started  = self.clock.time()
+        timer    = perf_counter()
+        until    = started + days * 86400
+
+        LOGGER.info('Simulating %s days of %d trade plans & %d withdrawals', days,
+                    len(self.runner.trade_plans), len(self.runner.withdrawals))
+
+        self.runner.run(until=until)
+
+        orders = Counter()
+        for _, order in self.exchange.closed:
+            if order.status == 'closed':
+                orders[order.pair] += 1
+
+        return {
+            'start': started,
+            'end': until,
+            'duration': perf_counter() - timer,
+            'cycles': self.runner.cycles,
+            'decisions': len(self.runner.decisions),
+            'orders': dict(orders),
+            'canceled': self.exchange.stats['canceled'],
+            'failed': self.exchange.stats['failed'],
+            'withdrawals': self.exchange.stats['withdrawals'],
+            'requests': dict(self.exchange.requests),
+            'balance': self.exchange.api_Balance(),
+        }
+
+    def write_decisions(self, file):
+        '''
+        Write the decision log as JSON lines.
+
+        :param file: The file
+        :type file: io.TextIOBase
+        '''
+        for decision in self.runner.decisions:
+            file.write(dumps(decision) + '\n')
@@ -0,0 +1,182 @@
+'''
+CryptoBob state module.
+'''
+
+__all__ = (
+    'StateStore',
+)
+
+import sqlite3
+from json import dumps, loads
+from logging import getLogger
+from threading import Lock
+
+from .exceptions import ConfigError
+from .order import Order
+
+LOGGER = getLogger(__name__)
+
+
+class StateStore:
+    '''
+    The local state store, which persists the runtime state of the runner in
+    an embedded SQLite database.
+
+    The state store is optional. It allows the runner to resume right where
+    it stopped after a restart, instead of rebuilding its view from the
+    Kraken order history. Writes are collected in a transaction and only
+    committed once per runner cycle, while the database runs in WAL mode.
+
+    :param pathlib.Path path: The path to the database file
+    '''
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS last_orders '
+        '(userref INTEGER PRIMARY KEY, txid TEXT, data TEXT)',
+        'CREATE TABLE IF NOT EXISTS failures '
+        '(userref INTEGER PRIMARY KEY, timestamp REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS balances '
+        '(asset TEXT PRIMARY KEY, amount TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS meta '
+        '(key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    )
+
+    def __init__(self, path):
+        self.path = path.expanduser()
+        self.lock = Lock()
+
+        LOGGER.debug('Opening state store %r', str(self.path))
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch(mode=0o600, exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as ex:
+            raise ConfigError(f'State store {str(self.path)!r} not accessible, got «{ex}»') from ex
+
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        with self.lock:
+            for statement in self.schema:
+                self.connection.execute(statement)
+            self.connection.commit()
+
+    def execute(self, sql, *parameters):
+        '''
+        Execute an SQL statement.
+
+        :param str sql: The SQL statement
+        :param \\*parameters: The SQL parameters
+
+        :return: The fetched rows
+        :rtype: list
+        '''
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def commit(self):
+        '''
+        Commit all pending writes.
+        '''
+        with self.lock:
+            self.connection.commit()
+
+    def close(self):
+        '''
+        Commit all pending writes and close the database.
+        '''
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+    def get(self, key, default=None):
+        '''
+        Get a meta value.
+
+        :param str key: The key
+        :param default: The default value when the key wasn't found
+        :type default: mixed
+
+        :return: The value
+        :rtype: mixed
+        '''
+        rows = self.execute('SELECT value FROM meta WHERE key = ?', key)
+        return loads(rows[0][0]) if rows else default
+
+    def set(self, key, value):
+        '''
+        Set a meta value.
+
+        :param str key: The key
+        :param value: The JSON serialisable value
+        :type value: mixed
+        '''
+        self.execute('REPLACE INTO meta (key, value) VALUES (?, ?)', key, dumps(value))
+
+    def get_last_orders(self):
+        '''
+        Get the last closed orders.
+
+        :return: The last closed orders (txid & order.Order) by userref
+        :rtype: dict
+        '''
+        return {
+            userref: (txid, Order.from_dict(loads(data))) if data else None
+            for userref, txid, data in self.execute('SELECT userref, txid, data FROM last_orders')
+        }
+
+    def set_last_order(self, userref, last):
+        '''
+        Set the last closed order of a userref.
+
+        :param int userref: The userref
+        :param last: The transaction ID & order
+        :type last: None or tuple(str, order.Order)
+        '''
+        txid, data = (last[0], dumps(last[1].to_dict())) if last else (None, None)
+        self.execute('REPLACE INTO last_orders (userref, txid, data) VALUES (?, ?, ?)',
+                     userref, txid, data)
+
+    def get_failures(self):
+        '''
+        Get the timestamps of the last failed order openings.
+
+        :return: The timestamps by userref
+        :rtype: dict
+        '''
+        return dict(self.execute('SELECT userref, timestamp FROM failures'))
+
+    def set_failure(self, userref, timestamp):
+        '''
+        Set or clear the timestamp of the last failed order opening.
+
+        :param int userref: The userref
+        :param timestamp: The timestamp
+        :type timestamp: None or float
+        '''
+        if timestamp is None:
+            self.execute('DELETE FROM failures WHERE userref = ?', userref)
+        else:
+            self.execute('REPLACE INTO failures (userref, timestamp) VALUES (?, ?)',
+                         userref, timestamp)
+
+    def get_balance(self):
+        '''
+        Get the account balance.
+
+        :return: The balance by asset
+        :rtype: dict
+        '''
+        return dict(self.execute('SELECT asset, amount FROM balances'))
+
+    def set_balance(self, balance):
+        '''
+        Replace the account balance.
+
+        :param dict balance: The balance by asset
+        '''
+        with self.lock:
+            self.connection.execute('DELETE FROM balances')
+            self.connection.executemany('INSERT INTO balances (asset, amount) VALUES (?, ?)',
+                                        balance.items())
@@ -0,0 +1,213 @@
+'''
+CryptoBob stream module.
+'''
+
+__all__ = (
+    'StreamFeed',
+)
+
+from datetime import datetime
+from json import dumps, loads
+from logging import getLogger
+from threading import Event, Lock, Thread
+
+from .exceptions import ResponseError
+from .order import Order
+from .websocket import WebSocket
+
+LOGGER = getLogger(__name__)
+
+
+class StreamFeed(Thread):  # pylint: disable=too-many-instance-attributes
+    '''
+    The stream feed, which receives order executions & balances from Kraken's
+    authenticated WebSocket API and pushes them into the runner's state.
+
+    The feed runs in a background thread and reconnects automatically. As
+    long as it's connected, the runner can rely on the pushed state, and only
+    needs the REST API to reconcile it from time to time.
+
+    :param runner.Runner runner: The runner
+    :param str url: The WebSocket URL
+    '''
+
+    url = 'wss://ws-auth.kraken.com/v2'
+
+    #: The order statuses of the executions channel, which mean the order is
+    #: still open, and the closed order statuses they're mapped to otherwise.
+    open_status   = ('pending_new', 'new', 'partially_filled')
+    closed_status = {
+        'filled': 'closed',
+        'canceled': 'canceled',
+        'expired': 'expired',
+    }
+
+    #: WebSocket asset names which differ from Kraken's REST asset altnames.
+    asset_aliases = {
+        'XBT': 'BTC',
+        'XDG': 'DOGE',
+    }
+
+    def __init__(self, runner, url=None):
+        super().__init__(name='StreamFeed', daemon=True)
+
+        self.runner    = runner
+        self.url       = url or self.url
+        self.socket    = None
+        self.orders    = {}
+        self.assets    = None
+        self.connected = Event()
+        self.stopped   = Event()
+        self.changed   = Event()
+        self.lock      = Lock()
+
+    def run(self):
+        '''
+        Connect & receive messages until the feed is stopped.
+        '''
+        backoff = 1
+
+        while not self.stopped.is_set():
+            try:
+                self.connect()
+                backoff = 1
+                self.receive()
+            except (ResponseError, OSError, ValueError) as ex:
+                if self.stopped.is_set():
+                    break
+                LOGGER.warning('Stream feed disconnected, got «%s»', ex)
+            finally:
+                self.disconnect()
+
+            self.stopped.wait(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def stop(self):
+        '''
+        Stop the feed.
+        '''
+        self.stopped.set()
+        self.disconnect()
+
+    def connect(self):
+        '''
+        Connect to the WebSocket API and subscribe to the channels.
+        '''
+        client = self.runner.client
+        token  = client.request('GetWebSocketsToken')['token']
+
+        if self.assets is None:
+            self.assets = {
+                self.asset_aliases.get(item['altname'], item['altname']): iid
+                for iid, item in client.request('Assets').items()
+            }
+
+        self.socket = WebSocket(self.url)
+
+        for channel, params in (
+            ('executions', {'snap_orders': True, 'snap_trades': False}),
+            ('balances', {'snapshot': True}),
+        ):
+            self.socket.send(dumps({
+                'method': 'subscribe',
+                'params': {'channel': channel, 'token': token, **params},
+            }))
+
+        LOGGER.info('Stream feed connected to %r', self.url)
+
+    def disconnect(self):
+        '''
+        Disconnect from the WebSocket API.
+        '''
+        self.connected.clear()
+
+        # The feed may be stopped while its thread disconnects, too.
+        with self.lock:
+            socket, self.socket = self.socket, None
+
+        if socket:
+            socket.close()
+
+    def receive(self):
+        '''
+        Receive & handle messages until the connection is closed.
+
+        :raises websocket.WebSocketError: When the connection was closed
+        :raises ResponseError: When a subscription failed
+        '''
+        socket = self.socket
+
+        while not self.stopped.is_set():
+            message = loads(socket.recv())
+            channel = message.get('channel')
+
+            if message.get('method') == 'subscribe' and not message.get('success', True):
+                raise ResponseError(f'Subscription failed with «{message.get("error")}»')
+
+            if channel == 'executions':
+                self.handle_executions(message['data'])
+            elif channel == 'balances':
+                self.handle_balances(message['data'], snapshot=message.get('type') == 'snapshot')
+
+    def handle_executions(self, executions):
+        '''
+        Handle order executions by pushing them into the order book.
+
+        :param list executions: The executions
+        '''
+        order_book = self.runner.order_book
+
+        for execution in executions:
+            txid  = execution['order_id']
+            state = self.orders.setdefault(txid, {'opentm': execution.get('timestamp')})
+            state.update(execution)
+
+            status = state.get('order_status')
+            order  = Order(
+                userref=state.get('order_userref', 0),
+                status='open' if status in self.open_status else self.closed_status.get(status),
+                opentm=self.timestamp(state['opentm']),
+                vol=str(state.get('order_qty', 0)),
+                vol_exec=str(state.get('cum_qty', 0)),
+                cost=str(state.get('cum_cost', 0)),
+                price=str(state.get('avg_price', 0)),
+                descr={'pair': state.get('symbol')},
+            )
+
+            if order.status is None:
+                continue
+
+            if order.status != 'open':
+                order.closetm = self.timestamp(state.get('timestamp'))
+                del self.orders[txid]
+                self.changed.set()
+
+            order_book.apply(txid, order)
+
+        self.connected.set()
+
+    def handle_balances(self, balances, snapshot=False):
+        '''
+        Handle balances by updating the runner's balance tracker.
+
+        :param list balances: The balances
+        :param bool snapshot: The balances are a complete snapshot
+        '''
+        self.runner.balances.apply(
+            {self.assets.get(item['asset'], item['asset']): item['balance'] for item in balances},
+            snapshot=snapshot,
+        )
+        self.changed.set()
+
+    @staticmethod
+    def timestamp(value):
+        '''
+        Convert an RFC 3339 timestamp to a UNIX timestamp.
+
+        :param value: The RFC 3339 timestamp
+        :type value: None or str
+
+        :return: The UNIX timestamp
+        :rtype: float
+        '''
+        return datetime.fromisoformat(value).timestamp() if value else 0.0
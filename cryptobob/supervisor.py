@@ -0,0 +1,194 @@
+'''
+CryptoBob supervisor.
+'''
+
+__all__ = (
+    'Supervisor',
+)
+
+from collections import deque
+from logging import getLogger
+from multiprocessing import get_context
+from time import sleep, time
+
+from .helpers import init_logging
+
+LOGGER = getLogger(__name__)
+
+
+def run_worker(worker, units, workers, run_dir, verbose, simple):  # pylint: disable=too-many-arguments
+    '''
+    The entry point of a worker process, which runs its units in a multi
+    runner.
+
+    Each worker process serves its own metrics (if configured), on the
+    configured port plus its worker ID.
+
+    :param int worker: The worker ID
+    :param list units: The config paths & shards
+    :param int workers: The max number of runners which run concurrently
+    :param pathlib.Path run_dir: The directory to coordinate API keys
+    :param int verbose: The verbosity level
+    :param bool simple: Enable simple logging
+    '''
+    # Imported here, since the supervisor process itself doesn't need them.
+    from .config import Config  # pylint: disable=import-outside-toplevel
+    from .multirunner import MultiRunner  # pylint: disable=import-outside-toplevel
+
+    init_logging(level=verbose, simple=simple)
+
+    MultiRunner(
+        configs=[Config(path) for path, _ in units],
+        shards=[shard for _, shard in units],
+        workers=workers,
+        run_dir=run_dir,
+        metrics_port_offset=worker,
+    ).run()
+
+
+class Supervisor:  # pylint: disable=too-many-instance-attributes
+    '''
+    The supervisor, which splits the accounts and their trade plans across a
+    pool of worker processes.
+
+    When there are fewer accounts than processes, the trade plans of each
+    account are split into shards, which are then distributed across the
+    processes. The processes coordinate the nonces and rate limits of shared
+    API keys via file locks in the run directory.
+
+    Crashed workers are restarted. When a worker keeps crashing, it's removed
+    and its work is redistributed to the remaining workers.
+
+    :param list config_paths: The config paths
+    :param int processes: The number of worker processes
+    :param pathlib.Path run_dir: The directory to coordinate API keys
+    :param int workers: The max number of runners which run concurrently per process
+    :param int verbose: The verbosity level of the workers
+    :param bool simple: Enable simple logging in the workers
+    '''
+
+    #: The interval in seconds at which the workers are checked.
+    check_interval = 1.0
+
+    #: The max number of crashes of a worker within the crash window.
+    max_crashes = 3
+
+    #: The crash window in seconds.
+    crash_window = 300
+
+    def __init__(self, config_paths, processes, run_dir, workers=4,  # pylint: disable=too-many-arguments
+                 verbose=0, simple=False):
+        self.run_dir     = run_dir
+        self.workers     = workers
+        self.verbose     = verbose
+        self.simple      = simple
+        self.context     = get_context('spawn')
+        self.processes   = {}
+        self.crashes     = {}
+        self.assignments = {worker: [] for worker in range(processes)}
+
+        for i, unit in enumerate(self.split(config_paths, processes)):
+            self.assignments[i % processes].append(unit)
+
+    @staticmethod
+    def split(config_paths, processes):
+        '''
+        Split the configs into units of work.
+
+        :param list config_paths: The config paths
+        :param int processes: The number of worker processes
+
+        :return: The config paths & shards (index & count)
+        :rtype: list
+        '''
+        count = max(1, -(-processes // len(config_paths)))
+
+        return [(path, (index, count)) for path in config_paths for index in range(count)]
+
+    def spawn(self, worker):
+        '''
+        Spawn a worker process.
+
+        :param int worker: The worker ID
+        '''
+        units = self.assignments[worker]
+
+        LOGGER.info('Starting worker %d for %d units', worker, len(units))
+
+        process = self.context.Process(
+            target=run_worker,
+            name=f'cryptobob-worker-{worker}',
+            args=(worker, units, self.workers, self.run_dir, self.verbose, self.simple),
+            daemon=True,
+        )
+        process.start()
+
+        self.processes[worker] = process
+
+    def stop(self, worker):
+        '''
+        Stop a worker process.
+
+        :param int worker: The worker ID
+        '''
+        process = self.processes.pop(worker, None)
+
+        if process and process.is_alive():
+            process.terminate()
+            process.join()
+
+    def handle_crash(self, worker):
+        '''
+        Handle a crashed worker by restarting it, or by redistributing its
+        work when it keeps crashing.
+
+        :param int worker: The worker ID
+        '''
+        process = self.processes.pop(worker)
+        now     = time()
+        crashes = self.crashes.setdefault(worker, deque())
+
+        LOGGER.error('Worker %d crashed with exit code %r', worker, process.exitcode)
+
+        crashes.append(now)
+        while crashes and crashes[0] < now - self.crash_window:
+            crashes.popleft()
+
+        others = [other for other in self.assignments if other != worker]
+
+        if len(crashes) < self.max_crashes or not others:
+            self.spawn(worker)
+            return
+
+        LOGGER.error('Worker %d keeps crashing, redistributing its work', worker)
+
+        units = self.assignments.pop(worker)
+        del self.crashes[worker]
+
+        for i, unit in enumerate(units):
+            self.assignments[others[i % len(others)]].append(unit)
+
+        for other in others:
+            self.stop(other)
+            self.spawn(other)
+
+    def run(self):
+        '''
+        Start & supervise the worker processes in an endless loop.
+        '''
+        LOGGER.info('Starting CryptoBob supervisor with %d workers', len(self.assignments))
+
+        try:
+            for worker in self.assignments:
+                self.spawn(worker)
+
+            while True:
+                sleep(self.check_interval)
+
+                for worker, process in list(self.processes.items()):
+                    if not process.is_alive():
+                        self.handle_crash(worker)
+
+        finally:
+            for worker in list(self.processes):
+                self.stop(worker)
@@ -0,0 +1,404 @@
+'''
+CryptoBob tracing module.
+'''
+
+__all__ = (
+    'CycleProfiler',
+    'SamplingProfiler',
+    'Span',
+    'Tracer',
+    'TRACER',
+)
+
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from cProfile import Profile
+from heapq import heappush, heappushpop
+from itertools import count
+from json import dumps
+from logging import getLogger
+from pathlib import Path
+from threading import Event, Lock, Thread, get_ident
+from time import perf_counter, time
+
+from .exceptions import ConfigError
+
+LOGGER = getLogger(__name__)
+
+
+class Span:  # pylint: disable=too-many-instance-attributes
+    '''
+    A single span of a trace, which measures the duration of an operation.
+
+    Spans are nested via a context variable, therefore a span opened while
+    another one is active (in the same thread or task) becomes its child.
+
+    :param Tracer tracer: The tracer
+    :param str name: The span name
+    :param dict attributes: The span attributes
+    '''
+
+    __slots__ = ('tracer', 'name', 'attributes', 'span_id', 'parent', 'trace_id', 'start',
+                 'started', 'token')
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer     = tracer
+        self.name       = name
+        self.attributes = attributes
+        self.span_id    = next(tracer.ids)
+        self.parent     = None
+        self.trace_id   = self.span_id
+        self.start      = 0.0
+        self.started    = 0.0
+        self.token      = None
+
+    def set(self, **attributes):
+        '''
+        Set attributes of the span.
+
+        :param dict \\**attributes: The attributes
+        '''
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = self.tracer.current.get()
+        if parent is not None:
+            self.parent   = parent.span_id
+            self.trace_id = parent.trace_id
+
+        self.token   = self.tracer.current.set(self)
+        self.start   = time()
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = perf_counter() - self.started
+        self.tracer.current.reset(self.token)
+
+        record = {
+            'trace': self.trace_id,
+            'span': self.span_id,
+            'parent': self.parent,
+            'name': self.name,
+            'pid': os.getpid(),
+            'start': round(self.start, 6),
+            'duration': round(duration, 6),
+        }
+
+        if self.attributes:
+            record['attributes'] = self.attributes
+        if exc_type is not None:
+            record['error'] = f'{exc_type.__name__}: {exc_value}'
+
+        self.tracer.write(record, flush=self.parent is None)
+
+
+class NullSpan:
+    '''
+    The span which is used while tracing is disabled, and does nothing.
+    '''
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        '''
+        Ignore the attributes.
+
+        :param dict \\**attributes: The attributes
+        '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    '''
+    The tracer, which writes nested spans with their timings as JSON lines.
+
+    Tracing is disabled until a trace file is opened, in which case spans
+    cost next to nothing.
+    '''
+
+    def __init__(self):
+        self.file    = None
+        self.lock    = Lock()
+        self.ids     = count(1)
+        self.current = ContextVar('span', default=None)
+
+    def open(self, path):
+        '''
+        Open the trace file, to which the spans are appended.
+
+        :param pathlib.Path path: The trace file path
+
+        :raises ConfigError: When the trace file isn't accessible
+        '''
+        path = path.expanduser()
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            file = path.open('a', encoding='utf-8')
+        except OSError as ex:
+            raise ConfigError(f'Trace file {str(path)!r} not accessible, got «{ex}»') from ex
+
+        LOGGER.info('Writing traces to %r', str(path))
+
+        with self.lock:
+            if self.file:
+                self.file.close()
+            self.file = file
+
+    @property
+    def enabled(self):
+        '''
+        Check if tracing is enabled.
+
+        :return: The enabled flag
+        :rtype: bool
+        '''
+        return self.file is not None
+
+    def span(self, name, **attributes):
+        '''
+        Create a new span, which is used as context manager.
+
+        :param str name: The span name
+        :param dict \\**attributes: The span attributes
+
+        :return: The span
+        :rtype: Span
+        '''
+        if self.file is None:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def write(self, record, flush=False):
+        '''
+        Write a span record.
+
+        :param dict record: The span record
+        :param bool flush: Flush the trace file (e.g. after a root span)
+        '''
+        line = dumps(record, default=str) + '\n'
+
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            if flush:
+                self.file.flush()
+
+
+#: The default tracer.
+TRACER = Tracer()
+
+
+class SamplingProfiler:
+    '''
+    A sampling profiler, which periodically samples the stacks of all threads
+    (except its own) and counts them in the collapsed stack format, which is
+    understood by flamegraph tools.
+
+    :param float interval: The sampling interval in seconds
+    '''
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples  = Counter()
+        self.stopped  = Event()
+        self.thread   = None
+
+    @staticmethod
+    def collapse(frame):
+        '''
+        Collapse a stack into a single string, starting with the root frame.
+
+        :param frame: The current frame of the stack
+        :type frame: types.FrameType
+
+        :return: The collapsed stack
+        :rtype: str
+        '''
+        stack = []
+
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+
+        return ';'.join(reversed(stack))
+
+    def sample(self):
+        '''
+        Sample the stacks until the profiler is stopped.
+        '''
+        ident = get_ident()
+
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread_id != ident:
+                    self.samples[self.collapse(frame)] += 1
+
+    def enable(self):
+        '''
+        Start sampling in a background thread.
+        '''
+        self.thread = Thread(target=self.sample, name='SamplingProfiler', daemon=True)
+        self.thread.start()
+
+    def disable(self):
+        '''
+        Stop sampling.
+        '''
+        self.stopped.set()
+        self.thread.join()
+
+    def dump(self, path):
+        '''
+        Write the samples in the collapsed stack format.
+
+        :param pathlib.Path path: The file path
+        '''
+        with path.open('w', encoding='utf-8') as file:
+            for stack, samples in self.samples.most_common():
+                file.write(f'{stack} {samples}\n')
+
+
+class CycleProfiler:
+    '''
+    The cycle profiler, which profiles each runner cycle, but only keeps the
+    profiles of the N slowest cycles.
+
+    In ``cprofile`` mode, the cycles are profiled deterministically and
+    written as ``.pstats`` files. Since cProfile only profiles the calling
+    thread, the ``sampling`` mode should be used for concurrent cycles. It
+    samples all threads and writes ``.collapsed`` stack files for flamegraphs.
+
+    Only one cycle per process is profiled at once. Concurrent cycles (e.g.
+    of other accounts) aren't profiled meanwhile.
+
+    :param pathlib.Path directory: The directory of the profiles
+    :param str mode: The profiling mode (``cprofile`` or ``sampling``)
+    :param int keep: The number of slowest cycles to keep
+    :param float interval: The sampling interval in seconds
+    :param str prefix: The file name prefix (e.g. the account)
+    '''
+
+    modes = {
+        'cprofile': '.pstats',
+        'sampling': '.collapsed',
+    }
+
+    #: The lock which ensures only one cycle per process is profiled at once.
+    active = Lock()
+
+    @classmethod
+    def from_config(cls, config, prefix='cycle'):
+        '''
+        Create a cycle profiler from a ``profile`` configuration.
+
+        :param config: The profile configuration
+        :type config: None or dict
+        :param str prefix: The file name prefix
+
+        :return: The cycle profiler (if configured)
+        :rtype: None or CycleProfiler
+
+        :raises ConfigError: When the configuration is invalid
+        '''
+        if not config:
+            return None
+
+        config = dict(config)
+
+        try:
+            directory = Path(config.pop('directory')).expanduser()
+            return cls(directory=directory, prefix=prefix, **config)
+        except (KeyError, TypeError) as ex:
+            raise ConfigError(f'Profile configuration misconfigured, got «{ex!r}»') from ex
+
+    def __init__(self, directory, mode='cprofile', keep=5,  # pylint: disable=too-many-arguments
+                 interval=0.005, prefix='cycle'):
+        if mode not in self.modes:
+            raise ConfigError(f'Unknown profile mode {mode!r}')
+
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+        except OSError as ex:
+            raise ConfigError(f'Profile directory {str(directory)!r} not accessible, got «{ex}»') from ex
+
+        self.directory = directory
+        self.mode      = mode
+        self.keep      = max(1, keep)
+        self.interval  = interval
+        self.prefix    = prefix
+        self.slowest   = []
+
+    @contextmanager
+    def profile(self, cycle):
+        '''
+        Profile a cycle, and keep its profile if it's one of the slowest.
+
+        :param int cycle: The cycle number
+
+        :return: Nothing
+        :rtype: generator
+        '''
+        if not self.active.acquire(blocking=False):  # pylint: disable=consider-using-with
+            yield
+            return
+
+        profiler = Profile() if self.mode == 'cprofile' else SamplingProfiler(self.interval)
+        started  = perf_counter()
+
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+        finally:
+            self.active.release()
+            self.record(cycle, perf_counter() - started, profiler)
+
+    def record(self, cycle, duration, profiler):
+        '''
+        Write the profile of a cycle, if it's one of the slowest, and remove
+        the profile which isn't one of the slowest anymore.
+
+        :param int cycle: The cycle number
+        :param float duration: The cycle duration in seconds
+        :param profiler: The profiler
+        :type profiler: cProfile.Profile or SamplingProfiler
+        '''
+        if len(self.slowest) >= self.keep and duration <= self.slowest[0][0]:
+            return
+
+        path = self.directory / f'{self.prefix}-{cycle:06d}-{duration * 1000:.0f}ms{self.modes[self.mode]}'
+
+        try:
+            if self.mode == 'cprofile':
+                profiler.dump_stats(path)
+            else:
+                profiler.dump(path)
+        except OSError as ex:
+            LOGGER.warning('Writing profile %r failed, got «%s»', str(path), ex)
+            return
+
+        LOGGER.debug('Cycle %d took %.3f seconds, profile written to %r', cycle, duration, str(path))
+
+        if len(self.slowest) < self.keep:
+            heappush(self.slowest, (duration, str(path)))
+            return
+
+        _, evicted = heappushpop(self.slowest, (duration, str(path)))
+        Path(evicted).unlink(missing_ok=True)
@@ -9,15 +9,16 @@ __all__ = (
 from datetime import timedelta
 from logging import getLogger
 from struct import pack, unpack
-from time import time
 from zlib import crc32
 
 from .exceptions import ResponseError, TradePlanError
+from .indicators import Condition
+from .metrics import ORDERS, TRADE_PLANS
 
 LOGGER = getLogger(__name__)
 
 
-class TradePlan:
+class TradePlan:  # pylint: disable=too-many-instance-attributes
     '''
     The trade plan class.
 
@@ -25,17 +26,26 @@ class TradePlan:
     :param str pair: The trading pair
     :param float amount: The amount
     :param dict interval: Theinterval
+    :param list conditions: The conditions on indicators (optional)
     '''
 
     configuration_attribute = 'trade_plans'
+    configuration_key       = 'pair'
 
-    def __init__(self, runner, pair, amount, interval):
+    def __init__(self, runner, pair, amount, interval, conditions=None):  # pylint: disable=too-many-arguments
         self.runner      = runner
         self.pair        = pair
         self.amount      = amount
         self.interval    = timedelta(**interval)
+        self.conditions  = [Condition.from_config(**item) for item in conditions or []]
+        self.multiplier  = 1.0
+        self.unmet       = False
         self.last_order  = None
         self.last_failed = None
+        self.last_opened = None
+
+        for condition in self.conditions:
+            runner.indicators.candles(condition.window)
 
     def __str__(self):
         '''
@@ -66,12 +76,30 @@ class TradePlan:
         self.fetch_last_closed_order()
 
         should_open, reason = self.validate_order_opening()
-        LOGGER.debug('Order opening decision:')
-        LOGGER.debug('    Decision: %r', should_open)
-        LOGGER.debug('    Reason:   %r', reason)
+        self.runner.log_decision(self, should_open, reason)
 
         if should_open:
-            self.open_order()
+            self.open_order(amount=self.amount * self.multiplier)
+        else:
+            TRADE_PLANS.labels('skipped').inc()
+
+    def update(self, other):
+        '''
+        Update the configuration of the trade plan from a reloaded one, while
+        keeping its order state.
+
+        :param TradePlan other: The reloaded trade plan
+
+        :return: The configuration changed
+        :rtype: bool
+        '''
+        changed = (self.amount, self.interval, self.conditions) != (other.amount, other.interval, other.conditions)
+
+        self.amount     = other.amount
+        self.interval   = other.interval
+        self.conditions = other.conditions
+
+        return changed
 
     @property
     def userref(self):
@@ -111,26 +139,24 @@ class TradePlan:
 
         :raises TradePlanError: When there are open orders
         '''
-        if self.runner.client.request('OpenOrders', userref=self.userref)['open']:
+        if self.runner.order_book.get_open_orders(self.userref):
             raise TradePlanError(f'There are still open orders for {self!r}, skipping…')
 
     def fetch_last_closed_order(self):
         '''
         Get the last closed order for this trade plan.
         '''
-        orders = self.runner.client.request('ClosedOrders', userref=self.userref)['closed']
+        self.last_order = self.runner.order_book.get_last_closed_order(self.userref)
 
-        try:
-            self.last_order = sorted(orders.values(),
-                                     key=lambda order: order['closetm'], reverse=True)[0]
+        if self.last_order:
             LOGGER.debug('Last closed order is %r', self.last_order)
-        except IndexError:
-            self.last_order = None
+        else:
             LOGGER.debug('No last closed order found yet')
 
     def validate_order_opening(self):
         '''
-        Validate the opening of a new order.
+        Validate the opening of a new order, first by its schedule, then by
+        its conditions.
 
         :return: The decision & reason
         :rtype: tuple(bool, str)
@@ -139,13 +165,78 @@ class TradePlan:
         '''
         LOGGER.debug('Validating order execution for %r', self)
 
-        now            = int(time())
+        self.multiplier = 1.0
+        self.unmet      = False
+
+        should_open, reason = self.validate_schedule()
+
+        if not should_open or not self.conditions:
+            return should_open, reason
+
+        return self.validate_conditions(reason)
+
+    def validate_conditions(self, reason):
+        '''
+        Validate the conditions of the trade plan, and determine the amount
+        multiplier of the met optional conditions.
+
+        The indicators are compared to the last price of the market data
+        snapshot. Until all required conditions are met, the trade plan is
+        re-evaluated after the runner interval.
+
+        :param str reason: The reason of the schedule
+
+        :return: The decision & reason
+        :rtype: tuple(bool, str)
+
+        :raises TradePlanError: When an indicator or the price isn't available
+        '''
+        indicators = self.runner.indicators
+        windows    = {condition: indicators.candles(condition.window) for condition in self.conditions}
+        reasons    = [reason]
+        self.unmet = True
+
+        try:
+            series = indicators.get(self.pair, set(windows.values()))
+            ticker = self.runner.market_data.snapshot().get(self.pair)
+        except ResponseError as ex:
+            raise TradePlanError(f'Market data of {self!r} not available, got «{ex}»') from ex
+
+        for condition, window in windows.items():
+            met, condition_reason = condition.evaluate(series, window, price=ticker.last if ticker else None)
+
+            if condition.multiplier is None and not met:
+                return False, f'{reason}, but {condition_reason}'
+
+            if condition.multiplier is not None and met:
+                self.multiplier *= condition.multiplier
+                condition_reason = f'{condition_reason}, amount × {condition.multiplier:g}'
+
+            reasons.append(condition_reason)
+
+        self.unmet = False
+
+        return True, ', '.join(reasons)
+
+    def validate_schedule(self):
+        '''
+        Validate the opening of a new order by the schedule of the trade plan.
+
+        :return: The decision & reason
+        :rtype: tuple(bool, str)
+
+        :raises TradePlanError: When an unexpected status is retreived
+        '''
+
+        self.expire_failure()
+
+        now            = self.runner.clock.time()
         last_failed    = self.last_failed
         interval       = self.interval.total_seconds()
 
         last_order = self.last_order
-        status     = last_order['status'] if last_order else ''
-        timestamp  = last_order['closetm'] if last_order else 0
+        status     = last_order.status if last_order else ''
+        timestamp  = last_order.closetm if last_order else 0
 
         # Last opening failed without creating order, validate retry.
         if last_failed:
@@ -182,7 +273,7 @@ class TradePlan:
 
         :raises TradePlanError: When an unexpected status is retreived
         '''
-        now            = int(time())
+        now            = self.runner.clock.time()
         retry_interval = self.runner.config.retry_interval * 60
         retry_timeout  = self.runner.config.retry_timeout * 60
 
@@ -197,22 +288,84 @@ class TradePlan:
         # Retry interval not exceeded yet.
         return False, f'Last order {status}, but retry interval not exceeded yet'
 
-    def open_order(self):
+    def expire_failure(self):
+        '''
+        Clear the last failed order opening once its retry timeout is
+        exceeded, so the trade plan isn't blocked by it forever (e.g. after
+        the failure was restored from the state store).
+        '''
+        retry_timeout = self.runner.config.retry_timeout * 60
+
+        if self.last_failed is not None and self.runner.clock.time() > self.last_failed + retry_timeout:
+            LOGGER.info('Retry timeout of last failed %r order opening exceeded, clearing it', self)
+            self.last_failed = None
+
+    def next_due(self):  # pylint: disable=too-many-return-statements
+        '''
+        Calculate the next time at which the trade plan has to be evaluated.
+
+        This mirrors :meth:`validate_order_opening`, but instead of validating
+        the opening of an order right now, it calculates the earliest time at
+        which an order might be opened, based on the cached order state. When
+        the state of the last order is still unknown (e.g. there are still open
+        orders), the trade plan is due after the runner interval.
+
+        :return: The UNIX timestamp
+        :rtype: float
+        '''
+        self.expire_failure()
+
+        now            = self.runner.clock.time()
+        poll           = now + self.runner.config.interval * 60
+        interval       = self.interval.total_seconds()
+        retry_interval = self.runner.config.retry_interval * 60
+        retry_timeout  = self.runner.config.retry_timeout * 60
+
+        last_order = self.last_order
+        timestamp  = last_order.closetm if last_order else 0
+
+        if self.runner.order_book.get_open_orders(self.userref):
+            return poll
+
+        # Conditions unmet or unavailable, re-evaluate them after the runner interval.
+        if self.unmet:
+            return poll
+
+        if self.last_opened and self.last_opened > timestamp:
+            return poll
+
+        if self.last_failed:
+            return self.last_failed + retry_interval
+
+        if not last_order:
+            return now
+
+        if last_order.status == 'closed' or now > timestamp + retry_timeout:
+            return timestamp + interval
+
+        return min(timestamp + retry_interval, timestamp + interval)
+
+    def open_order(self, amount=None):
         '''
         Open a new order.
+
+        :param amount: The amount (optional, defaults to the trade plan amount)
+        :type amount: None or float
         '''
+        amount = self.amount if amount is None else amount
+
         LOGGER.info('Opening new market order for %r with quote currency amount of %f',
-                    self, self.amount)
+                    self, amount)
 
         self.last_failed = None
 
         try:
 
-            self.runner.client.request(
+            result = self.runner.client.request(
                 'AddOrder',
                 pair=self.pair,
                 userref=self.userref,
-                volume=self.amount,
+                volume=amount,
                 oflags='viqc',          # order volume expressed in quote currency
                 ordertype='market',
                 type='buy',
@@ -221,5 +374,30 @@ class TradePlan:
             )
 
         except ResponseError as ex:
-            self.last_failed = time()
+            self.last_failed = self.runner.clock.time()
+            ORDERS.labels(self.pair, 'failed').inc()
             LOGGER.warning('Opening order for %r failed with reason «%s»', self, str(ex))
+            return
+
+        self.last_opened = self.runner.clock.time()
+        self.runner.balances.mark_stale()
+        ORDERS.labels(self.pair, 'opened').inc()
+        self.runner.order_book.add_open_orders(result.get('txid', []))
+
+        ticker = self.get_ticker()
+        if ticker and ticker.ask > 0:
+            LOGGER.info('Opened order for %r at an ask price of %f, which buys an estimated volume of %f',
+                        self, ticker.ask, amount / ticker.ask)
+
+    def get_ticker(self):
+        '''
+        Get the ticker of the trading pair from the market data snapshot.
+
+        :return: The ticker (``None`` when not available)
+        :rtype: None or marketdata.Ticker
+        '''
+        try:
+            return self.runner.market_data.snapshot().get(self.pair)
+        except ResponseError as ex:
+            LOGGER.warning('Market data of %r not available, got «%s»', self, str(ex))
+            return None
@@ -0,0 +1,227 @@
+'''
+CryptoBob WebSocket module.
+'''
+
+__all__ = (
+    'WebSocket',
+    'WebSocketError',
+)
+
+import socket
+import ssl
+from base64 import b64encode
+from hashlib import sha1
+from logging import getLogger
+from os import urandom
+from struct import pack, unpack
+from threading import Lock
+from urllib.parse import urlsplit
+
+from .exceptions import ResponseError
+
+LOGGER = getLogger(__name__)
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT         = 0x1
+OPCODE_BINARY       = 0x2
+OPCODE_CLOSE        = 0x8
+OPCODE_PING         = 0x9
+OPCODE_PONG         = 0xA
+
+
+class WebSocketError(ResponseError):
+    '''
+    Exception which is thrown when there's an error on a WebSocket connection.
+    '''
+
+
+class WebSocket:
+    '''
+    A minimal blocking WebSocket client (RFC 6455) for text messages.
+
+    :param str url: The ``ws://`` or ``wss://`` URL
+    :param float timeout: The socket timeout in seconds
+    '''
+
+    def __init__(self, url, timeout=60.0):
+        self.url    = urlsplit(url)
+        self.sock   = None
+        self.buffer = b''
+        self.lock   = Lock()
+
+        self.connect(timeout=timeout)
+
+    def connect(self, timeout):
+        '''
+        Connect to the server and do the opening handshake.
+
+        :param float timeout: The socket timeout in seconds
+
+        :raises WebSocketError: When the handshake failed
+        '''
+        secure = self.url.scheme == 'wss'
+        host   = self.url.hostname
+        port   = self.url.port or (443 if secure else 80)
+        path   = self.url.path or '/'
+        key    = b64encode(urandom(16)).decode('ascii')
+
+        LOGGER.debug('Connecting to WebSocket %r', self.url.geturl())
+
+        sock = socket.create_connection((host, port), timeout=timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        self.sock = sock
+
+        self.sock.sendall((
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {self.url.netloc}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n'
+            'User-Agent: CryptoBob\r\n'
+            '\r\n'
+        ).encode('ascii'))
+
+        while b'\r\n\r\n' not in self.buffer:
+            self._fill()
+
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        lines   = head.decode('iso-8859-1').split('\r\n')
+        headers = dict(
+            (name.strip().lower(), value.strip())
+            for name, _, value in (line.partition(':') for line in lines[1:])
+        )
+        accept  = b64encode(sha1(f'{key}{GUID}'.encode('ascii')).digest()).decode('ascii')
+
+        if ' 101 ' not in f'{lines[0]} ' or headers.get('sec-websocket-accept') != accept:
+            self.close()
+            raise WebSocketError(f'WebSocket handshake failed with «{lines[0]}»')
+
+    def _fill(self):
+        '''
+        Read more data from the socket into the buffer.
+
+        :raises WebSocketError: When the connection was closed
+        '''
+        data = self.sock.recv(65536)
+        if not data:
+            raise WebSocketError('WebSocket connection closed by server')
+        self.buffer += data
+
+    def _read(self, size):
+        '''
+        Read an exact number of bytes.
+
+        :param int size: The number of bytes
+
+        :return: The data
+        :rtype: bytes
+        '''
+        while len(self.buffer) < size:
+            self._fill()
+
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def _send_frame(self, opcode, payload):
+        '''
+        Send a single, masked frame.
+
+        :param int opcode: The opcode
+        :param bytes payload: The payload
+        '''
+        length = len(payload)
+
+        if length < 126:
+            header = pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 65536:
+            header = pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+
+        mask   = urandom(4)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+        self.sock.sendall(header + mask + masked)
+
+    def _recv_frame(self):
+        '''
+        Receive a single frame.
+
+        :return: The FIN flag, the opcode & the payload
+        :rtype: tuple(bool, int, bytes)
+        '''
+        first, second = self._read(2)
+        length        = second & 0x7F
+
+        if length == 126:
+            length = unpack('!H', self._read(2))[0]
+        elif length == 127:
+            length = unpack('!Q', self._read(8))[0]
+
+        mask    = self._read(4) if second & 0x80 else None
+        payload = self._read(length)
+
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+        return bool(first & 0x80), first & 0x0F, payload
+
+    def send(self, message):
+        '''
+        Send a text message.
+
+        :param str message: The message
+        '''
+        self._send_frame(OPCODE_TEXT, message.encode('utf-8'))
+
+    def recv(self):
+        '''
+        Receive the next text message, while answering pings.
+
+        :return: The message
+        :rtype: str
+
+        :raises WebSocketError: When the connection was closed
+        '''
+        fragments = []
+
+        while True:
+            fin, opcode, payload = self._recv_frame()
+
+            if opcode == OPCODE_PING:
+                self._send_frame(OPCODE_PONG, payload)
+                continue
+
+            if opcode == OPCODE_PONG:
+                continue
+
+            if opcode == OPCODE_CLOSE:
+                self.close()
+                raise WebSocketError('WebSocket connection closed by server')
+
+            if opcode in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONTINUATION):
+                fragments.append(payload)
+
+            if fin:
+                return b''.join(fragments).decode('utf-8')
+
+    def close(self):
+        '''
+        Close the connection.
+        '''
+        # The receiving thread closes on a close frame, maybe concurrently.
+        with self.lock:
+            if self.sock is None:
+                return
+
+            try:
+                self._send_frame(OPCODE_CLOSE, pack('!H', 1000))
+            except OSError:
+                pass
+
+            self.sock.close()
+            self.sock = None
@@ -8,10 +8,13 @@ __all__ = (
 
 from logging import getLogger
 
+from .exceptions import ResponseError
+from .metrics import WITHDRAWALS
+
 LOGGER = getLogger(__name__)
 
 
-class Withdrawal:
+class Withdrawal:  # pylint: disable=too-many-instance-attributes
     '''
     The withdrawal class.
 
@@ -25,6 +28,7 @@ class Withdrawal:
     '''
 
     configuration_attribute = 'withdrawals'
+    configuration_key       = 'asset'
 
     def __init__(self, runner, asset, threshold, key, address, amount=None):  # pylint: disable=too-many-arguments
         self.runner    = runner
@@ -34,6 +38,7 @@ class Withdrawal:
         self.address   = address
         self.amount    = amount
         self.balance   = 0.0
+        self.last_run  = None
 
     def __str__(self):
         '''
@@ -53,35 +58,112 @@ class Withdrawal:
         '''
         return f'<{self.__class__.__name__}: {self.asset}>'
 
+    def update(self, other):
+        '''
+        Update the configuration of the withdrawal from a reloaded one, while
+        keeping its state.
+
+        :param Withdrawal other: The reloaded withdrawal
+
+        :return: The configuration changed
+        :rtype: bool
+        '''
+        fields  = ('threshold', 'key', 'address', 'amount')
+        changed = any(getattr(self, field) != getattr(other, field) for field in fields)
+
+        for field in fields:
+            setattr(self, field, getattr(other, field))
+
+        return changed
+
+    def next_due(self):
+        '''
+        Calculate the next time at which the withdrawal has to be evaluated.
+
+        The withdrawal is evaluated regularly at the configured
+        ``withdrawal_interval`` (defaults to the runner interval). The
+        deadlines are aligned to multiples of the interval, so that they
+        don't drift over time.
+
+        :return: The UNIX timestamp
+        :rtype: float
+        '''
+        config   = self.runner.config
+        interval = config.get('withdrawal_interval', config.interval) * 60
+
+        if self.last_run is None:
+            return self.runner.clock.time()
+
+        return (self.last_run // interval + 1) * interval
+
     def __call__(self):
         '''
         Check if the withdrawal threshold is exceeded, then automatically
         withdraw the asset to the defined address.
+
+        The withdrawal is skipped while an earlier withdrawal of the asset is
+        still in-flight, or when it would be rejected due to its limits.
+        Failures are logged, so that they never break the runner cycle.
         '''
         LOGGER.debug('Evaluating %r', self)
 
+        self.last_run = self.runner.clock.time()
+
         asset     = self.asset
         threshold = self.threshold
         amount    = self.amount or 0.0
         address   = self.address
         key       = self.key
+        funding   = self.runner.funding
+
+        try:
+            if funding.is_pending(asset) and funding.update_status(asset):
+                self.runner.balances.mark_stale()
+        except ResponseError as ex:
+            LOGGER.warning('Updating status of %s withdrawals failed with reason «%s»', asset, str(ex))
 
-        balance = float(self.runner.client.balance.get(asset) or 0.0)
+        if funding.is_pending(asset):
+            WITHDRAWALS.labels(asset, 'skipped').inc()
+            self.runner.log_decision(self, False, f'Earlier {asset} withdrawal still in-flight')
+            return
+
+        balance = self.runner.balances.get(asset)
         LOGGER.debug('%s balance is %f, configured withdrawal threshold is %f',
                      asset, balance, threshold)
 
         if balance < threshold:
-            LOGGER.debug('%s threshold not exceeded, skipping withdrawal', asset)
+            self.runner.log_decision(self, False, f'Balance {balance:f} below threshold {threshold:f}')
             return
 
-        withdraw_amount = min(amount or balance, balance)
+        try:
+            valid, reason, withdraw_amount = funding.validate(asset, key, min(amount or balance, balance))
+        except ResponseError as ex:
+            valid, reason = False, f'Withdrawal limits unknown, got «{ex}»'
+
+        if not valid:
+            WITHDRAWALS.labels(asset, 'skipped').inc()
+            self.runner.log_decision(self, False, reason)
+            return
+
+        self.runner.log_decision(self, True, f'Balance {balance:f} exceeds threshold {threshold:f}')
 
         LOGGER.info('Initiating withdrawal of %f %s to %s', withdraw_amount, asset, address)
-        if not self.runner.config.get('test', False):
-            self.runner.client.request(
+        if self.runner.config.get('test', False):
+            return
+
+        try:
+            result = self.runner.client.request(
                 'Withdraw',
                 asset=asset,
                 key=key,
                 address=address,
                 amount=withdraw_amount,
             )
+        except ResponseError as ex:
+            WITHDRAWALS.labels(asset, 'failed').inc()
+            LOGGER.warning('Withdrawal of %s failed with reason «%s»', asset, str(ex))
+            return
+
+        WITHDRAWALS.labels(asset, 'initiated').inc()
+        funding.add(asset, result.get('refid'), withdraw_amount)
+        self.runner.balances.withdrawn(asset, withdraw_amount)
@@ -64,7 +64,8 @@ setup(
     install_requires=requirements,
 
     extras_require={
-        'dev': requirements_dev
+        'dev': requirements_dev,
+        'backtest': ['numpy>=1.23'],
     },
 
 )
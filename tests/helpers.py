@@ -0,0 +1,26 @@
+'''
+Helpers of the tests.
+'''
+
+import os
+from json import dumps
+from pathlib import Path
+from time import time
+
+
+def write_config(directory, data):
+    '''
+    Write a config file to a directory.
+
+    :param pathlib.Path directory: The config directory
+    :param dict data: The config data
+
+    :return: The config path
+    :rtype: pathlib.Path
+    '''
+    path = Path(directory) / f'test-{time():.6f}.yml'
+
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600), 'w', encoding='utf-8') as file:
+        file.write(dumps(data))
+
+    return path
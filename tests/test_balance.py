@@ -0,0 +1,56 @@
+'''
+Tests of the balance tracker against the mock server.
+'''
+
+from time import time
+from unittest import TestCase
+
+from cryptobob.balance import BalanceTracker
+from cryptobob.clock import VirtualClock
+from cryptobob.kraken import KrakenClient
+from cryptobob.mockserver import MockKraken
+
+
+class BalanceTrackerTest(TestCase):
+    '''
+    The balance tracker test case.
+    '''
+
+    def setUp(self):
+        self.server = MockKraken(rate_limit=False)
+        self.server.balance = {'ZEUR': '100.0', 'XXBT': '1.0'}
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.client = KrakenClient(api_key=self.server.api_key, private_key=self.server.private_key,
+                                   api_url=self.server.url)
+        self.addCleanup(self.client.pool.close)
+
+    def test_cursor(self):
+        '''
+        The ledger cursor is the latest ledger entry, regardless of the local
+        clock.
+        '''
+        self.client.request('Withdraw', asset='XXBT', key='wallet', amount='0.25')
+        entry = max(self.server.ledger.values(), key=lambda item: item['time'])
+
+        tracker = BalanceTracker(client=self.client, clock=VirtualClock(start=time() + 3600))
+        tracker.update()
+
+        self.assertEqual(tracker.cursor, entry['time'])
+        self.assertEqual(tracker.get('XXBT'), 0.75)
+
+    def test_skewed_clock(self):
+        '''
+        Ledger entries posted after the reconciliation are projected, even when
+        the local clock is ahead of Kraken's.
+        '''
+        tracker = BalanceTracker(client=self.client, clock=VirtualClock(start=time() + 3600))
+        tracker.update()
+
+        self.client.request('Withdraw', asset='XXBT', key='wallet', amount='0.25')
+        tracker.mark_stale()
+        tracker.update()
+
+        self.assertEqual(tracker.get('XXBT'), 0.75)
+        self.assertEqual(tracker.cursor, max(entry['time'] for entry in self.server.ledger.values()))
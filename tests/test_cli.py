@@ -0,0 +1,75 @@
+'''
+Tests of the CLI startup, i.e. its lazy imports & the config cache.
+'''
+
+import os
+import subprocess
+import sys
+from base64 import b64encode
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from tests.helpers import write_config
+
+#: Runs the CLI, and reports the imported modules afterwards.
+CLI = 'import sys; from cryptobob.cli import main; main(); sys.stderr.write(" ".join(sys.modules))'
+
+
+class CLITest(TestCase):
+    '''
+    The CLI test case.
+    '''
+
+    def setUp(self):
+        directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_python(self, *args):
+        '''
+        Run Python in a new process, with the temporary directory as home.
+
+        :param str \\*args: The Python arguments
+
+        :return: The stdout & the stderr
+        :rtype: tuple(str, str)
+        '''
+        env = {**os.environ, 'HOME': str(self.directory), 'PYTHONPATH': str(Path(__file__).parents[1])}
+        cmd = subprocess.run([sys.executable, *args], env=env, capture_output=True, check=True, text=True)
+
+        return cmd.stdout, cmd.stderr
+
+    def test_import(self):
+        '''
+        Importing the CLI doesn't import the heavy modules.
+        '''
+        _, modules = self.run_python('-c', 'import sys, cryptobob.cli; sys.stderr.write(" ".join(sys.modules))')
+        modules    = set(modules.split())
+
+        self.assertIn('cryptobob.cli', modules)
+        for module in ('yaml', 'pyotp', 'numpy', 'cryptobob.runner', 'cryptobob.kraken', 'cryptobob.backtest'):
+            self.assertNotIn(module, modules)
+
+    def test_otp(self):
+        '''
+        The OTP is printed without the runner, and the YAML config is only
+        parsed once, while it's loaded from the config cache afterwards.
+        '''
+        path = write_config(self.directory, {
+            'api_key': 'key',
+            'private_key': b64encode(bytes(range(64))).decode('ascii'),
+            'otp_uri': 'otpauth://totp/CryptoBob?secret=JBSWY3DPEHPK3PXP',
+            'trade_plans': [{'pair': 'XBTEUR', 'amount': 10, 'interval': {'days': 1}}],
+            'withdrawals': [],
+        })
+
+        for parsed in (True, False):
+            otp, modules = self.run_python('-c', CLI, '-c', str(path), 'otp')
+            modules      = set(modules.split())
+
+            self.assertRegex(otp, r'^\d{6}\n$')
+            self.assertEqual('yaml' in modules, parsed)
+            self.assertNotIn('cryptobob.runner', modules)
+
+        self.assertTrue(list((self.directory / '.cache' / 'cryptobob' / 'config').glob('*.marshal')))
@@ -0,0 +1,113 @@
+'''
+Tests of the HTTP connection pool.
+'''
+
+from socket import create_server
+from threading import Thread
+from time import sleep
+from unittest import TestCase
+
+from cryptobob.connection import ConnectionPool
+
+
+class DroppingServer:
+    '''
+    A minimal HTTP server, which receives every request, but drops the
+    connection instead of responding to the second request on a connection.
+
+    :param bool close_idle: Close the connections right after the first response
+    '''
+
+    response = b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nok'
+
+    def __init__(self, close_idle=False):
+        self.socket     = create_server(('127.0.0.1', 0))
+        self.close_idle = close_idle
+        self.received   = 0
+        self.host       = f'127.0.0.1:{self.socket.getsockname()[1]}'
+
+        Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        '''
+        Accept the connections.
+        '''
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                return
+            Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        '''
+        Handle a connection.
+
+        :param socket.socket connection: The connection
+        '''
+        with connection:
+            for index in range(2):
+                if not connection.recv(65536):
+                    return
+                self.received += 1
+                if index == 0:
+                    connection.sendall(self.response)
+                    if self.close_idle:
+                        return
+
+    def close(self):
+        '''
+        Stop accepting connections.
+        '''
+        self.socket.close()
+
+
+class ConnectionPoolTest(TestCase):
+    '''
+    The connection pool test case.
+    '''
+
+    def setUp(self):
+        self.server = DroppingServer()
+        self.pool   = ConnectionPool()
+        self.addCleanup(self.server.close)
+        self.addCleanup(self.pool.close)
+
+    def test_discard_closed(self):
+        '''
+        Idle connections, which were closed by the server, aren't reused.
+        '''
+        server = DroppingServer(close_idle=True)
+        self.addCleanup(server.close)
+
+        self.pool.request(server.host, 'POST', '/', body=b'a', scheme='http', idempotent=False)
+        sleep(0.1)
+        response = self.pool.request(server.host, 'POST', '/', body=b'a', scheme='http', idempotent=False)
+
+        self.assertEqual(response.status, 200)
+        self.assertFalse(response.timing.reused)
+        self.assertEqual(server.received, 2)
+
+    def test_resend_idempotent(self):
+        '''
+        Idempotent requests are resent on a fresh connection, when a reused
+        connection was dropped after the request was written.
+        '''
+        self.pool.request(self.server.host, 'GET', '/', scheme='http')
+        response = self.pool.request(self.server.host, 'GET', '/', scheme='http')
+
+        self.assertEqual(response.status, 200)
+        self.assertFalse(response.timing.reused)
+        self.assertEqual(self.server.received, 3)
+
+    def test_no_resend(self):
+        '''
+        Non-idempotent requests aren't sent twice, when a reused connection
+        was dropped after the request was written.
+        '''
+        self.pool.request(self.server.host, 'POST', '/', body=b'a', scheme='http', idempotent=False)
+
+        with self.assertRaises(OSError):
+            self.pool.request(self.server.host, 'POST', '/', body=b'a', scheme='http', idempotent=False)
+
+        self.assertEqual(self.server.received, 2)
@@ -0,0 +1,87 @@
+'''
+Tests of the coordination of API keys across processes.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from cryptobob.coordination import KeyCoordinator
+from cryptobob.exceptions import ResponseError
+from cryptobob.kraken import KrakenClient
+from cryptobob.mockserver import MockKraken
+
+
+class KeyCoordinatorTest(TestCase):
+    '''
+    The key coordinator test case.
+    '''
+
+    def setUp(self):
+        self.server = MockKraken(rate_limit=False)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.run_dir = Path(directory.name)
+
+    def create_client(self):
+        '''
+        Create a client of the mock server with its own key coordinator,
+        which locks the state file like another process would.
+
+        :return: The client
+        :rtype: cryptobob.kraken.KrakenClient
+        '''
+        client = KrakenClient(api_key=self.server.api_key, private_key=self.server.private_key,
+                              api_url=self.server.url,
+                              coordinator=KeyCoordinator(self.run_dir, self.server.api_key))
+        self.addCleanup(client.pool.close)
+
+        return client
+
+    def test_next_nonce(self):
+        '''
+        The nonces are strictly increasing across coordinators of the same key.
+        '''
+        first  = KeyCoordinator(self.run_dir, 'key')
+        second = KeyCoordinator(self.run_dir, 'key')
+
+        self.assertEqual(first.next_nonce(100), 100)
+        self.assertEqual(second.next_nonce(50), 101)
+        self.assertEqual(first.next_nonce(200), 200)
+
+    def test_nested_lock(self):
+        '''
+        The state file can be locked again by the thread holding the lock.
+        '''
+        coordinator = KeyCoordinator(self.run_dir, 'key')
+
+        with coordinator.locked() as state:
+            nonce = coordinator.next_nonce(100)
+            self.assertEqual(state[0], nonce)
+
+        self.assertEqual(KeyCoordinator(self.run_dir, 'key').next_nonce(0), nonce + 1)
+
+    def test_concurrent_clients(self):
+        '''
+        Concurrent private requests of clients sharing an API key reach Kraken
+        with strictly increasing nonces.
+        '''
+        clients = [self.create_client() for _ in range(2)]
+
+        def add_order(index):
+            try:
+                clients[index % 2].request('AddOrder', pair='XBTEUR', userref=1, volume=10, oflags='viqc',
+                                           ordertype='market', type='buy')
+            except ResponseError as ex:
+                return str(ex)
+            return None
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            errors = [error for error in executor.map(add_order, range(400)) if error]
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.server.orders), 400)
@@ -0,0 +1,54 @@
+'''
+Tests of the funding tracker against the mock server.
+'''
+
+from unittest import TestCase
+
+from cryptobob.clock import VirtualClock
+from cryptobob.funding import FundingTracker
+from cryptobob.kraken import KrakenClient
+from cryptobob.mockserver import MockKraken
+
+
+class FundingTrackerTest(TestCase):
+    '''
+    The funding tracker test case.
+    '''
+
+    def setUp(self):
+        self.server = MockKraken(rate_limit=False)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        client = KrakenClient(api_key=self.server.api_key, private_key=self.server.private_key,
+                              api_url=self.server.url)
+        self.addCleanup(client.pool.close)
+
+        self.clock   = VirtualClock(start=0)
+        self.funding = FundingTracker(client=client, clock=self.clock, ttl=3600)
+
+    def test_missing_refid(self):
+        '''
+        Withdrawals without reference ID aren't tracked.
+        '''
+        with self.assertLogs('cryptobob.funding', level='WARNING'):
+            self.funding.add('XXBT', None, 0.5)
+
+        self.assertFalse(self.funding.is_pending('XXBT'))
+
+    def test_info_cache(self):
+        '''
+        The withdrawal info is cached per amount, until it's expired.
+        '''
+        self.funding.get_limits('XXBT', 'wallet', 0.5)
+        self.funding.get_limits('XXBT', 'wallet', 0.5)
+        self.funding.get_limits('XXBT', 'wallet', 0.25)
+
+        self.assertEqual(self.server.requests['WithdrawInfo'], 2)
+        self.assertEqual(self.server.requests['WithdrawMethods'], 1)
+
+        self.clock.sleep(3600)
+        self.funding.get_limits('XXBT', 'wallet', 0.5)
+
+        self.assertEqual(self.server.requests['WithdrawInfo'], 3)
+        self.assertEqual(len(self.funding.info), 1)
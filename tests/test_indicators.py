@@ -0,0 +1,47 @@
+'''
+Tests of the indicators against the mock server.
+'''
+
+from unittest import TestCase
+
+from cryptobob.clock import VirtualClock
+from cryptobob.exceptions import ConfigError
+from cryptobob.indicators import Condition, IndicatorEngine
+from cryptobob.kraken import KrakenClient
+from cryptobob.mockserver import MockKraken
+
+
+class IndicatorEngineTest(TestCase):
+    '''
+    The indicator engine test case.
+    '''
+
+    def setUp(self):
+        server = MockKraken(rate_limit=False)
+        server.start()
+        self.addCleanup(server.stop)
+
+        client = KrakenClient(api_url=server.url)
+        self.addCleanup(client.pool.close)
+
+        self.engine = IndicatorEngine(client=client, clock=VirtualClock(start=0))
+
+    def test_sma_30d(self):
+        '''
+        A 30-day SMA fits into the buffer of the default 60 minute candles, and
+        is available right away.
+        '''
+        condition = Condition.from_config(indicator='sma', window='30d', below=2.0)
+        window    = self.engine.candles(condition.window)
+        series    = self.engine.get('XBTEUR', [window])
+
+        self.assertEqual(window, 720)
+        self.assertIsNotNone(series.sma(window))
+        self.assertTrue(condition.evaluate(series, window)[0])
+
+    def test_window_exceeded(self):
+        '''
+        Windows which exceed the buffer are rejected.
+        '''
+        with self.assertRaises(ConfigError):
+            self.engine.candles(Condition.from_config(indicator='sma', window='31d', below=1.0).window)
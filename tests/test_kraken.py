@@ -0,0 +1,103 @@
+'''
+Tests of the Kraken client against the mock server.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from socket import socket
+from unittest import TestCase
+
+from cryptobob.exceptions import CircuitOpenError, ResponseError, TransientError
+from cryptobob.kraken import KrakenClient
+from cryptobob.mockserver import MockKraken
+from cryptobob.resilience import CircuitBreaker
+
+
+class KrakenClientTest(TestCase):
+    '''
+    The Kraken client test case.
+    '''
+
+    def setUp(self):
+        self.server = MockKraken(rate_limit=False)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def create_client(self, **kwargs):
+        '''
+        Create a client of the mock server.
+
+        :param dict \\**kwargs: Additional client arguments
+
+        :return: The client
+        :rtype: cryptobob.kraken.KrakenClient
+        '''
+        client = KrakenClient(api_key=self.server.api_key, private_key=self.server.private_key,
+                              api_url=self.server.url, **kwargs)
+        self.addCleanup(client.pool.close)
+
+        return client
+
+    def add_order(self, client):
+        '''
+        Open an order, and return the error (if any).
+
+        :param cryptobob.kraken.KrakenClient client: The client
+
+        :return: The error
+        :rtype: None or str
+        '''
+        try:
+            client.request('AddOrder', pair='XBTEUR', userref=1, volume=10, oflags='viqc',
+                           ordertype='market', type='buy')
+        except ResponseError as ex:
+            return str(ex)
+        return None
+
+    def test_concurrent_private_requests(self):
+        '''
+        Concurrent private requests reach Kraken with strictly increasing nonces.
+        '''
+        client = self.create_client()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            errors = [error for error in executor.map(lambda _: self.add_order(client), range(400)) if error]
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.server.requests['AddOrder'], 400)
+        self.assertEqual(len(self.server.orders), 400)
+
+    def test_concurrent_mixed_requests(self):
+        '''
+        Concurrent public requests don't interfere with the nonces of private ones.
+        '''
+        client = self.create_client()
+
+        def run(index):
+            if index % 2:
+                client.request('Time')
+                return None
+            return self.add_order(client)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            errors = [error for error in executor.map(run, range(200)) if error]
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.server.orders), 100)
+
+    def test_connection_errors(self):
+        '''
+        Connection errors open the circuit of an API method.
+        '''
+        with socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        client = KrakenClient(api_url=f'http://127.0.0.1:{port}', circuit_breaker=CircuitBreaker(threshold=2))
+        self.addCleanup(client.pool.close)
+
+        for _ in range(2):
+            with self.assertRaises(TransientError):
+                client.request('Time')
+
+        with self.assertRaises(CircuitOpenError):
+            client.request('Time')
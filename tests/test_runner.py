@@ -0,0 +1,117 @@
+'''
+Tests of the runner against the mock server.
+'''
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from cryptobob.clock import VirtualClock
+from cryptobob.config import Config
+from cryptobob.mockserver import MockKraken
+from cryptobob.runner import Runner
+from tests.helpers import write_config
+
+
+class RunnerTest(TestCase):
+    '''
+    The runner test case.
+    '''
+
+    def setUp(self):
+        directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        patcher = patch.object(Config, 'cache_dir', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_runner(self, server, start=0, **config):
+        '''
+        Create a runner of the mock server on a virtual clock.
+
+        :param mockserver.MockKraken server: The mock server
+        :param float start: The UNIX timestamp at which the clock starts
+        :param dict \\**config: Additional config
+
+        :return: The runner
+        :rtype: cryptobob.runner.Runner
+        '''
+        path = write_config(self.directory, {
+            'api_key': server.api_key,
+            'private_key': server.private_key,
+            'api_url': server.url,
+            'interval': 5,
+            'retry_interval': 60,
+            'retry_timeout': 1440,
+            'trade_plans': [{'pair': 'XBTEUR', 'amount': 10, 'interval': {'days': 1}}],
+            'withdrawals': [],
+            **config,
+        })
+
+        runner = Runner(config=Config(path), clock=VirtualClock(start=start))
+        self.addCleanup(runner.client.pool.close)
+
+        return runner
+
+    def test_maintenance(self):
+        '''
+        Failed cycles don't end the runner, while the open circuit of the
+        system status keeps the following cycles from sending anything.
+        '''
+        server = MockKraken(rate_limit=False, fixtures={'SystemStatus': {'status': 'maintenance'}})
+        server.start()
+        self.addCleanup(server.stop)
+
+        runner = self.create_runner(server, circuit_breaker={'cooldown': 3600})
+
+        with self.assertLogs('cryptobob.runner', level='ERROR') as logs:
+            runner.run(until=3600)
+
+        self.assertEqual(runner.cycles, 12)
+        self.assertEqual(len(logs.records), 12)
+        self.assertEqual(dict(server.requests), {'SystemStatus': 1})
+        self.assertEqual(runner.client.circuit_breaker.opened.keys(), {'SystemStatus'})
+
+    def test_recovery(self):
+        '''
+        Trade plans are evaluated again after a failed cycle.
+        '''
+        server = MockKraken(rate_limit=False, http_error_rate=1.0)
+        server.start()
+        self.addCleanup(server.stop)
+
+        runner = self.create_runner(server, retry={'retries': 0}, circuit_breaker={'threshold': 100})
+
+        with self.assertLogs('cryptobob.runner', level='ERROR'):
+            runner.run(until=600)
+
+        server.http_error_rate = 0.0
+        runner.run(until=1200)
+
+        self.assertEqual(server.requests['AddOrder'], 1)
+
+    def test_expired_failure(self):
+        '''
+        A restored failed order opening doesn't block the trade plan once its
+        retry timeout is exceeded.
+        '''
+        server = MockKraken(rate_limit=False)
+        server.start()
+        self.addCleanup(server.stop)
+
+        path   = self.directory / 'state.db'
+        runner = self.create_runner(server, state_file=str(path))
+        runner.state.set_failure(runner.trade_plans[0].userref, 3600.0)
+        runner.state.commit()
+        runner.state.close()
+
+        runner = self.create_runner(server, start=86400 * 2, state_file=str(path))
+        self.addCleanup(runner.state.close)
+        self.assertIsNone(runner.trade_plans[0].last_failed)
+
+        runner.run(until=86400 * 2 + 600)
+
+        self.assertEqual(server.requests['AddOrder'], 1)
@@ -0,0 +1,233 @@
+'''
+Tests of the WebSocket client & the stream feed against the stand-in
+WebSocket server of the mock.
+'''
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+from unittest import TestCase
+from unittest.mock import patch
+
+from cryptobob.config import Config
+from cryptobob.mockserver import MockKraken, MockKrakenStream
+from cryptobob.runner import Runner
+from cryptobob.websocket import WebSocket, WebSocketError
+from tests.helpers import write_config
+
+
+def wait_for(predicate, timeout=5.0):
+    '''
+    Wait until a predicate is true.
+
+    :param callable predicate: The predicate
+    :param float timeout: The timeout in seconds
+
+    :return: The predicate is true
+    :rtype: bool
+    '''
+    deadline = monotonic() + timeout
+
+    while not predicate():
+        if monotonic() > deadline:
+            return False
+        sleep(0.01)
+
+    return True
+
+
+class MockStreamTestCase(TestCase):
+    '''
+    The base test case with a mock server & its stand-in WebSocket server.
+    '''
+
+    def setUp(self):
+        self.kraken = MockKraken(rate_limit=False)
+        self.kraken.start()
+        self.addCleanup(self.kraken.stop)
+
+        self.stream = MockKrakenStream(self.kraken)
+        self.stream.start()
+        self.addCleanup(self.stream.stop)
+
+
+class WebSocketTest(MockStreamTestCase):
+    '''
+    The WebSocket client test case.
+    '''
+
+    def connect(self, url=None):
+        '''
+        Connect to the stand-in WebSocket server.
+
+        :param url: The URL (optional)
+        :type url: None or str
+
+        :return: The WebSocket
+        :rtype: cryptobob.websocket.WebSocket
+        '''
+        socket = WebSocket(url or self.stream.url, timeout=5.0)
+        self.addCleanup(socket.close)
+
+        return socket
+
+    def test_handshake(self):
+        '''
+        The opening handshake is accepted.
+        '''
+        self.connect()
+
+        self.assertTrue(wait_for(lambda: self.stream.connects == 1))
+        self.assertEqual(self.stream.errors, [])
+
+    def test_handshake_failure(self):
+        '''
+        A rejected handshake raises an error.
+        '''
+        with self.assertRaises(WebSocketError):
+            self.connect(self.stream.url.replace('/v2', '/v1'))
+
+    def test_masking(self):
+        '''
+        Client frames are masked, incl. the ones with extended payload lengths.
+        '''
+        socket = self.connect()
+
+        for size in (10, 1000, 70000):
+            socket.send(f'{{"method": "echo", "data": "{"x" * size}"}}')
+
+        self.assertTrue(wait_for(lambda: len(self.stream.messages) == 3))
+        self.assertEqual([len(message['data']) for message in self.stream.messages], [10, 1000, 70000])
+        self.assertEqual(self.stream.errors, [])
+
+    def test_ping_pong(self):
+        '''
+        Pings are answered with pongs while receiving messages.
+        '''
+        socket = self.connect()
+        self.assertTrue(wait_for(lambda: self.stream.connects == 1))
+
+        self.stream.ping(b'ping')
+        socket.send('{"method": "subscribe", "params": {"channel": "executions", "token": "mock"}}')
+
+        self.assertEqual(socket.recv(), '{"method": "subscribe", "success": true, "result": {"channel": "executions"}}')
+        self.assertTrue(wait_for(lambda: self.stream.pongs == [b'ping']))
+
+    def test_large_message(self):
+        '''
+        Server frames with extended payload lengths are received.
+        '''
+        socket = self.connect()
+        socket.send('{"method": "subscribe", "params": {"channel": "balances", "token": "mock"}}')
+        socket.recv()
+
+        data = [{'asset': 'EUR', 'balance': index} for index in range(5000)]
+        self.stream.publish('balances', data)
+
+        self.assertIn('"balance": 4999}', socket.recv())
+
+    def test_closed(self):
+        '''
+        A dropped connection raises an error.
+        '''
+        socket = self.connect()
+        self.assertTrue(wait_for(lambda: self.stream.connects == 1))
+
+        self.stream.drop()
+
+        with self.assertRaises(WebSocketError):
+            socket.recv()
+
+
+class StreamFeedTest(MockStreamTestCase):
+    '''
+    The stream feed test case.
+    '''
+
+    def setUp(self):
+        super().setUp()
+
+        directory = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+
+        patcher = patch.object(Config, 'cache_dir', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.kraken.balance = {'ZEUR': '100.0', 'XXBT': '0.5'}
+        self.txid           = self.kraken.add_order(userref=1, pair='XBTEUR', status='open')
+
+        path = write_config(Path(directory.name), {
+            'api_key': self.kraken.api_key,
+            'private_key': self.kraken.private_key,
+            'api_url': self.kraken.url,
+            'stream_url': self.stream.url,
+            'streaming': True,
+            'interval': 5,
+            'retry_interval': 60,
+            'retry_timeout': 1440,
+            'trade_plans': [],
+            'withdrawals': [],
+        })
+
+        self.runner = Runner(config=Config(path))
+        self.addCleanup(self.runner.client.pool.close)
+
+        self.runner.start()
+        self.addCleanup(self.runner.stream.stop)
+
+        self.assertTrue(self.runner.stream.connected.wait(5))
+        # The balances are subscribed last, so all snapshots were received.
+        self.assertTrue(wait_for(lambda: self.runner.balances.get('XXBT') == 0.5))
+
+    def test_snapshot(self):
+        '''
+        The snapshots of the open orders & balances are pushed into the state.
+        '''
+        self.assertIn(self.txid, self.runner.order_book.get_open_orders(1))
+        self.assertEqual(self.runner.balances.get('XXBT'), 0.5)
+        self.assertEqual(self.runner.balances.get('ZEUR'), 100.0)
+        self.assertEqual(self.stream.errors, [])
+
+    def test_updates(self):
+        '''
+        Order executions & balance updates are pushed into the state.
+        '''
+        self.runner.stream.changed.clear()
+
+        execution = self.stream.execution(self.txid, order_status='filled', timestamp='2024-01-01T00:00:00+00:00')
+
+        self.stream.publish('executions', [execution])
+        self.stream.publish('balances', [{'asset': 'BTC', 'balance': 0.75}])
+
+        self.assertTrue(wait_for(lambda: self.runner.balances.get('XXBT') == 0.75))
+        self.assertEqual(self.runner.order_book.get_open_orders(1), {})
+        self.assertEqual(self.runner.order_book.get_last_closed_order(1).status, 'closed')
+        self.assertTrue(self.runner.stream.changed.is_set())
+
+    def test_reconnect(self):
+        '''
+        The feed reconnects after a dropped connection, while the state is
+        reconciled via the REST API in the meantime.
+        '''
+        self.runner.reconciled = self.runner.clock.time()
+        self.assertTrue(self.runner.streaming)
+
+        self.stream.drop()
+
+        self.assertTrue(wait_for(lambda: not self.runner.stream.connected.is_set()))
+        self.assertFalse(self.runner.streaming)
+
+        # The order is closed while the feed is disconnected.
+        self.kraken.orders[self.txid].update(status='closed', closetm=self.kraken.orders[self.txid]['opentm'])
+        self.kraken.requests.clear()
+        self.runner.refresh_order_book()
+
+        self.assertIn('OpenOrders', self.kraken.requests)
+        self.assertEqual(self.runner.order_book.get_open_orders(1), {})
+        self.assertEqual(self.runner.order_book.get_last_closed_order(1).status, 'closed')
+
+        self.assertTrue(self.runner.stream.connected.wait(5))
+        self.assertEqual(self.stream.connects, 2)
+        self.assertTrue(self.runner.streaming)
+        self.assertEqual(self.runner.order_book.get_open_orders(1), {})